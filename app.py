@@ -1,75 +1,562 @@
 import os
-import shutil
-from fastapi import FastAPI, UploadFile, File, Form
+import json
+import random
+import time
+import asyncio
+import threading
+from typing import List
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse, JSONResponse
 from pydantic import BaseModel
-from src.ingest import load_document
-from src.preprocess import clean_text, chunk_text
-from src.models import VectorDB
-from src.llm_engine import generate_scenario_mcqs, generate_summary
+from src.models import EMBEDDING_MODEL_NAME, embedding_service
+from src.cache import IngestCache
+from src.sessions import SessionRegistry, DEFAULT_SESSION_ID
+from src.retrieval import assemble_context
+from src.pipeline import ingest_document
+from src.dedup import dedup_stats
+from src.exam_parser import parse_partial_exam
+from src.uploads import MalformedUpload, MultipartUpload, UnsupportedUpload, UploadTooLarge, sweep_spool
+from src.metrics import REQUEST_SECONDS, SlowRequestProfiler, registry as metrics_registry, timed
+from src.ingest import shutdown as shutdown_ingest
+from src.ocr import ocr_cache
+from src.workers import run_in_thread, shutdown as shutdown_workers
+from src.jobs import JobQueue, JobStore, expand_batch
+from src.llm_engine import (
+    afinish_exam, agenerate_exam, clean_model_output, agenerate_summary, astream_scenario_mcqs,
+    astream_summary, MCQ_CONTEXT_TOKENS, SUMMARY_CONTEXT_TOKENS, LLMError, TRANSIENT_ERRORS,
+    llm_scheduler, response_cache, get_backend
+)
 
 app = FastAPI(title="ExamPrep AI")
 
-# Global Vector DB instance
-db = VectorDB()
-
-UPLOAD_DIR = "data"
+# Uploads are spooled here under random names and deleted once indexed
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "data")
 os.makedirs(UPLOAD_DIR, exist_ok=True)
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", 100 * 1024 * 1024))
+# Uploads up to this size are never written to disk; extraction reads them from memory
+UPLOAD_MEMORY_BYTES = int(os.getenv("UPLOAD_MEMORY_BYTES", 8 * 1024 * 1024))
+# Spool files older than this (seconds) are left over from a crash; younger ones
+# may belong to an upload another worker is still receiving or indexing
+UPLOAD_SPOOL_MAX_AGE = int(os.getenv("UPLOAD_SPOOL_MAX_AGE", 3600))
+# Uploads received and ingested at once. A slot is taken before the body is read and the
+# body streams straight into the spool file, so spool disk use stays below this times
+# MAX_UPLOAD_BYTES
+UPLOAD_MAX_CONCURRENCY = int(os.getenv("UPLOAD_MAX_CONCURRENCY", 4))
+upload_slots = asyncio.Semaphore(UPLOAD_MAX_CONCURRENCY)
+# Room for the multipart boundaries and form fields around the file itself
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+# Chunk size and overlap in embedding-model tokens; MiniLM truncates at 256
+# tokens including its [CLS] and [SEP] markers
+CHUNK_SIZE = 254
+CHUNK_OVERLAP = 32
+
+# Chunks retrieved per topic, and chunks used when no topics are given (one
+# per cluster of the session's topic map, for coverage of the whole course)
+TOP_K = 4
+FALLBACK_CHUNKS = 8
+# "hybrid" fuses BM25 with dense retrieval; "dense" uses the vector index only
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+# Retrieved context is compressed to this share of its token budget by keeping
+# the most central sentences; 1 disables compression
+CONTEXT_TARGET_RATIO = float(os.getenv("CONTEXT_TARGET_RATIO", 0.6))
+# Chunks at least this similar (word-shingle Jaccard) to an indexed chunk are
+# skipped at ingestion and recorded as back-references; 0 disables
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", 0.8)) or None
+
+# Prompt tokens saved by context assembly since startup (see /context/stats)
+context_savings = {"requests": 0, "raw_tokens": 0, "context_tokens": 0, "tokens_saved": 0}
+context_savings_lock = threading.Lock()
+
+# One isolated Vector DB per session; cold sessions are spilled to disk
+sessions = SessionRegistry(
+    storage_dir=os.getenv("SESSION_DIR", "cache/sessions"),
+    max_bytes=int(os.getenv("SESSION_MAX_BYTES", 1024 * 1024 * 1024)),
+    index_kind=os.getenv("INDEX_KIND", "flat"),
+    metric=os.getenv("INDEX_METRIC", "l2"),
+    storage=os.getenv("INDEX_STORAGE", "float32"),
+    dedup_threshold=DEDUP_THRESHOLD,
+)
+
+# Re-uploads of the same deck are served from here without re-extracting or re-embedding
+ingest_cache = IngestCache(
+    cache_dir=os.getenv("INGEST_CACHE_DIR", "cache/ingest"),
+    max_bytes=int(os.getenv("INGEST_CACHE_MAX_BYTES", 512 * 1024 * 1024)),
+)
+
+# Hit/miss counters of both caches, read at scrape time
+metrics_registry.callback(
+    "examprep_cache_hits_total", "Cache hits by cache (ingest, responses, ocr).",
+    lambda: {("ingest",): ingest_cache.hits, ("responses",): response_cache.hits, ("ocr",): ocr_cache.hits},
+    kind="counter", labels=("cache",))
+metrics_registry.callback(
+    "examprep_cache_misses_total", "Cache misses by cache (ingest, responses, ocr).",
+    lambda: {("ingest",): ingest_cache.misses, ("responses",): response_cache.misses, ("ocr",): ocr_cache.misses},
+    kind="counter", labels=("cache",))
+metrics_registry.callback(
+    "examprep_session_bytes", "Memory held by resident session Vector DBs.",
+    lambda: {(): sessions.stats()["bytes_held"]})
+# Upstream LLM scheduler: calls waiting for a slot, sessions they belong to, calls in flight
+metrics_registry.callback(
+    "examprep_llm_queue_depth", "LLM calls waiting for a scheduler slot.",
+    lambda: {(): llm_scheduler.stats()["waiting"]})
+metrics_registry.callback(
+    "examprep_llm_queue_sessions", "Sessions with LLM calls waiting for a scheduler slot.",
+    lambda: {(): llm_scheduler.stats()["waiting_sessions"]})
+metrics_registry.callback(
+    "examprep_llm_in_flight", "Upstream LLM calls in flight.",
+    lambda: {(): llm_scheduler.stats()["in_flight"]})
+
+# PROFILE_SLOW_MS turns on the sampling profiler: requests slower than that
+# leave a collapsed-stack flame graph file in PROFILE_DIR
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", 0))
+profiler = SlowRequestProfiler(
+    threshold=PROFILE_SLOW_MS / 1000 if PROFILE_SLOW_MS else None,
+    interval=float(os.getenv("PROFILE_INTERVAL_MS", 5)) / 1000,
+    out_dir=os.getenv("PROFILE_DIR", "cache/profiles"),
+)
 
 class QueryRequest(BaseModel):
     request_type: str  # "summary" or "quiz"
-    context_text: str = None 
+    context_text: str = None
+    session_id: str = DEFAULT_SESSION_ID
+    topics: List[str] = []  # queries to retrieve context for
+    top_k: int = TOP_K
+    fresh: bool = False  # skip the response cache and ask for a new variant
+
+class BatchRequest(BaseModel):
+    request_type: str = "quiz"  # "summary" or "quiz"
+    session_id: str = DEFAULT_SESSION_ID
+    topics: List[str] = []  # one group of variants per topic; empty = whole course
+    variants: int = 1  # exams generated per topic
+    top_k: int = TOP_K
+    max_concurrency: int = None  # per-job cap on parallel generations
+
+# Upper bound on generations in one batch job
+MAX_BATCH_TASKS = 200
+# Minimum seconds between `partial` exam events while a quiz streams
+PARTIAL_EXAM_INTERVAL = 0.3
+
+# Heavy models load in the background after boot; /ready reports progress
+warmup_state = {"status": "pending", "error": None, "seconds": None}
+PRELOAD_MODELS = os.getenv("PRELOAD_MODELS", "0") == "1"
+
+def warm_up():
+    """Loads the embedding model and the LLM backend (client or local model) ahead of the first request."""
+    warmup_state["status"] = "warming"
+    start = time.perf_counter()
+    try:
+        embedding_service.warm_up()
+        get_backend().warm_up()
+    except Exception as e:
+        warmup_state.update(status="failed", error=str(e))
+        print(f"Warm-up failed: {e}")
+    else:
+        warmup_state["status"] = "ready"
+    warmup_state["seconds"] = round(time.perf_counter() - start, 3)
+
+@app.on_event("startup")
+async def on_startup():
+    # Spool files left by a previous run that stopped mid-upload
+    removed = sweep_spool(UPLOAD_DIR, max_age=UPLOAD_SPOOL_MAX_AGE)
+    if removed:
+        print(f"Removed {removed} stale upload spool files.")
+    job_queue.start()
+    if PRELOAD_MODELS:
+        # Old behaviour: do not accept traffic until everything is loaded
+        await run_in_thread(warm_up)
+    else:
+        app.state.warmup_task = asyncio.create_task(run_in_thread(warm_up))
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await job_queue.stop()
+    shutdown_workers()
+    shutdown_ingest()
+
+@app.middleware("http")
+async def instrument_requests(request: Request, call_next):
+    """Request latency per route template (streams count until their first byte), plus opt-in profiling."""
+    start = time.perf_counter()
+    with profiler.profile(f"{request.method} {request.url.path}"):
+        response = await call_next(request)
+    route = request.scope.get("route")
+    REQUEST_SECONDS.observe(time.perf_counter() - start, method=request.method,
+                            route=getattr(route, "path", "unmatched"), status=str(response.status_code))
+    return response
+
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    """
+    Rejects uploads whose declared size is over the limit without reading them.
+    Bodies without a Content-Length are checked while they stream (receive_upload).
+    """
+    length = request.headers.get("content-length", "")
+    if (request.url.path == "/upload" and length.isdigit()
+            and int(length) > MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES):
+        return JSONResponse({"error": f"File is larger than the {MAX_UPLOAD_BYTES / 2 ** 20:g} MB upload limit."},
+                            status_code=413)
+    return await call_next(request)
+
+async def receive_upload(request):
+    """
+    Streams the multipart body into memory or a spool file, hashing it and
+    enforcing MAX_UPLOAD_BYTES on the way. Returns (SpooledUpload, form fields).
+    """
+    reader = MultipartUpload(request.headers.get("content-type"), "file", UPLOAD_DIR, MAX_UPLOAD_BYTES,
+                             UPLOAD_MEMORY_BYTES, overhead_bytes=MULTIPART_OVERHEAD_BYTES)
+    try:
+        with timed("upload_write"):
+            async for chunk in request.stream():
+                # Hashing and disk writes stay off the event loop
+                await run_in_thread(reader.feed, chunk)
+            return await run_in_thread(reader.finish)
+    except BaseException:
+        reader.abort()
+        raise
+
+def index_document(session_id, doc_id, chunks, embeddings):
+    with sessions.session(session_id) as db:
+        return db.add_document(doc_id, chunks, embeddings=embeddings)
 
 @app.get("/")
 def home():
     return {"message": "ExamPrep AI API is running!"}
 
+@app.get("/healthz")
+def liveness():
+    """Liveness: the process is up and serving, regardless of warm-up."""
+    return {"status": "ok"}
+
+@app.get("/ready")
+def readiness():
+    """Readiness: 200 once models are warm, 503 while warming up (or if warm-up failed)."""
+    status_code = 200 if warmup_state["status"] == "ready" else 503
+    return JSONResponse(warmup_state, status_code=status_code)
+
 @app.post("/upload")
-async def upload_document(file: UploadFile = File(...)):
-    file_path = os.path.join(UPLOAD_DIR, file.filename)
-    
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-        
-    print(f"Processing {file.filename}...")
-    raw_text = load_document(file_path)
-    
-    if not raw_text:
-        return {"error": "Could not extract text from file."}
-    
-    cleaned_text = clean_text(raw_text)
-    chunks = chunk_text(cleaned_text)
-    
-    db.create_index(chunks)
-    
+async def upload_document(request: Request):
+    """
+    Multipart form with a `file` (PDF/PPTX/DOCX) and an optional `session_id`.
+    The body is read here rather than by the framework, so nothing reaches the
+    disk before an upload slot is free.
+    """
+    async with upload_slots:
+        try:
+            upload, fields = await receive_upload(request)
+        except UploadTooLarge as e:
+            return JSONResponse({"error": str(e)}, status_code=413)
+        except UnsupportedUpload as e:
+            return JSONResponse({"error": str(e)}, status_code=415)
+        except MalformedUpload as e:
+            return JSONResponse({"error": str(e)}, status_code=400)
+        try:
+            session_id = fields.get("session_id") or DEFAULT_SESSION_ID
+            try:
+                SessionRegistry.validate(session_id)
+            except ValueError as e:
+                return {"error": str(e)}
+            # Blocking work (parsing, embedding, FAISS) stays off the event loop
+            return await ingest_upload(upload, session_id)
+        finally:
+            upload.cleanup()
+
+async def ingest_upload(upload, session_id):
+    """Chunks, embeds (or fetches from the ingest cache) and indexes one spooled upload."""
+    # Same content -> same document id, so a re-upload replaces instead of duplicating
+    doc_id = upload.content_hash[:16]
+
+    cache_key = IngestCache.make_key(
+        upload.content_hash,
+        EMBEDDING_MODEL_NAME,
+        chunker="tokens-v2",  # v2 strips running headers and footers
+        normalize=embedding_service.normalize,
+        chunk_size=CHUNK_SIZE,
+        overlap=CHUNK_OVERLAP,
+        dedup_threshold=DEDUP_THRESHOLD,
+    )
+    cached = await run_in_thread(ingest_cache.get, cache_key)
+
+    if cached is not None:
+        print(f"Cache hit for {upload.filename}.")
+        chunks, embeddings = cached
+    else:
+        print(f"Processing {upload.filename} ({upload.size} bytes, {'memory' if upload.in_memory else 'spooled'})...")
+        try:
+            chunks, embeddings = await run_in_thread(ingest_document, upload.source, CHUNK_SIZE, CHUNK_OVERLAP,
+                                                     dedup_threshold=DEDUP_THRESHOLD, file_type=upload.file_type)
+        except Exception as e:
+            print(f"Error reading {upload.filename}: {e}")
+            chunks = None
+        if not chunks:
+            return {"error": "Could not extract text from file."}
+
+        await run_in_thread(ingest_cache.put, cache_key, chunks, embeddings)
+
+    indexed = await run_in_thread(index_document, session_id, doc_id, chunks, embeddings)
+
     return {
-        "filename": file.filename,
+        "filename": upload.filename,
+        "doc_id": doc_id,
+        "session_id": session_id,
         "chunks_processed": len(chunks),
+        "chunks_indexed": indexed,  # fewer when chunks duplicate ones already in the session
+        "cached": cached is not None,
         "message": "File processed and indexed successfully."
     }
 
+@app.get("/cache/stats")
+def cache_stats():
+    return {"ingest": ingest_cache.stats(), "responses": response_cache.stats(), "ocr": ocr_cache.stats()}
+
+@app.get("/dedup/stats")
+def dedup_statistics():
+    """Near-duplicate chunks skipped at ingestion since startup."""
+    return dedup_stats.snapshot()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Stage latency histograms and counters in the Prometheus text format."""
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/llm/stats")
+def llm_stats():
+    """Upstream LLM scheduler: slots in flight, queue depth and rate limits."""
+    return llm_scheduler.stats()
+
+def llm_error_response(e):
+    """The JSON error response for a failed generation, with the status its LLMError type maps to."""
+    headers = {"Retry-After": str(max(1, round(e.retry_after)))} if e.retry_after else None
+    return JSONResponse({"error": str(e), "error_type": type(e).__name__}, status_code=e.status_code, headers=headers)
+
+@app.get("/embeddings/stats")
+def embedding_stats():
+    return embedding_service.stats()
+
+@app.get("/sessions/stats")
+def session_stats():
+    return sessions.stats()
+
+@app.get("/documents")
+def list_documents(session_id: str = DEFAULT_SESSION_ID):
+    try:
+        with sessions.session(session_id) as db:
+            return {doc_id: len(ids) for doc_id, ids in db.documents.items()}
+    except ValueError as e:
+        return {"error": str(e)}
+
+@app.get("/topics")
+def list_topics(session_id: str = DEFAULT_SESSION_ID):
+    """Topic map of a session: clusters with size, keywords and representative chunk."""
+    try:
+        with sessions.session(session_id) as db:
+            return {"topics": db.topic_summary()}
+    except ValueError as e:
+        return {"error": str(e)}
+
+@app.delete("/documents/{doc_id}")
+def delete_document(doc_id: str, session_id: str = DEFAULT_SESSION_ID):
+    try:
+        with sessions.session(session_id) as db:
+            removed = db.remove_document(doc_id)
+    except ValueError as e:
+        return {"error": str(e)}
+    if not removed:
+        return {"error": f"Unknown document: {doc_id}"}
+    return {"doc_id": doc_id, "chunks_removed": removed}
+
+def record_context_savings(report):
+    with context_savings_lock:
+        context_savings["requests"] += 1
+        for key in ("raw_tokens", "context_tokens", "tokens_saved"):
+            context_savings[key] += report[key]
+
+def build_context(request, seed=None):
+    """
+    Retrieves and assembles the generation context for a request. Without
+    topics, one chunk per cluster of the topic map is used; `seed` picks which
+    (None: the most central ones).
+    Returns (context, report, error): the report counts the prompt tokens saved
+    by overlap removal, repeated-line removal and compression (None for
+    caller-supplied context); context is None exactly when error is set.
+    """
+    if request.request_type not in ("quiz", "summary"):
+        return None, None, "Invalid request_type. Use 'quiz' or 'summary'."
+    if request.context_text:
+        return request.context_text, None, None
+
+    topics = [topic for topic in request.topics if topic.strip()]
+    try:
+        with sessions.session(request.session_id) as db:
+            if db.is_empty():
+                return None, None, "No documents indexed. Please upload a file first."
+            if topics:
+                hit_lists = db.search_batch(topics, k=request.top_k, mode=RETRIEVAL_MODE)
+            else:
+                hit_lists = [db.sample_topics(FALLBACK_CHUNKS, seed=seed)]
+    except ValueError as e:
+        return None, None, str(e)
+
+    budget = MCQ_CONTEXT_TOKENS if request.request_type == "quiz" else SUMMARY_CONTEXT_TOKENS
+    target = int(budget * CONTEXT_TARGET_RATIO) if CONTEXT_TARGET_RATIO < 1 else None
+    with timed("context_assembly"):
+        context, report = assemble_context(hit_lists, token_budget=budget, target_tokens=target,
+                                           embed_fn=embedding_service.encode)
+    record_context_savings(report)
+    print(f"Context: {report['context_tokens']} tokens, {report['tokens_saved']} saved.")
+    return context, report, None
+
+@app.get("/context/stats")
+def context_stats():
+    """Prompt tokens saved by context assembly since startup."""
+    with context_savings_lock:
+        stats = dict(context_savings)
+    stats["saved_share"] = round(stats["tokens_saved"] / stats["raw_tokens"], 3) if stats["raw_tokens"] else 0.0
+    return stats
+
 @app.post("/generate")
 async def generate_content(request: QueryRequest):
-    if db.index is None:
-        return {"error": "No documents indexed. Please upload a file first."}
-    
-    context_chunks = db.metadata[:3] 
-    context = "\n\n".join(context_chunks)
-    
-    response_text = ""
-    
-    if request.request_type == "quiz":
-        print("Generating Quiz...")
-        response_text = generate_scenario_mcqs(context)
-        
-    elif request.request_type == "summary":
+    # A fresh exam over the whole course covers other chunks of each topic
+    seed = random.getrandbits(32) if request.fresh else None
+    context, report, error = await run_in_thread(build_context, request, seed)
+    if error:
+        return {"error": error}
+
+    try:
+        if request.request_type == "quiz":
+            print("Generating Quiz...")
+            response_text, exam = await agenerate_exam(context, fresh=request.fresh, session_id=request.session_id)
+            # Parsed once here; the frontend renders the structured exam as-is
+            return {"result": response_text, "exam": exam.to_dict(), "context": report}
+
         print("Generating Summary...")
-        response_text = generate_summary(context)
-        
-    else:
+        response_text = await agenerate_summary(context, fresh=request.fresh, session_id=request.session_id)
+    except LLMError as e:
+        return llm_error_response(e)
+
+    return {"result": response_text, "context": report}
+
+async def run_batch_task(spec, params):
+    """Generates one exam of a batch job. Transient upstream failures raise LLMError and are retried."""
+    request = QueryRequest(
+        request_type=spec["request_type"],
+        session_id=spec["session_id"],
+        topics=[params["topic"]] if params["topic"] else [],
+        top_k=spec["top_k"],
+    )
+    context, _, error = await run_in_thread(build_context, request, params["variant"] or None)
+    if error:
+        raise ValueError(error)
+    # Variant 0 may come from the cache; every further variant is a new completion
+    fresh = params["variant"] > 0
+    # Queued apart from the session's own interactive requests, which go first in the round-robin
+    scheduler_key = f"{request.session_id}/jobs"
+    if request.request_type == "quiz":
+        # Stored as text with broken questions already regenerated
+        _, exam = await agenerate_exam(context, fresh=fresh, session_id=scheduler_key)
+        return exam.to_text()
+    return await agenerate_summary(context, fresh=fresh, session_id=scheduler_key)
+
+# Batch jobs persist in SQLite, so they resume after a restart
+job_queue = JobQueue(
+    JobStore(os.getenv("JOB_DB", "cache/jobs.sqlite3")),
+    run_batch_task,
+    workers=int(os.getenv("JOB_WORKERS", 4)),
+    max_concurrency=int(os.getenv("JOB_MAX_CONCURRENCY", 2)),
+    max_attempts=int(os.getenv("JOB_MAX_ATTEMPTS", 4)),
+    retry_on=TRANSIENT_ERRORS,
+)
+
+# Submitting and cancelling wake the workers' asyncio.Event, so these run on the event loop
+# (their SQLite writes go to the thread pool)
+@app.post("/jobs")
+async def submit_job(batch: BatchRequest):
+    """Queues a batch of generations and returns its job id immediately."""
+    if batch.request_type not in ("quiz", "summary"):
         return {"error": "Invalid request_type. Use 'quiz' or 'summary'."}
-        
-    return {"result": response_text}
+    try:
+        SessionRegistry.validate(batch.session_id)
+    except ValueError as e:
+        return {"error": str(e)}
+    tasks = expand_batch(batch.topics, batch.variants)
+    if not 0 < len(tasks) <= MAX_BATCH_TASKS:
+        return {"error": f"A batch must contain between 1 and {MAX_BATCH_TASKS} generations."}
+    spec = batch.dict(exclude={"max_concurrency"})
+    job_id = await job_queue.submit(spec, tasks, max_concurrency=batch.max_concurrency)
+    return {"job_id": job_id, "total": len(tasks)}
+
+@app.get("/jobs")
+def list_jobs(limit: int = 50):
+    return {"jobs": job_queue.store.list(limit)}
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """Job status, progress counters and the results of every finished task."""
+    job = job_queue.store.get(job_id)
+    if job is None:
+        return {"error": f"Unknown job: {job_id}"}
+    return job
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    if await run_in_thread(job_queue.store.get, job_id, include_results=False) is None:
+        return {"error": f"Unknown job: {job_id}"}
+    return {"job_id": job_id, "tasks_cancelled": await job_queue.cancel(job_id)}
+
+def sse_event(data, event=None):
+    """Formats one server-sent event; `data` is JSON-encoded so newlines survive."""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+@app.post("/generate/stream")
+async def generate_content_stream(request: QueryRequest):
+    """
+    Same as /generate, but streams the generation as server-sent events:
+    a `context` event with the prompt-token report, one `data:` event per text
+    delta, then for quizzes an `exam` event with the parsed and repaired exam,
+    then a final `end` event. While a quiz streams, `partial` events carry the
+    exam parsed from the lines received so far, so it can be shown as it grows.
+    """
+    seed = random.getrandbits(32) if request.fresh else None
+    context, report, error = await run_in_thread(build_context, request, seed)
+
+    async def events():
+        if error:
+            yield sse_event({"error": error}, event="error")
+            return
+        yield sse_event(report, event="context")
+        if request.request_type == "quiz":
+            stream = astream_scenario_mcqs(context, fresh=request.fresh, session_id=request.session_id)
+        else:
+            stream = astream_summary(context, fresh=request.fresh, session_id=request.session_id)
+        pieces = []
+        last_partial = 0.0
+        try:
+            async for delta in stream:
+                pieces.append(delta)
+                yield sse_event(delta)
+                if (request.request_type == "quiz" and "\n" in delta
+                        and time.monotonic() - last_partial > PARTIAL_EXAM_INTERVAL):
+                    partial = parse_partial_exam("".join(pieces))
+                    if partial.cases:
+                        yield sse_event(partial.to_dict(), event="partial")
+                    last_partial = time.monotonic()
+        except LLMError as e:
+            # The response has started, so the status travels in the event instead
+            yield sse_event({"error": str(e), "error_type": type(e).__name__, "status": e.status_code,
+                             "retry_after": e.retry_after}, event="error")
+            return
+        finally:
+            # Client went away (or we finished): make sure the upstream call is cancelled
+            await stream.aclose()
+        if request.request_type == "quiz":
+            exam = await afinish_exam(clean_model_output("".join(pieces)), context, fresh=request.fresh,
+                                      session_id=request.session_id)
+            yield sse_event(exam.to_dict(), event="exam")
+        yield sse_event("", event="end")
+
+    return StreamingResponse(events(), media_type="text/event-stream")
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,89 @@
+"""
+Recall@k vs. latency of the approximate index kinds against the exact flat baseline.
+
+The synthetic corpus is a Gaussian mixture in MiniLM's 384-d space, which is
+much closer to real sentence embeddings than uniform noise.
+
+Usage: python benchmarks/bench_ann.py [--chunks 100000] [--queries 1000] [--k 10]
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.models import VectorDB
+
+DIMENSION = 384
+DOC_SIZE = 5_000
+
+CONFIGS = [
+    ("flat", "l2", {}),
+    ("flat", "ip", {}),
+    ("ivf", "ip", {"nlist": 1024, "nprobe": 8}),
+    ("ivf", "ip", {"nlist": 1024, "nprobe": 32}),
+    ("hnsw", "ip", {"hnsw_m": 32, "ef_search": 64}),
+    ("hnsw", "ip", {"hnsw_m": 32, "ef_search": 128}),
+    ("ivfpq", "ip", {"nlist": 1024, "nprobe": 16, "pq_m": 48}),
+]
+
+
+def synthetic_corpus(rng, n, clusters=2_000):
+    centers = rng.standard_normal((clusters, DIMENSION)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=n)
+    vectors = centers[labels] + 0.35 * rng.standard_normal((n, DIMENSION)).astype(np.float32)
+    return vectors
+
+
+def build(kind, metric, params, vectors):
+    db = VectorDB(index_kind=kind, metric=metric, **params)
+    for start in range(0, len(vectors), DOC_SIZE):
+        batch = vectors[start:start + DOC_SIZE]
+        db.add_document(f"doc-{start}", [""] * len(batch), embeddings=batch)
+    return db
+
+
+def result_ids(db, queries, k):
+    return [[hit["id"] for hit in hits] for hits in db.search_vectors(queries, k)]
+
+
+def recall_at_k(found, truth, k):
+    return np.mean([len(set(f[:k]) & set(t[:k])) / k for f, t in zip(found, truth)])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=1_000)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = synthetic_corpus(rng, args.chunks)
+    queries = vectors[rng.choice(args.chunks, args.queries, replace=False)]
+    queries = queries + 0.1 * rng.standard_normal(queries.shape).astype(np.float32)
+
+    truth = {}
+    print(f"{'index':<8} {'metric':<6} {'params':<34} {'build s':>8} {'recall@k':>9} {'ms/query':>9} {'MB':>8}")
+    for kind, metric, params in CONFIGS:
+        start = time.perf_counter()
+        db = build(kind, metric, params, vectors)
+        build_s = time.perf_counter() - start
+
+        # Warm up, then time one query at a time like the API does
+        result_ids(db, queries[:10], args.k)
+        start = time.perf_counter()
+        found = [result_ids(db, q[None, :], args.k)[0] for q in queries]
+        latency_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+        if kind == "flat":
+            truth[metric] = found
+        recall = recall_at_k(found, truth[metric], args.k)
+        mb = db.memory_bytes() / 1e6
+        print(f"{kind:<8} {metric:<6} {str(params):<34} {build_s:>8.2f} {recall:>9.3f} {latency_ms:>9.3f} {mb:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
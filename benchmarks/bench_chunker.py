@@ -0,0 +1,85 @@
+"""
+Chunker benchmark on a synthetic 1,000-page PDF.
+
+Compares the legacy word-count chunker (clean_text + chunk_text per page) with
+the token-budgeted chunker (iter_chunk_records) using either the MiniLM fast
+tokenizer or the regex token estimate. Pages are extracted once up front, so
+the timings cover cleaning and chunking only.
+
+Reports chunk count, truncation rate (share of chunks longer than the model's
+256-token limit, counted with the real tokenizer) and throughput.
+
+Usage: python benchmarks/bench_chunker.py --pages 1000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import fitz
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.embeddings import EmbeddingService
+from src.ingest import iter_document, shutdown
+from src.preprocess import chunk_text, clean_text, iter_chunk_records, regex_token_spans
+
+MODEL_MAX_TOKENS = 256
+# [CLS] and [SEP] count against the model limit
+SPECIAL_TOKENS = 2
+PARAGRAPH = (
+    "The Krebs cycle (TCA) oxidizes acetyl-CoA to CO2, yielding NADH, FADH2 and GTP. "
+    "Its rate is controlled by isocitrate dehydrogenase and alpha-ketoglutarate dehydrogenase. "
+)
+
+
+def make_pdf(path, pages):
+    doc = fitz.open()
+    for i in range(pages):
+        page = doc.new_page()
+        body = "\n\n".join(PARAGRAPH * (2 + (i + j) % 4) for j in range(4))
+        page.insert_textbox(page.rect + (40, 40, -40, -40), f"Chapter {i}\n{body}\n{i + 1}", fontsize=8)
+    doc.save(path)
+    doc.close()
+
+
+def legacy_chunks(pages):
+    return [chunk for _, text in pages for chunk in chunk_text(clean_text(text), 300, 50)]
+
+
+def token_chunks(pages, token_spans):
+    return [record["text"] for record in iter_chunk_records(pages, MODEL_MAX_TOKENS - SPECIAL_TOKENS, 32, token_spans)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=1000)
+    args = parser.parse_args()
+
+    service = EmbeddingService()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "book.pdf")
+        make_pdf(path, args.pages)
+        pages = list(iter_document(path))
+    shutdown()
+    megabytes = sum(len(text) for _, text in pages) / 1e6
+
+    variants = (
+        ("words (legacy)", legacy_chunks),
+        ("tokens, MiniLM", lambda p: token_chunks(p, service.token_spans)),
+        ("tokens, regex", lambda p: token_chunks(p, regex_token_spans)),
+    )
+    print(f"{len(pages)} pages, {megabytes:.1f} MB of text")
+    print(f"{'chunker':<15} | {'chunks':>6} | {'truncated':>9} | {'pages/s':>8} | {'MB/s':>6}")
+    for name, fn in variants:
+        start = time.perf_counter()
+        chunks = fn(pages)
+        elapsed = time.perf_counter() - start
+        lengths = np.array([len(spans) for spans in service.token_spans(chunks)])
+        truncated = float(np.mean(lengths + SPECIAL_TOKENS > MODEL_MAX_TOKENS)) if len(lengths) else 0.0
+        print(f"{name:<15} | {len(chunks):>6} | {truncated:>8.1%} | {len(pages) / elapsed:>8.0f} | {megabytes / elapsed:>6.2f}")
+
+
+if __name__ == "__main__":
+    main()
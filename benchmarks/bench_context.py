@@ -0,0 +1,108 @@
+"""
+Prompt tokens saved by context assembly, stage by stage.
+
+Chunks a document (or a synthetic slide deck with running headers/footers)
+with and without ingestion-time boilerplate stripping, then assembles the
+generation context for many simulated requests (runs of neighbouring chunks,
+as retrieval returns them) and reports the mean prompt tokens removed by each
+stage, the final context size and the assembly latency.
+
+Compression uses a hashed bag-of-words embedding unless --embed is passed,
+which uses the real sentence model (slower, better sentence selection).
+
+Usage: python benchmarks/bench_context.py [--doc lecture.pdf] [--embed] [--ratio 0.6]
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.preprocess import BoilerplateFilter, iter_chunk_records
+from src.retrieval import assemble_context
+
+SUBJECTS = ["Enzymes", "The active site", "Temperature", "Competitive inhibition", "Feedback inhibition",
+            "ATP hydrolysis", "The cell membrane", "Diffusion", "Osmosis", "The sodium pump"]
+VERBS = ["controls", "limits", "increases", "depends on", "is measured by", "changes"]
+OBJECTS = ["the reaction rate", "substrate binding", "activation energy", "ion gradients",
+           "metabolic flux", "water potential", "membrane transport", "protein folding"]
+MCQ_CONTEXT_TOKENS = 1500
+
+
+def synthetic_pages(rng, n_pages):
+    for page in range(1, n_pages + 1):
+        body = "\n".join(
+            " ".join(f"{rng.choice(SUBJECTS)} {rng.choice(VERBS)} {rng.choice(OBJECTS)} in case {rng.integers(100)}."
+                     for _ in range(3))
+            for _ in range(rng.integers(10, 30))
+        )
+        yield page, (f"BIO 201 Cell Biology - Lecture 5\nSlide title {page}\n{body}\n"
+                     f"University of Example - Confidential - Page {page} of {n_pages}")
+
+
+def hashed_bag_of_words(texts, dimension=1024):
+    vectors = np.zeros((len(texts), dimension), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for word in text.lower().split():
+            vectors[row, hash(word) % dimension] += 1
+    return vectors
+
+
+def chunk_records(pages, strip):
+    boilerplate = BoilerplateFilter() if strip else None
+    records = list(iter_chunk_records(pages, 254, 32, boilerplate=boilerplate))
+    return [dict(record, id=i, doc_id="doc") for i, record in enumerate(records)], boilerplate
+
+
+def simulated_hit_lists(rng, records, n_requests, per_query=4, queries=3):
+    """Each query hits a run of neighbouring chunks, so retrieved chunks overlap like real hits do."""
+    for _ in range(n_requests):
+        hit_lists = []
+        for _ in range(queries):
+            start = int(rng.integers(0, max(len(records) - per_query, 1)))
+            hit_lists.append(records[start:start + per_query])
+        yield hit_lists
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--doc", help="PDF/PPTX/DOCX to use instead of the synthetic deck")
+    parser.add_argument("--pages", type=int, default=60)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--ratio", type=float, default=0.6, help="compression target as a share of the budget")
+    parser.add_argument("--embed", action="store_true", help="use the sentence-embedding model")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    if args.doc:
+        from src.ingest import iter_document
+        pages = list(iter_document(args.doc))
+    else:
+        pages = list(synthetic_pages(rng, args.pages))
+    if args.embed:
+        from src.models import embedding_service
+        embed_fn = embedding_service.encode
+    else:
+        embed_fn = hashed_bag_of_words
+
+    target = int(MCQ_CONTEXT_TOKENS * args.ratio) if args.ratio < 1 else None
+    stages = ["raw_tokens", "overlap_tokens_removed", "repeated_line_tokens_removed",
+              "compression_tokens_removed", "context_tokens", "tokens_saved"]
+    print(f"{'ingestion':<20} | " + " | ".join(f"{stage[:18]:>18}" for stage in stages) + " | assembly ms")
+    for strip in (False, True):
+        records, boilerplate = chunk_records(pages, strip)
+        reports, timings = [], []
+        for hit_lists in simulated_hit_lists(rng, records, args.requests):
+            start = time.perf_counter()
+            _, report = assemble_context(hit_lists, MCQ_CONTEXT_TOKENS, target_tokens=target, embed_fn=embed_fn)
+            timings.append((time.perf_counter() - start) * 1000)
+            reports.append(report)
+        label = f"boilerplate -{boilerplate.lines_removed} ln" if strip else "as before"
+        means = [np.mean([report[stage] for report in reports]) for stage in stages]
+        print(f"{label:<20} | " + " | ".join(f"{mean:>18.1f}" for mean in means) + f" | {np.mean(timings):.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Near-duplicate detection throughput, accuracy and memory as the corpus grows.
+
+Builds a synthetic corpus of chunk-sized texts in which a share are copies of
+earlier chunks with a few words edited (the slide re-used across decks case),
+streams it through NearDuplicateIndex the way VectorDB.add_document does, and
+reports chunks/s per corpus size (flat if the check is linear), recall of the
+planted duplicates, false positives, the bucket index size, and the embeddings
+that skipping the duplicates avoids at the measured encode rate.
+
+--pairwise also times the exact all-pairs Jaccard check on the smallest size,
+for the quadratic baseline.
+
+Usage: python benchmarks/bench_dedup.py [--sizes 10000 100000 300000] [--dup-share 0.2] [--pairwise]
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.dedup import NearDuplicateIndex, jaccard
+
+
+def synthetic_corpus(rng, n_chunks, dup_share, words_per_chunk=150, edits=3):
+    """Returns (texts, planted) where planted[i] is the index of the chunk text i copies, or -1."""
+    vocabulary = np.array([f"term{i}" for i in range(20000)])
+    texts, planted = [], np.full(n_chunks, -1)
+    for i in range(n_chunks):
+        if i > 0 and rng.random() < dup_share:
+            source = int(rng.integers(i))
+            while planted[source] >= 0:
+                source = planted[source]
+            words = texts[source].split()
+            for position in rng.integers(len(words), size=edits):
+                words[position] = "edited"
+            texts.append(" ".join(words))
+            planted[i] = source
+        else:
+            texts.append(" ".join(rng.choice(vocabulary, size=words_per_chunk)))
+    return texts, planted
+
+
+def run(texts, planted, threshold):
+    index = NearDuplicateIndex(threshold)
+    kept = {}
+    found = false_positives = 0
+    start = time.perf_counter()
+    for chunk_id, text in enumerate(texts):
+        shingle_hashes, keys = index.sketch(text)
+        match, _ = index.find(shingle_hashes, keys, kept.get)
+        if match is None:
+            index.add(chunk_id, keys)
+            kept[chunk_id] = shingle_hashes
+        elif planted[chunk_id] >= 0:
+            found += 1
+        else:
+            false_positives += 1
+    seconds = time.perf_counter() - start
+    return seconds, found, false_positives, index.memory_bytes()
+
+
+def pairwise_seconds(texts):
+    from src.dedup import shingles
+    sets = [shingles(text) for text in texts]
+    start = time.perf_counter()
+    for i in range(len(sets)):
+        for j in range(i):
+            jaccard(sets[i], sets[j])
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000, 200000])
+    parser.add_argument("--dup-share", type=float, default=0.2)
+    parser.add_argument("--threshold", type=float, default=0.8)
+    parser.add_argument("--encode-rate", type=float, default=400.0,
+                        help="embedding throughput in chunks/s, for the time-saved column (see /embeddings/stats)")
+    parser.add_argument("--pairwise", action="store_true", help="time the all-pairs baseline on the smallest size")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'chunks':>8} | {'chunks/s':>9} | {'planted':>7} | {'recall':>6} | {'false +':>7} | "
+          f"{'index MB':>8} | embed s saved")
+    for n_chunks in args.sizes:
+        texts, planted = synthetic_corpus(rng, n_chunks, args.dup_share)
+        seconds, found, false_positives, memory = run(texts, planted, args.threshold)
+        n_planted = int((planted >= 0).sum())
+        recall = found / n_planted if n_planted else 1.0
+        print(f"{n_chunks:>8} | {n_chunks / seconds:>9,.0f} | {n_planted:>7} | {recall:>6.3f} | "
+              f"{false_positives:>7} | {memory / 1e6:>8.1f} | {(found + false_positives) / args.encode_rate:.0f}")
+
+    if args.pairwise:
+        n_chunks = min(min(args.sizes), 3000)
+        texts, _ = synthetic_corpus(rng, n_chunks, args.dup_share)
+        seconds = pairwise_seconds(texts)
+        print(f"all-pairs Jaccard on {n_chunks} chunks: {n_chunks / seconds:,.0f} chunks/s "
+              f"({seconds:.1f}s, grows with the square of the corpus)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+"""
+End-to-end benchmark of the upload-to-exam pipeline, with regression checks.
+
+For synthetic PDF, PPTX and DOCX lectures at several sizes (see
+synthetic_docs.py) it measures every pipeline stage on its own:
+
+    extract   iter_document                            pages/s
+    chunk     cleaning, header stripping and chunking  chunks/s
+    embed     EmbeddingService.encode                  chunks/s
+    index     VectorDB.add_document (precomputed)      chunks/s
+    search    VectorDB.search_batch (hybrid)           queries/s
+
+and then the whole flow through the FastAPI app (TestClient, in process):
+
+    upload         POST /upload, cold ingest cache     MB/s
+    upload_cached  POST /upload again, cache hit       MB/s
+    generate       POST /generate quiz with topics     requests/s
+
+The LLM is the stub backend (LLM_BACKEND=stub), so generation measures the
+request path, retrieval, context assembly and exam parsing rather than an
+upstream model. Each measurement is the median of --repeat runs and records
+wall time, throughput and the peak RSS reached while it ran.
+
+Results are written as JSON (--out). --compare BASELINE.json flags every
+measurement whose time or peak RSS grew by more than --tolerance against the
+baseline and exits with status 1 if any did.
+
+Usage:
+    python benchmarks/bench_e2e.py --pages 10 50 --out cache/bench/e2e.json
+    python benchmarks/bench_e2e.py --pages 10 50 --compare cache/bench/e2e.json --tolerance 0.25
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic_docs import FORMATS, QUERIES, ensure_fixture
+
+TOPICS_PER_REQUEST = 2
+GENERATE_REQUESTS = 5
+
+
+def current_rss():
+    """Resident set size of this process in bytes (Linux /proc, else the peak so far)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class PeakRSS:
+    """Samples RSS every `interval` seconds on a thread while the block runs."""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, current_rss())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = current_rss()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+        return False
+
+
+def measure(fn, work, unit, repeat):
+    """
+    Runs `fn` `repeat` times. `work` is the amount processed per run (pages,
+    chunks, bytes...) in `unit`. Returns (result of the last run, measurement).
+    """
+    seconds, peaks = [], []
+    result = None
+    for _ in range(repeat):
+        with PeakRSS() as rss:
+            start = time.perf_counter()
+            result = fn()
+            seconds.append(time.perf_counter() - start)
+        peaks.append(rss.peak)
+    median = statistics.median(seconds)
+    amount = work() if callable(work) else work
+    return result, {
+        "seconds": round(median, 6),
+        "throughput": round(amount / median, 3) if median else None,
+        "unit": unit,
+        "peak_rss_mb": round(max(peaks) / 2 ** 20, 1),
+    }
+
+
+def bench_stages(path, repeat, work_dir):
+    from src.ingest import iter_document
+    from src.models import VectorDB, embedding_service
+    from src.preprocess import BoilerplateFilter, iter_chunk_records
+    from app import CHUNK_OVERLAP, CHUNK_SIZE
+
+    results = {}
+    pages, results["extract"] = measure(lambda: list(iter_document(path)), lambda: len(pages), "pages/s", repeat)
+    chunks, results["chunk"] = measure(
+        lambda: list(iter_chunk_records(pages, CHUNK_SIZE, CHUNK_OVERLAP, embedding_service.token_spans,
+                                        BoilerplateFilter())),
+        lambda: len(chunks), "chunks/s", repeat)
+    texts = [chunk["text"] for chunk in chunks]
+    embeddings, results["embed"] = measure(lambda: embedding_service.encode(texts), len(texts), "chunks/s", repeat)
+
+    def index():
+        db = VectorDB(store_dir=os.path.join(work_dir, "stage-store"))
+        db.add_document("bench", chunks, embeddings=embeddings)
+        return db
+    db, results["index"] = measure(index, len(chunks), "chunks/s", repeat)
+    queries = QUERIES * 4
+    _, results["search"] = measure(lambda: db.search_batch(queries, k=4), len(queries), "queries/s", repeat)
+    return results
+
+
+def bench_api(client, path, repeat, fmt, pages):
+    size = os.path.getsize(path)
+    results = {}
+
+    def upload(session_id):
+        with open(path, "rb") as f:
+            response = client.post("/upload", files={"file": (os.path.basename(path), f)},
+                                   data={"session_id": session_id})
+        body = response.json()
+        if "error" in body:
+            raise RuntimeError(f"/upload failed for {path}: {body['error']}")
+        return body
+
+    runs = itertools.count()
+
+    def cold_upload():
+        # Fresh bytes (and session) per run, so neither the ingest cache nor
+        # cross-document deduplication can answer it
+        run = next(runs)
+        cold_path = os.path.join(os.path.dirname(path), f"cold-{run}-{os.path.basename(path)}")
+        with open(path, "rb") as src, open(cold_path, "wb") as dst:
+            dst.write(src.read())
+            dst.write(f"\n%{run}\n".encode() if fmt == "pdf" else b"")
+        try:
+            with open(cold_path, "rb") as f:
+                body = client.post("/upload", files={"file": (os.path.basename(cold_path), f)},
+                                   data={"session_id": f"bench-{fmt}-{pages}-cold{run}"}).json()
+        finally:
+            os.remove(cold_path)
+        if "error" in body:
+            raise RuntimeError(f"/upload failed for {path}: {body['error']}")
+        return body
+
+    session_id = f"bench-{fmt}-{pages}"
+    if fmt == "pdf":
+        _, results["upload"] = measure(cold_upload, size / 1e6, "MB/s", repeat)
+    else:
+        # Only PDFs tolerate trailing bytes; other formats get one cold run
+        _, results["upload"] = measure(lambda: upload(session_id), size / 1e6, "MB/s", 1)
+    _, results["upload_cached"] = measure(lambda: upload(session_id), size / 1e6, "MB/s", repeat)
+
+    def generate():
+        for i in range(GENERATE_REQUESTS):
+            topics = [QUERIES[(i + j) % len(QUERIES)] for j in range(TOPICS_PER_REQUEST)]
+            body = client.post("/generate", json={"request_type": "quiz", "session_id": session_id,
+                                                  "topics": topics, "fresh": True}).json()
+            if "error" in body:
+                raise RuntimeError(f"/generate failed: {body['error']}")
+    _, results["generate"] = measure(generate, GENERATE_REQUESTS, "requests/s", repeat)
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                              capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(results, baseline, tolerance):
+    """Returns [(name, metric, baseline value, value)] for every measurement that regressed."""
+    regressions = []
+    for name, measurement in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        for metric in ("seconds", "peak_rss_mb"):
+            if before.get(metric) and measurement[metric] > before[metric] * (1 + tolerance):
+                regressions.append((name, metric, before[metric], measurement[metric]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--formats", nargs="+", default=list(FORMATS), choices=FORMATS)
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 50])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--fixtures", default=os.path.join(REPO_DIR, "cache", "fixtures"))
+    parser.add_argument("--out", help="write the results JSON here")
+    parser.add_argument("--compare", help="baseline results JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed growth before flagging, as a share")
+    args = parser.parse_args()
+
+    for name in ("fixtures", "out", "compare"):
+        if getattr(args, name):
+            setattr(args, name, os.path.abspath(getattr(args, name)))
+    fixtures = {(fmt, pages): ensure_fixture(args.fixtures, fmt, pages) for fmt in args.formats for pages in args.pages}
+
+    # The app keeps uploads, sessions and caches under the working directory
+    work_dir = tempfile.mkdtemp(prefix="examprep-bench-")
+    os.chdir(work_dir)
+    os.environ.update(LLM_BACKEND="stub", SESSION_DIR=os.path.join(work_dir, "sessions"),
+                      INGEST_CACHE_DIR=os.path.join(work_dir, "ingest"), JOB_DB=os.path.join(work_dir, "jobs.sqlite3"),
+                      PRELOAD_MODELS="1")
+    os.environ.pop("RESPONSE_CACHE_DIR", None)
+    from fastapi.testclient import TestClient
+    from app import app
+
+    results = {}
+    with PeakRSS() as startup_rss:
+        start = time.perf_counter()
+        client = TestClient(app)
+        client.__enter__()  # runs startup, which loads the models with PRELOAD_MODELS=1
+    results["startup"] = {"seconds": round(time.perf_counter() - start, 6), "throughput": None, "unit": None,
+                          "peak_rss_mb": round(startup_rss.peak / 2 ** 20, 1)}
+    try:
+        for (fmt, pages), path in fixtures.items():
+            for stage, measurement in bench_stages(path, args.repeat, work_dir).items():
+                results[f"{fmt}-{pages}/{stage}"] = measurement
+            for stage, measurement in bench_api(client, path, args.repeat, fmt, pages).items():
+                results[f"{fmt}-{pages}/{stage}"] = measurement
+    finally:
+        client.__exit__(None, None, None)
+
+    print(f"{'measurement':<26} | {'seconds':>9} | {'throughput':>16} | {'peak RSS MB':>11}")
+    for name, m in results.items():
+        throughput = f"{m['throughput']:,.1f} {m['unit']}" if m["throughput"] else "-"
+        print(f"{name:<26} | {m['seconds']:>9.4f} | {throughput:>16} | {m['peak_rss_mb']:>11.1f}")
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline["results"], args.tolerance)
+        print(f"\nAgainst {args.compare} ({baseline['meta'].get('revision')}), tolerance {args.tolerance:.0%}:")
+        for name, metric, before, after in regressions:
+            print(f"  REGRESSION {name} {metric}: {before} -> {after} ({after / before - 1:+.0%})")
+        if regressions:
+            sys.exit(1)
+        print("  no regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+CPU benchmark for the embedding service and compact vector storage.
+
+Part 1 encodes synthetic chunks at several corpus and batch sizes and reports
+chunks/second, with and without length sorting.
+Part 2 indexes the same embeddings as float32, fp16 and int8 and reports
+memory and recall@10 relative to float32.
+
+Usage: python benchmarks/bench_embeddings.py --corpus 500 2000 --batch 16 32 64 128 --threads 4
+"""
+import argparse
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.embeddings import EmbeddingService
+from src.models import VectorDB
+
+VOCAB = (
+    "energy cell light plant glucose enzyme reaction membrane protein carbon oxygen water "
+    "process structure function system network model data learning theory market price "
+    "demand supply cost risk policy law force motion mass velocity"
+).split()
+
+
+def synthetic_chunks(rng, n):
+    # Mixed lengths (20-300 words) like real slide/page chunks
+    lengths = rng.integers(20, 300, size=n)
+    return [" ".join(rng.choice(VOCAB, size=length)) for length in lengths]
+
+
+def recall_at_k(db, reference, queries, k=10):
+    found = [[hit["id"] for hit in hits] for hits in db.search_vectors(queries, k)]
+    return np.mean([len(set(f) & set(r)) / k for f, r in zip(found, reference)])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", type=int, nargs="+", default=[500, 2000])
+    parser.add_argument("--batch", type=int, nargs="+", default=[16, 32, 64, 128])
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print("== Encoding throughput ==")
+    print(f"{'corpus':>7} | {'batch':>5} | {'sorted':>6} | {'chunks/s':>9}")
+    embeddings = None
+    for corpus_size in args.corpus:
+        chunks = synthetic_chunks(rng, corpus_size)
+        for batch_size in args.batch:
+            for sort in (False, True):
+                service = EmbeddingService(batch_size=batch_size, num_threads=args.threads, sort_by_length=sort)
+                embeddings = service.encode(chunks)
+                print(f"{corpus_size:>7} | {batch_size:>5} | {str(sort):>6} | {service.throughput:>9.1f}")
+
+    print("\n== Storage: memory vs. recall@10 (inner product, vs. float32) ==")
+    queries = embeddings[rng.choice(len(embeddings), min(200, len(embeddings)), replace=False)]
+    reference = None
+    print(f"{'storage':>8} | {'MB':>7} | {'recall@10':>9}")
+    for storage in ("float32", "fp16", "int8"):
+        db = VectorDB(index_kind="flat", metric="ip", storage=storage)
+        db.add_document("corpus", [""] * len(embeddings), embeddings=embeddings)
+        if reference is None:
+            reference = [[hit["id"] for hit in hits] for hits in db.search_vectors(queries, 10)]
+        print(f"{storage:>8} | {db.memory_bytes() / 1e6:>7.2f} | {recall_at_k(db, reference, queries):>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
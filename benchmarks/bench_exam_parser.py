@@ -0,0 +1,103 @@
+"""
+Exam parser benchmark over a corpus of recorded model outputs.
+
+Parses every recorded generation with `parse_and_validate` and reports
+throughput plus how many exams come out valid and which issues were found.
+For comparison it also times the split("###") + regex pass the frontend used
+to run on every Streamlit rerun (without the rendering).
+
+The default corpus is benchmarks/fixtures/exam_outputs.jsonl ({"name", "text"}
+per line). --cache-dir reads completions recorded by the on-disk response
+cache (RESPONSE_CACHE_DIR) instead.
+
+Usage: python benchmarks/bench_exam_parser.py [--cache-dir cache/responses] [--repeat 200]
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src.llm_engine import parse_and_validate
+
+DEFAULT_CORPUS = os.path.join(ROOT, "benchmarks", "fixtures", "exam_outputs.jsonl")
+
+
+def load_corpus(path=DEFAULT_CORPUS, cache_dir=None):
+    if cache_dir:
+        outputs = []
+        for name in sorted(os.listdir(cache_dir)):
+            if name.endswith(".json"):
+                with open(os.path.join(cache_dir, name), "r", encoding="utf-8") as f:
+                    value = json.load(f)["value"]
+                if "CASE STUDY" in value.upper():
+                    outputs.append((name, value))
+        return outputs
+    with open(path, "r", encoding="utf-8") as f:
+        return [(r["name"], r["text"]) for r in map(json.loads, f)]
+
+
+def legacy_split(raw_text):
+    """The old frontend parsing, minus the Streamlit calls."""
+    questions = []
+    for section in raw_text.split("###"):
+        section = section.strip()
+        if "CASE STUDY" not in section.upper():
+            continue
+        lines = section.splitlines()
+        capture = False
+        block = []
+        for line in lines[1:]:
+            if re.match(r'^\d+\.', line.strip()):
+                capture = True
+            if capture:
+                block.append(line)
+        questions += [q for q in re.split(r'(?=\d+\.)', "\n".join(block)) if q.strip()]
+    return questions
+
+
+def timed(fn, corpus, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for _, text in corpus:
+            fn(text)
+    return (time.perf_counter() - start) / (repeat * len(corpus))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--cache-dir")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus, args.cache_dir)
+    if not corpus:
+        sys.exit("No recorded exams found.")
+
+    print(f"{'output':<22} | {'valid':>5} | {'questions':>9} | issues")
+    issue_counts = Counter()
+    valid = 0
+    for name, text in corpus:
+        exam = parse_and_validate(text)
+        valid += exam.valid
+        issues = exam.issues + [f"Q{q.number}: {issue}" for q in exam.broken_questions for issue in q.issues]
+        issue_counts.update(issue.split(": ", 1)[-1] for issue in issues)
+        print(f"{name[:22]:<22} | {str(exam.valid):>5} | {len(exam.questions):>9} | {'; '.join(issues) or '-'}")
+
+    parse_s = timed(parse_and_validate, corpus, args.repeat)
+    legacy_s = timed(legacy_split, corpus, args.repeat)
+    print(f"\n{valid}/{len(corpus)} exams valid without repair; questions to regenerate by issue:")
+    for issue, count in issue_counts.most_common():
+        print(f"  {count:>4}  {issue}")
+    print(f"\nparse_and_validate: {parse_s * 1e6:8.1f} us/exam ({1 / parse_s:,.0f} exams/s)")
+    print(f"legacy split+regex: {legacy_s * 1e6:8.1f} us/exam ({1 / legacy_s:,.0f} exams/s, no validation)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Compares the old whole-document ingestion path with the streaming pipeline.
+
+Old path:  load_document -> clean_text -> chunk_text -> embed everything at once
+New path:  ingest_document (parallel page extraction, per-page chunking, batched embedding)
+
+Peak Python heap of the parent process is measured with tracemalloc. Embedding
+is replaced by a zero-vector stub unless --embed is passed, so the numbers
+isolate extraction/chunking memory.
+
+Usage: python benchmarks/bench_ingest_stream.py --pages 100 500 [--embed]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import fitz
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.ingest import load_document, shutdown
+from src.preprocess import clean_text, chunk_text
+from src.pipeline import ingest_document
+
+PARAGRAPH = (
+    "Photosynthesis converts light energy into chemical energy. The light-dependent "
+    "reactions take place in the thylakoid membranes and produce ATP and NADPH. "
+)
+
+
+def make_pdf(path, pages):
+    doc = fitz.open()
+    for i in range(pages):
+        page = doc.new_page()
+        page.insert_textbox(page.rect + (40, 40, -40, -40), f"Chapter {i}\n" + PARAGRAPH * 18, fontsize=9)
+    doc.save(path)
+    doc.close()
+
+
+def stub_embed(texts):
+    return np.zeros((len(texts), 384), dtype=np.float32)
+
+
+def old_path(path, embed_fn):
+    raw_text = load_document(path)
+    chunks = chunk_text(clean_text(raw_text))
+    return chunks, embed_fn(chunks)
+
+
+def new_path(path, embed_fn):
+    return ingest_document(path, embed_fn=embed_fn)
+
+
+def measure(fn, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    chunks, _ = fn(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return len(chunks), elapsed, peak / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, nargs="+", default=[100, 500])
+    parser.add_argument("--embed", action="store_true", help="use the real MiniLM model")
+    args = parser.parse_args()
+
+    embed_fn = stub_embed
+    if args.embed:
+        from src.models import embed_chunks
+        embed_fn = embed_chunks
+
+    print(f"{'pages':>6} | {'path':<9} | {'chunks':>6} | {'seconds':>8} | {'peak MB':>8}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for pages in args.pages:
+            path = os.path.join(tmp_dir, f"doc-{pages}.pdf")
+            make_pdf(path, pages)
+            for name, fn in (("old", old_path), ("streaming", new_path)):
+                chunks, elapsed, peak_mb = measure(fn, path, embed_fn)
+                print(f"{pages:>6} | {name:<9} | {chunks:>6} | {elapsed:>8.2f} | {peak_mb:>8.1f}")
+    shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Throughput and latency of the LLM backends (hf, local, stub).
+
+Sends the same scenario-exam prompt from N concurrent callers through each
+backend's streaming path, bypassing the response cache, and reports output
+tokens/second over the whole run plus p50/p99 of time-to-first-token and of
+full-response latency. Tokens are counted with `estimate_tokens` for every
+backend, so the numbers are comparable across tokenizers.
+
+--unbatched adds a run of the local backend with batching disabled
+(max_batch_size=1) to show what dynamic batching buys.
+
+Usage:
+    python benchmarks/bench_llm_backends.py --backends stub local --concurrency 1 4 8 --requests 16
+    STUB_LATENCY=0.5 STUB_TOKENS_PER_SECOND=100 python benchmarks/bench_llm_backends.py --backends stub hf
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.llm_engine import SAMPLING_PARAMS, build_mcq_messages, create_backend
+from src.preprocess import estimate_tokens
+
+SAMPLE_TEXT = (
+    "Photosynthesis is the process used by plants to convert light energy into chemical energy. "
+    "It takes place in the chloroplasts and produces glucose and oxygen from carbon dioxide and water. "
+    "Its rate is limited by light intensity, carbon dioxide concentration and temperature."
+)
+
+
+async def timed_stream(backend, messages, max_tokens):
+    start = time.perf_counter()
+    first = None
+    pieces = []
+    async for delta in backend.astream(messages, max_tokens, **SAMPLING_PARAMS):
+        if first is None and delta:
+            first = time.perf_counter() - start
+        pieces.append(delta)
+    return first or 0.0, time.perf_counter() - start, estimate_tokens("".join(pieces))
+
+
+async def run(backend, n_requests, concurrency, max_tokens):
+    messages = build_mcq_messages(SAMPLE_TEXT)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            return await timed_stream(backend, messages, max_tokens)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(one() for _ in range(n_requests)))
+    wall = time.perf_counter() - start
+    ttft, latency, tokens = (np.array(column) for column in zip(*results))
+    return {
+        "tokens_per_second": tokens.sum() / wall,
+        "ttft_p50": np.percentile(ttft, 50),
+        "p50": np.percentile(latency, 50),
+        "p99": np.percentile(latency, 99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backends", nargs="+", default=["stub", "local"])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--requests", type=int, default=16)
+    parser.add_argument("--max-tokens", type=int, default=256)
+    parser.add_argument("--unbatched", action="store_true", help="also run the local backend without batching")
+    args = parser.parse_args()
+
+    runs = [(name, create_backend(name)) for name in args.backends]
+    if args.unbatched and "local" in args.backends:
+        unbatched = create_backend("local")
+        unbatched.max_batch_size = 1
+        runs.append(("local (no batching)", unbatched))
+
+    print(f"{'backend':<20} | {'conc':>4} | {'tok/s':>8} | {'ttft p50':>8} | {'p50 s':>7} | {'p99 s':>7} | batch")
+    for name, backend in runs:
+        start = time.perf_counter()
+        backend.warm_up()
+        print(f"{name:<20} | warm-up {time.perf_counter() - start:.1f}s")
+        for concurrency in args.concurrency:
+            batches_before = getattr(backend, "batches", 0), getattr(backend, "batched_requests", 0)
+            stats = asyncio.run(run(backend, args.requests, concurrency, args.max_tokens))
+            batches = getattr(backend, "batches", 0) - batches_before[0]
+            mean_batch = f"{(backend.batched_requests - batches_before[1]) / batches:.1f}" if batches else "-"
+            print(f"{name:<20} | {concurrency:>4} | {stats['tokens_per_second']:>8.1f} | {stats['ttft_p50']:>8.2f} | "
+                  f"{stats['p50']:>7.2f} | {stats['p99']:>7.2f} | {mean_batch}")
+
+
+if __name__ == "__main__":
+    main()
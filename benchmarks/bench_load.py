@@ -0,0 +1,62 @@
+"""
+Concurrency load test for /generate.
+
+Start the stub inference server and the API first:
+    python benchmarks/stub_inference_server.py --port 8080 --latency 1.0
+    HF_INFERENCE_URL=http://127.0.0.1:8080 HF_API_KEY=stub LLM_REQUESTS_PER_SECOND=0 LLM_TOKENS_PER_MINUTE=0 \
+        uvicorn app:app --port 8000
+
+(leave the rate limits at their defaults to watch the scheduler pace the calls).
+
+Then: python benchmarks/bench_load.py --levels 1 2 4 8 16 --requests-per-client 4
+
+Requests pass `context_text` so retrieval is skipped and only the request
+handling and LLM path are measured. With a non-blocking handler, throughput
+should grow roughly linearly with the number of clients until
+LLM_MAX_CONCURRENCY is reached.
+"""
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+CONTEXT = "Photosynthesis converts light energy into chemical energy stored in glucose."
+
+
+def one_client(api_url, n_requests):
+    latencies = []
+    with requests.Session() as session:
+        for _ in range(n_requests):
+            start = time.perf_counter()
+            res = session.post(
+                f"{api_url}/generate",
+                json={"request_type": "quiz", "context_text": CONTEXT},
+                timeout=300,
+            )
+            res.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--api-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--requests-per-client", type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{'clients':>7} | {'req/s':>7} | {'p50 s':>7} | {'p99 s':>7}")
+    for clients in args.levels:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clients) as pool:
+            results = list(pool.map(lambda _: one_client(args.api_url, args.requests_per_client), range(clients)))
+        elapsed = time.perf_counter() - start
+
+        latencies = sorted(l for client in results for l in client)
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        print(f"{clients:>7} | {len(latencies) / elapsed:>7.2f} | {statistics.median(latencies):>7.2f} | {p99:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+OCR fallback throughput: pages per second, and per OCR core.
+
+Builds a scanned lecture (the synthetic PDF rendered to images and re-wrapped
+without a text layer), then extracts it with iter_pdf_pages for each OCR pool
+size in --workers and reports pages/s, pages/s per core and the mean OCR time
+per page. A second pass over the same document shows the page-hash cache.
+
+--fairness also starts a small scan while a large one is being OCRed and
+reports how long the small one took, against the time it takes alone, to show
+the per-document cap at work.
+
+Needs Tesseract language data for PyMuPDF (set TESSDATA_PREFIX).
+
+Usage: python benchmarks/bench_ocr.py --pages 20 --workers 1 2 4 [--per-document 2] [--fairness]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import fitz
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src import ocr
+from src.ingest import iter_pdf_pages
+from synthetic_docs import make_pdf
+
+
+def make_scan(path, pages, dpi=150):
+    """Renders a synthetic text PDF to page images and stores them as an image-only PDF."""
+    text_path = f"{path}.text.pdf"
+    make_pdf(text_path, pages)
+    scan = fitz.open()
+    with fitz.open(text_path) as source:
+        for page in source:
+            image = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY).tobytes("png")
+            out = scan.new_page(width=page.rect.width, height=page.rect.height)
+            out.insert_image(out.rect, stream=image)
+    scan.save(path)
+    scan.close()
+    os.remove(text_path)
+
+
+def extract(path, per_document, budget):
+    """Returns (seconds, pages with text) for one document."""
+    ocr.OCR_PAGES_PER_DOCUMENT = per_document
+    ocr.OCR_TIME_BUDGET = budget
+    start = time.perf_counter()
+    pages = list(iter_pdf_pages(path, use_ocr=True))
+    return time.perf_counter() - start, len(pages)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--per-document", type=int, default=None, help="OCR pages in flight per document (default: workers)")
+    parser.add_argument("--budget", type=float, default=600.0, help="OCR time budget per document, seconds")
+    parser.add_argument("--fairness", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        path = os.path.join(work_dir, "scan.pdf")
+        make_scan(path, args.pages)
+        print(f"Scanned lecture: {args.pages} pages, {os.path.getsize(path) / 1e6:.1f} MB\n")
+
+        print(f"{'workers':>7} | {'pages':>5} | {'seconds':>8} | {'pages/s':>8} | {'pages/s/core':>12} | "
+              f"{'s/page':>6} | cached pass s")
+        for workers in args.workers:
+            ocr.shutdown()
+            ocr.OCR_WORKERS = workers
+            ocr.ocr_cache = ocr.OcrCache(os.path.join(work_dir, f"cache-{workers}"))
+            per_document = args.per_document or workers
+            seconds, pages = extract(path, per_document, args.budget)
+            per_page = seconds * min(workers, per_document) / pages if pages else float("nan")
+            cached_seconds, _ = extract(path, per_document, args.budget)
+            print(f"{workers:>7} | {pages:>5} | {seconds:>8.2f} | {pages / seconds:>8.2f} | "
+                  f"{pages / seconds / min(workers, per_document):>12.2f} | {per_page:>6.2f} | {cached_seconds:.2f}")
+
+        if args.fairness:
+            workers = max(args.workers)
+            small_path = os.path.join(work_dir, "small.pdf")
+            make_scan(small_path, 4)
+            ocr.shutdown()
+            ocr.OCR_WORKERS = workers
+            per_document = args.per_document or max(1, workers // 2)
+
+            ocr.ocr_cache = ocr.OcrCache(os.path.join(work_dir, "fair-alone"))
+            alone, _ = extract(small_path, per_document, args.budget)
+
+            ocr.ocr_cache = ocr.OcrCache(os.path.join(work_dir, "fair-shared"))
+            big = threading.Thread(target=extract, args=(path, per_document, args.budget))
+            big.start()
+            time.sleep(1.0)  # let the large scan fill its share of the pool
+            shared, _ = extract(small_path, per_document, args.budget)
+            big.join()
+            print(f"\n4-page scan with {workers} workers, {per_document} per document: "
+                  f"{alone:.2f}s alone, {shared:.2f}s next to the {args.pages}-page scan")
+        ocr.shutdown()
+
+
+if __name__ == "__main__":
+    main()
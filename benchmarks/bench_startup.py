@@ -0,0 +1,90 @@
+"""
+Startup benchmark: import time of `app` and time to the first successful /generate.
+
+Each mode runs in a fresh interpreter so nothing is cached in-process:
+  lazy    - default; models load in a background warm-up task after boot
+  preload - PRELOAD_MODELS=1; startup blocks until everything is loaded
+
+The LLM is served by benchmarks/stub_inference_server.py, started here on a
+free port, so the numbers do not include network latency to Hugging Face.
+
+Usage: python benchmarks/bench_startup.py
+"""
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r"""
+import json, time
+t0 = time.perf_counter()
+import app
+t_import = time.perf_counter() - t0
+from fastapi.testclient import TestClient
+with TestClient(app.app) as client:
+    t_boot = time.perf_counter() - t0
+    client.post("/upload", files={"file": ("notes.docx", open(DOCX, "rb"))})
+    res = client.post("/generate", json={"request_type": "quiz", "fresh": True})
+    assert "result" in res.json(), res.text
+    t_first = time.perf_counter() - t0
+print(json.dumps({"import_s": t_import, "accepting_traffic_s": t_boot, "first_generate_s": t_first}))
+"""
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def make_docx(path):
+    from docx import Document
+    doc = Document()
+    for i in range(20):
+        doc.add_paragraph(f"Paragraph {i}: photosynthesis converts light energy into chemical energy.")
+    doc.save(path)
+
+
+def run_mode(env, docx_path):
+    code = f"DOCX = {docx_path!r}\n" + CHILD
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True)
+    if out.returncode != 0:
+        raise RuntimeError(out.stderr)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    import tempfile
+
+    port = free_port()
+    stub = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "benchmarks", "stub_inference_server.py"),
+         "--port", str(port), "--latency", "0.05", "--tokens-per-second", "5000"],
+        cwd=ROOT,
+    )
+    try:
+        time.sleep(2)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            docx_path = os.path.join(tmp_dir, "notes.docx")
+            make_docx(docx_path)
+            base_env = dict(
+                os.environ,
+                HF_API_KEY=os.getenv("HF_API_KEY", "stub"),
+                HF_INFERENCE_URL=f"http://127.0.0.1:{port}",
+                INGEST_CACHE_DIR=os.path.join(tmp_dir, "ingest"),
+                SESSION_DIR=os.path.join(tmp_dir, "sessions"),
+            )
+            print(f"{'mode':<8} | {'import s':>8} | {'serving s':>9} | {'1st /generate s':>15}")
+            for mode, extra in (("lazy", {}), ("preload", {"PRELOAD_MODELS": "1"})):
+                result = run_mode(dict(base_env, **extra), docx_path)
+                print(f"{mode:<8} | {result['import_s']:>8.2f} | {result['accepting_traffic_s']:>9.2f} | {result['first_generate_s']:>15.2f}")
+    finally:
+        stub.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Cold-load benchmark for the on-disk vector store.
+
+Compares the memory-mapped directory format (`VectorDB.save` / `VectorDB.load`)
+with the previous format (faiss.write_index + a pickled metadata dict) at
+several corpus sizes. Each load runs in a fresh interpreter and reports:
+  load s      - time until the store is ready to serve
+  query s     - time for 100 searches plus reading their chunk text
+  RSS MB      - resident memory after loading, and after the queries
+
+Before every load the store files are dropped from the page cache with
+posix_fadvise(DONTNEED), so loads really hit the disk (best effort; the kernel
+may keep some pages).
+
+Usage: python benchmarks/bench_store_load.py --sizes 10000 100000 1000000
+"""
+import argparse
+import json
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src.models import VectorDB
+
+DIMENSION = 384
+VOCAB = "cell energy light enzyme protein membrane force mass market price theory data".split()
+
+CHILD = r"""
+import json, os, pickle, sys, time
+import numpy as np
+import faiss
+sys.path.insert(0, ROOT)
+from src.models import VectorDB
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+queries = np.random.default_rng(1).standard_normal((100, DIMENSION)).astype(np.float32)
+base_rss = rss_mb()
+t0 = time.perf_counter()
+if FORMAT == "mmap":
+    db = VectorDB(store_dir=PATH)
+    db.load()
+    t_load = time.perf_counter() - t0
+    rss_load = rss_mb()
+    t1 = time.perf_counter()
+    texts = [hit["text"] for hits in db.search_vectors(queries, 4) for hit in hits]
+else:
+    index = faiss.read_index(PATH + ".faiss")
+    with open(PATH + ".pkl", "rb") as f:
+        state = pickle.load(f)
+    t_load = time.perf_counter() - t0
+    rss_load = rss_mb()
+    t1 = time.perf_counter()
+    _, ids = index.search(queries, 4)
+    texts = [state["metadata"][int(i)]["text"] for row in ids for i in row if i != -1]
+t_query = time.perf_counter() - t1
+print(json.dumps({"load_s": t_load, "query_s": t_query, "rss_load_mb": rss_load - base_rss,
+                  "rss_query_mb": rss_mb() - base_rss, "hits": len(texts)}))
+"""
+
+
+def build(db, size, rng, words, batch=100_000):
+    for start in range(0, size, batch):
+        n = min(batch, size - start)
+        chunks = [" ".join(rng.choice(VOCAB, size=words)) for _ in range(n)]
+        vectors = rng.standard_normal((n, DIMENSION)).astype(np.float32)
+        db.add_document(f"doc-{start // batch}", chunks, embeddings=vectors)
+
+
+def save_legacy(db, path):
+    import faiss
+    faiss.write_index(db.index, path + ".faiss")
+    with open(path + ".pkl", "wb") as f:
+        pickle.dump({"metadata": dict(db.metadata.items()), "documents": db.documents}, f)
+
+
+def drop_page_cache(paths):
+    for path in paths:
+        if hasattr(os, "posix_fadvise"):
+            with open(path, "rb") as f:
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+
+
+def store_files(fmt, path):
+    if fmt == "mmap":
+        return [os.path.join(path, name) for name in os.listdir(path)]
+    return [path + ".faiss", path + ".pkl"]
+
+
+def load_in_child(fmt, path):
+    drop_page_cache(store_files(fmt, path))
+    code = f"ROOT = {ROOT!r}\nPATH = {path!r}\nFORMAT = {fmt!r}\nDIMENSION = {DIMENSION}\n" + CHILD
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    if out.returncode != 0:
+        raise RuntimeError(out.stderr)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--words", type=int, default=60, help="words per synthetic chunk")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'chunks':>9} | {'format':<6} | {'disk MB':>8} | {'load s':>7} | {'query s':>7} | {'RSS load MB':>11} | {'RSS query MB':>12}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in args.sizes:
+            mmap_path = os.path.join(tmp_dir, f"store-{size}")
+            legacy_path = os.path.join(tmp_dir, f"legacy-{size}")
+            db = VectorDB(store_dir=mmap_path)
+            build(db, size, rng, args.words)
+            db.save()
+            save_legacy(db, legacy_path)
+            del db
+
+            for fmt, path in (("pickle", legacy_path), ("mmap", mmap_path)):
+                disk_mb = sum(os.path.getsize(p) for p in store_files(fmt, path)) / 1e6
+                r = load_in_child(fmt, path)
+                print(f"{size:>9} | {fmt:<6} | {disk_mb:>8.1f} | {r['load_s']:>7.3f} | {r['query_s']:>7.3f} | "
+                      f"{r['rss_load_mb']:>11.1f} | {r['rss_query_mb']:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
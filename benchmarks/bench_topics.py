@@ -0,0 +1,64 @@
+"""
+Topic map fit and update time as the corpus grows.
+
+Generates clustered unit vectors in the embedding dimension (a known number of
+planted topics plus noise), fits a TopicMap on each corpus size and reports the
+fit time, the purity of the clusters against the planted topics, and the time
+to fold in one more document of --doc-chunks chunks, which is what
+VectorDB.add_document pays between refits.
+
+Usage: python benchmarks/bench_topics.py [--sizes 10000 100000] [--dimension 384] [--planted 40]
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.topics import TopicMap
+
+
+def clustered_vectors(rng, n, dimension, planted, noise):
+    """Returns (unit vectors, planted topic of each)."""
+    centers = rng.normal(size=(planted, dimension)).astype(np.float32)
+    truth = rng.integers(planted, size=n)
+    vectors = centers[truth] / np.sqrt(dimension) + rng.normal(scale=noise, size=(n, dimension)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True), truth
+
+
+def purity(labels, truth):
+    """Share of vectors whose cluster's majority planted topic is their own."""
+    agree = 0
+    for cluster in np.unique(labels):
+        agree += np.bincount(truth[labels == cluster]).max()
+    return agree / len(labels)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--planted", type=int, default=40)
+    parser.add_argument("--noise", type=float, default=0.04)
+    parser.add_argument("--doc-chunks", type=int, default=500)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'chunks':>8} | {'topics':>6} | {'fit s':>6} | {'purity':>6} | {'empty':>5} | add {args.doc_chunks} chunks ms")
+    for n in args.sizes:
+        vectors, truth = clustered_vectors(rng, n + args.doc_chunks, args.dimension, args.planted, args.noise)
+        start = time.perf_counter()
+        topics = TopicMap().fit(np.arange(n), vectors[:n])
+        fit_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        topics.update(np.arange(n, n + args.doc_chunks), vectors[n:])
+        update_ms = (time.perf_counter() - start) * 1000
+        empty = int((topics.sizes() == 0).sum())
+        print(f"{n:>8} | {len(topics):>6} | {fit_seconds:>6.2f} | {purity(topics.labels, truth):>6.3f} | "
+              f"{empty:>5} | {update_ms:.1f}")
+
+
+if __name__ == "__main__":
+    main()
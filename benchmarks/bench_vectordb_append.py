@@ -0,0 +1,59 @@
+"""
+Shows that adding one document to VectorDB costs the same regardless of corpus size.
+
+Usage: python benchmarks/bench_vectordb_append.py
+"""
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.models import VectorDB
+
+DIMENSION = 384
+DOC_CHUNKS = 200
+CORPUS_SIZES = [1_000, 10_000, 50_000, 100_000, 200_000]
+REPEATS = 5
+
+
+def random_doc(rng, n):
+    chunks = [f"chunk {i}" for i in range(n)]
+    return chunks, rng.standard_normal((n, DIMENSION)).astype(np.float32)
+
+
+def main():
+    rng = np.random.default_rng(0)
+    db = VectorDB()
+    corpus = 0
+    doc_counter = 0
+
+    print(f"{'corpus chunks':>14} | {'add doc (ms)':>12} | {'search (ms)':>11}")
+    for size in CORPUS_SIZES:
+        # Grow the corpus up to the target size in document-sized batches
+        while corpus < size:
+            n = min(5_000, size - corpus)
+            chunks, vectors = random_doc(rng, n)
+            db.add_document(f"bulk-{doc_counter}", chunks, embeddings=vectors)
+            doc_counter += 1
+            corpus += n
+
+        timings = []
+        for _ in range(REPEATS):
+            chunks, vectors = random_doc(rng, DOC_CHUNKS)
+            start = time.perf_counter()
+            db.add_document("probe", chunks, embeddings=vectors)
+            timings.append(time.perf_counter() - start)
+            db.remove_document("probe")
+
+        query = rng.standard_normal((1, DIMENSION)).astype(np.float32)
+        start = time.perf_counter()
+        db.index.search(query, 5)
+        search_ms = (time.perf_counter() - start) * 1000
+
+        print(f"{size:>14,} | {np.median(timings) * 1000:>12.2f} | {search_ms:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
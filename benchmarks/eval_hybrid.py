@@ -0,0 +1,111 @@
+"""
+Offline evaluation of hybrid (BM25 + dense, RRF-fused) retrieval.
+
+Part 1 - hit rate@k, dense-only vs. hybrid. Each query targets one known chunk.
+  By default the corpus is synthetic study text in which some chunks define
+  exact terms (acronyms, formula names, codes) that the embedding model has
+  never seen; queries name that term. With --doc, chunks come from a real
+  PDF/PPTX/DOCX and each query is built from the rarest words of a random chunk.
+Part 2 - BM25 query latency (p50/p95) on a large synthetic corpus.
+
+Usage: python benchmarks/eval_hybrid.py [--doc notes.pdf] [--k 4] [--latency-chunks 1000000]
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.lexical import LexicalIndex, tokenize
+from src.models import VectorDB
+
+FILLER = (
+    "The reaction rate depends on temperature and concentration. Energy is transferred "
+    "between systems as heat or work. Cells regulate their internal environment through "
+    "membranes and transport proteins. Markets balance supply and demand through prices."
+).split(". ")
+TOPICS = ["enzyme", "circuit", "protocol", "theorem", "pathway", "reagent", "algorithm", "compound"]
+
+
+def synthetic_corpus(rng, n_chunks, n_terms):
+    """Returns (chunks, [(query, target chunk index)])."""
+    chunks = [". ".join(rng.choice(FILLER, size=4)) + "." for _ in range(n_chunks)]
+    queries = []
+    for target in rng.choice(n_chunks, size=n_terms, replace=False):
+        letters = "".join(rng.choice(list("ABCDEFGHKLMNPQRSTVWXZ"), size=3))
+        term = f"{letters}-{rng.integers(10, 99)}"
+        topic = rng.choice(TOPICS)
+        chunks[target] = f"The {term} {topic} is defined as follows. " + chunks[target]
+        queries.append((f"What is the {term} {topic}?", int(target)))
+    return chunks, queries
+
+
+def document_corpus(rng, path, n_queries):
+    from src.pipeline import ingest_document
+    records, _ = ingest_document(path, embed_fn=lambda texts: np.zeros((len(texts), 1), dtype=np.float32))
+    chunks = [record["text"] for record in records]
+    index = LexicalIndex()
+    index.add(list(range(len(chunks))), chunks)
+    queries = []
+    for target in rng.choice(len(chunks), size=min(n_queries, len(chunks)), replace=False):
+        terms = set(tokenize(chunks[target]))
+        # Rarest terms first, i.e. the ones with the shortest postings
+        rare = sorted(terms, key=lambda t: len(index._postings(index.vocab[t])[0]))[:3]
+        queries.append((" ".join(rare), int(target)))
+    return chunks, queries
+
+
+def hit_rate(db, queries, k, mode):
+    results = db.search_batch([query for query, _ in queries], k=k, mode=mode)
+    return np.mean([target in {hit["id"] for hit in hits} for (_, target), hits in zip(queries, results)])
+
+
+def bm25_latency(rng, n_chunks, n_queries=200):
+    vocab = [f"w{i}" for i in range(50_000)]
+    # Zipf-like word frequencies, as in real text
+    weights = 1.0 / np.arange(1, len(vocab) + 1)
+    weights /= weights.sum()
+    index = LexicalIndex()
+    batch = 50_000
+    for start in range(0, n_chunks, batch):
+        words = rng.choice(len(vocab), size=(min(batch, n_chunks - start), 60), p=weights)
+        index.add(list(range(start, start + len(words))), [" ".join(vocab[w] for w in row) for row in words])
+    timings = []
+    for _ in range(n_queries):
+        query = " ".join(vocab[w] for w in rng.choice(len(vocab), size=4, p=weights))
+        start = time.perf_counter()
+        index.search(query, k=16)
+        timings.append((time.perf_counter() - start) * 1000)
+    return np.percentile(timings, 50), np.percentile(timings, 95), index.memory_bytes() / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--doc", help="evaluate on a real document instead of the synthetic corpus")
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--latency-chunks", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    if args.doc:
+        chunks, queries = document_corpus(rng, args.doc, args.queries)
+    else:
+        chunks, queries = synthetic_corpus(rng, args.chunks, args.queries)
+
+    db = VectorDB()
+    db.add_document("eval", chunks)
+    print(f"== Hit rate@{args.k} over {len(chunks)} chunks, {len(queries)} queries ==")
+    for mode in ("dense", "hybrid"):
+        print(f"{mode:<7} | {hit_rate(db, queries, args.k, mode):.3f}")
+
+    print(f"\n== BM25 query latency over {args.latency_chunks} chunks ==")
+    p50, p95, mb = bm25_latency(rng, args.latency_chunks)
+    print(f"p50 {p50:.2f} ms | p95 {p95:.2f} ms | index {mb:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Local stand-in for the Hugging Face chat-completion endpoint.
+
+Answers POST /v1/chat/completions (blocking and streaming) with the canned,
+well-formed answers of `StubBackend` after a configurable latency, so the API
+can be load-tested over HTTP without network access or rate limits.
+(LLM_BACKEND=stub gives the same answers in-process, without the HTTP hop.)
+
+Usage:
+    python benchmarks/stub_inference_server.py --port 8080 --latency 2.0
+    HF_INFERENCE_URL=http://127.0.0.1:8080 uvicorn app:app --workers 1
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import uuid
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.llm_backends import stub_completion, stub_tokens
+
+app = FastAPI(title="Stub inference server")
+app.state.latency = 1.0
+app.state.tokens_per_second = 200.0
+
+
+def _completion(content, model):
+    return {
+        "id": f"stub-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "system_fingerprint": "stub",
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+            "logprobs": None,
+        }],
+        "usage": {"prompt_tokens": 0, "completion_tokens": len(stub_tokens(content)), "total_tokens": 0},
+    }
+
+
+def _chunk(delta, model, finish_reason=None):
+    return {
+        "id": "stub",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "system_fingerprint": "stub",
+        "choices": [{
+            "index": 0,
+            "delta": {"role": "assistant", "content": delta},
+            "finish_reason": finish_reason,
+            "logprobs": None,
+        }],
+    }
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    model = body.get("model") or "stub"
+    tokens = stub_tokens(stub_completion(body.get("messages") or []))[: body.get("max_tokens") or None]
+
+    if not body.get("stream"):
+        # Time to first token plus decode time for the whole answer
+        await asyncio.sleep(app.state.latency + len(tokens) / app.state.tokens_per_second)
+        return _completion("".join(tokens), model)
+
+    async def events():
+        await asyncio.sleep(app.state.latency)
+        for token in tokens:
+            yield f"data: {json.dumps(_chunk(token, model))}\n\n"
+            await asyncio.sleep(1 / app.state.tokens_per_second)
+        yield f"data: {json.dumps(_chunk('', model, 'stop'))}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=1.0, help="seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    args = parser.parse_args()
+    app.state.latency = args.latency
+    app.state.tokens_per_second = args.tokens_per_second
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
@@ -0,0 +1,103 @@
+"""
+Deterministic synthetic lecture documents for the benchmarks.
+
+Every format gets the same kind of content: a titled page / slide / section
+per unit, a few paragraphs of topic sentences drawn from a fixed vocabulary
+(so retrieval queries have something to hit), and a running footer on PDF
+pages like real lecture decks have.
+
+Usage: python benchmarks/synthetic_docs.py --out fixtures_dir --pages 10 100
+"""
+import argparse
+import os
+import numpy as np
+
+SUBJECTS = ["Enzymes", "The active site", "Temperature", "Competitive inhibition", "Feedback inhibition",
+            "ATP hydrolysis", "The cell membrane", "Diffusion", "Osmosis", "The sodium pump",
+            "Photosynthesis", "The Calvin cycle", "Glycolysis", "Oxidative phosphorylation"]
+VERBS = ["controls", "limits", "increases", "depends on", "is measured by", "changes", "regulates"]
+OBJECTS = ["the reaction rate", "substrate binding", "activation energy", "ion gradients", "metabolic flux",
+           "water potential", "membrane transport", "protein folding", "glucose uptake", "oxygen release"]
+# Retrieval queries that match the vocabulary above
+QUERIES = ["enzyme active site", "membrane transport and osmosis", "ATP production", "photosynthesis light",
+           "competitive inhibition of enzymes", "glycolysis and glucose uptake"]
+FORMATS = ("pdf", "pptx", "docx")
+
+
+def unit_text(rng, unit, sentences=12):
+    """Title plus `sentences` topic sentences split into paragraphs."""
+    lines = []
+    for _ in range(sentences // 3):
+        lines.append(" ".join(
+            f"{rng.choice(SUBJECTS)} {rng.choice(VERBS)} {rng.choice(OBJECTS)} in experiment {rng.integers(1000)}."
+            for _ in range(3)))
+    return f"Unit {unit}: {rng.choice(SUBJECTS)}", lines
+
+
+def make_pdf(path, pages, seed=0):
+    import fitz
+    rng = np.random.default_rng(seed)
+    doc = fitz.open()
+    for i in range(1, pages + 1):
+        title, paragraphs = unit_text(rng, i)
+        page = doc.new_page()
+        page.insert_textbox(page.rect + (40, 40, -40, -80), title + "\n\n" + "\n\n".join(paragraphs), fontsize=10)
+        page.insert_text((40, page.rect.height - 40), f"BIO 201 Cell Biology - Page {i} of {pages}", fontsize=8)
+    doc.save(path)
+    doc.close()
+
+
+def make_pptx(path, pages, seed=0):
+    from pptx import Presentation
+    rng = np.random.default_rng(seed)
+    deck = Presentation()
+    layout = deck.slide_layouts[1]  # title and content
+    for i in range(1, pages + 1):
+        title, paragraphs = unit_text(rng, i, sentences=6)
+        slide = deck.slides.add_slide(layout)
+        slide.shapes.title.text = title
+        body = slide.placeholders[1].text_frame
+        body.text = paragraphs[0]
+        for paragraph in paragraphs[1:]:
+            body.add_paragraph().text = paragraph
+    deck.save(path)
+
+
+def make_docx(path, pages, seed=0):
+    from docx import Document
+    rng = np.random.default_rng(seed)
+    document = Document()
+    for i in range(1, pages + 1):
+        title, paragraphs = unit_text(rng, i)
+        document.add_heading(title, level=1)
+        for paragraph in paragraphs:
+            document.add_paragraph(paragraph)
+    document.save(path)
+
+
+MAKERS = {"pdf": make_pdf, "pptx": make_pptx, "docx": make_docx}
+
+
+def ensure_fixture(directory, fmt, pages, seed=0):
+    """Returns the path of the `pages`-unit fixture in `fmt`, generating it once."""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"lecture-{pages}.{fmt}")
+    if not os.path.exists(path):
+        MAKERS[fmt](path, pages, seed)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--out", default="cache/fixtures")
+    parser.add_argument("--formats", nargs="+", default=list(FORMATS), choices=FORMATS)
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 50, 200])
+    args = parser.parse_args()
+    for fmt in args.formats:
+        for pages in args.pages:
+            path = ensure_fixture(args.out, fmt, pages)
+            print(f"{path}: {os.path.getsize(path) / 1e3:.0f} kB")
+
+
+if __name__ == "__main__":
+    main()
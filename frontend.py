@@ -1,7 +1,9 @@
 import streamlit as st
 import requests
-import re
+import html
+import json
 import time
+import uuid
 
 # --- APP CONFIGURATION ---
 st.set_page_config(
@@ -118,74 +120,85 @@ API_URL = "http://127.0.0.1:8000"
 # --- STATE MANAGEMENT ---
 if 'processed' not in st.session_state: st.session_state.processed = False
 if 'quiz_content' not in st.session_state: st.session_state.quiz_content = ""
+if 'exam' not in st.session_state: st.session_state.exam = None
+# Scopes uploads and generations to this browser session's own index
+if 'session_id' not in st.session_state: st.session_state.session_id = uuid.uuid4().hex
 
-# --- PARSING LOGIC ---
-def render_beautiful_exam(raw_text):
+# --- RENDERING ---
+def render_exam(exam, show_explanations=True):
     """
-    Splits the text by '###' to separates Case Studies, 
-    then finds questions using Regex.
+    Renders the structured exam returned by the backend. The backend parses
+    and validates the generation once, so no text parsing happens here.
     """
-    
-    # 1. Split by "###" (The marker for Case Studies)
-    sections = raw_text.split("###")
-    
-    for section in sections:
-        section = section.strip()
-        if not section: continue
-        
-        # Check if this section is a Case Study
-        if "CASE STUDY" in section.upper():
-            lines = section.splitlines()
-            title = lines[0].replace("CASE STUDY", "").replace(":", "").strip()
-            
-            # Separate body text from questions (Questions start with numbers like "1.")
-            body_text = []
-            questions_text = []
-            capture_questions = False
-            
-            for line in lines[1:]:
-                if re.match(r'^\d+\.', line.strip()): # Detects "1. ", "2. "
-                    capture_questions = True
-                
-                if capture_questions:
-                    questions_text.append(line)
-                else:
-                    body_text.append(line)
-            
-            # RENDER CASE STUDY CARD
+    for case in exam.get("cases", []):
+        st.markdown(f"""
+        <div class="case-container">
+            <div class="case-header">📂 Case Study {html.escape(case['label'])}: {html.escape(case['title'])}</div>
+            <div class="case-body">{html.escape(case['scenario'])}</div>
+        </div>
+        """, unsafe_allow_html=True)
+
+        for q in case["questions"]:
+            if q["issues"]:
+                st.warning(f"Question {q['number']} could not be generated cleanly: {'; '.join(q['issues'])}")
+                if not q["text"]:
+                    continue
+            options = "".join(
+                f"<div>{html.escape(o['label'])}) {html.escape(o['text'])}</div>" for o in q["options"]
+            )
+            answer = ""
+            if q["answer_text"]:
+                explanation = f"<br><i>{html.escape(q['explanation'])}</i>" if show_explanations and q["explanation"] else ""
+                answer = f"<div class='answer-key'>✅ <b>Answer:</b> {html.escape(q['answer_text'])}{explanation}</div>"
             st.markdown(f"""
-            <div class="case-container">
-                <div class="case-header">📂 Case Study: {title}</div>
-                <div class="case-body">{' '.join(body_text)}</div>
+            <div class="question-container">
+                <div class="question-header">Question {q['number']}</div>
+                <div style="color: #ccc;">{html.escape(q['text'])}{options}</div>
+                {answer}
             </div>
             """, unsafe_allow_html=True)
-            
-            # RENDER QUESTIONS (If any found in this section)
-            if questions_text:
-                q_block = "\n".join(questions_text)
-                # Split questions by number to make individual cards
-                # This regex looks for a digit followed by a dot at start of line
-                individual_qs = re.split(r'(?=\d+\.)', q_block)
-                
-                for q in individual_qs:
-                    if q.strip():
-                        # Highlight Answer if present
-                        q_html = q.replace("\n", "<br>")
-                        # Style the answer part green if possible
-                        if "Answer:" in q_html:
-                            parts = q_html.split("Answer:")
-                            q_html = f"{parts[0]}<div class='answer-key'>✅ <b>Answer:</b> {parts[1]}</div>"
-                        
-                        st.markdown(f"""
-                        <div class="question-container">
-                            <div class="question-header">Question</div>
-                            <div style="color: #ccc;">{q_html}</div>
-                        </div>
-                        """, unsafe_allow_html=True)
-        
-        else:
-            # Fallback for text that isn't a case study (Intro/Outro)
-            st.markdown(f"<div style='padding:10px;'>{section}</div>", unsafe_allow_html=True)
+
+# --- STREAMING ---
+def stream_generation(payload, placeholder, show_explanations=True, refresh_every=0.3):
+    """
+    Consumes the /generate/stream server-sent events and shows the generation
+    in `placeholder` as it arrives: the exam parsed so far (`partial` events)
+    with the same renderer as the final exam, or the raw text until the first
+    case study has been parsed. Returns (full text, structured exam or None).
+    """
+    text = ""
+    exam = None
+    partial = None
+    last_render = 0.0
+    event = None
+    with requests.post(f"{API_URL}/generate/stream", json=payload, stream=True) as res:
+        for line in res.iter_lines(decode_unicode=True):
+            if line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                data = json.loads(line[len("data:"):].strip())
+                if event == "error":
+                    st.error(data.get("error", "Generation failed"))
+                    return "", None
+                if event == "exam":
+                    exam = data
+                elif event == "partial":
+                    partial = data
+                elif event is None:
+                    # Plain `data:` events are text; `context` and `end` carry no text
+                    text += data
+            elif not line:
+                event = None
+
+            if time.time() - last_render > refresh_every:
+                with placeholder.container():
+                    st.caption("🧠 Drafting questions...")
+                    if partial:
+                        render_exam(partial, show_explanations)
+                    else:
+                        st.text(text)
+                last_render = time.time()
+    return text, exam
 
 # --- SIDEBAR ---
 with st.sidebar:
@@ -200,39 +213,49 @@ with st.sidebar:
         with st.spinner("🔄 Ingesting Content..."):
             try:
                 files = {"file": (uploaded_file.name, uploaded_file, uploaded_file.type)}
-                res = requests.post(f"{API_URL}/upload", files=files)
-                if res.status_code == 200:
+                data = {"session_id": st.session_state.session_id}
+                res = requests.post(f"{API_URL}/upload", files=files, data=data)
+                body = res.json() if res.headers.get("content-type", "").startswith("application/json") else {}
+                if res.status_code == 200 and "error" not in body:
                     st.success("✅ File Processed!")
                     st.session_state.processed = True
                     time.sleep(1)
                     st.rerun()
                 else:
-                    st.error("Upload Failed")
+                    st.error(f"Upload Failed: {body.get('error', res.status_code)}")
             except:
                 st.error("❌ Backend Offline")
 
     st.markdown("---")
     st.markdown("### 🛠️ Controls")
     st.toggle("Deep Context Mode", value=True)
-    st.toggle("Show Explanations", value=True)
+    show_explanations = st.toggle("Show Explanations", value=True)
+    fresh_variant = st.toggle("Fresh Variant", value=False, help="Skip cached exams and generate a new version")
 
 # --- MAIN PAGE ---
 st.title("Exam Simulation")
 st.markdown("Generate real-world scenarios and test your knowledge.")
 
 if st.session_state.processed:
+    topics_input = st.text_input("🎯 Focus topics (optional, comma-separated)", placeholder="e.g. photosynthesis, cell respiration")
+    topics = [t.strip() for t in topics_input.split(",") if t.strip()]
+
     if st.button("✨ Generate New Exam"):
-        with st.spinner("🧠 Analyzing content & drafting questions..."):
-            try:
-                res = requests.post(f"{API_URL}/generate", json={"request_type": "quiz"})
-                st.session_state.quiz_content = res.json().get("result", "")
-            except:
-                st.error("Backend Connection Error")
+        payload = {"request_type": "quiz", "session_id": st.session_state.session_id, "topics": topics, "fresh": fresh_variant}
+        live_view = st.empty()
+        try:
+            streamed, exam = stream_generation(payload, live_view, show_explanations)
+            st.session_state.quiz_content = streamed
+            st.session_state.exam = exam
+        except:
+            st.error("Backend Connection Error")
+        # The final render below takes over from the live view
+        live_view.empty()
 
     # --- RENDER RESULTS ---
-    if st.session_state.quiz_content:
+    if st.session_state.exam:
         st.markdown("---")
-        render_beautiful_exam(st.session_state.quiz_content)
+        render_exam(st.session_state.exam, show_explanations)
         
         st.markdown("---")
         st.download_button(
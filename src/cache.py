@@ -0,0 +1,147 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import numpy as np
+
+CHUNKS_FILE = "chunks.json"
+EMBEDDINGS_FILE = "embeddings.npy"
+
+
+def hash_file(file_path, block_size=1 << 20):
+    """Returns the SHA-256 hex digest of a file's content."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class IngestCache:
+    """
+    Content-addressed cache of ingestion results (chunks + embedding matrix).
+
+    Entries are keyed by the file content hash, the chunking parameters and the
+    embedding model name, so changing any of them produces a fresh entry.
+    Each entry is a directory on disk; its mtime is used as the LRU clock and
+    the oldest entries are evicted once the cache grows past `max_bytes`.
+    """
+
+    def __init__(self, cache_dir="cache/ingest", max_bytes=512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(content_hash, model_name, **chunk_params):
+        """Builds the cache key from the content hash and everything that affects the output."""
+        params = json.dumps(chunk_params, sort_keys=True)
+        raw = f"{content_hash}|{model_name}|{params}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _entry_dir(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def get(self, key):
+        """
+        Returns (chunks, embeddings) for a cached key, or None on a miss.
+        A hit refreshes the entry's position in the LRU order.
+        """
+        entry = self._entry_dir(key)
+        try:
+            with open(os.path.join(entry, CHUNKS_FILE), "r", encoding="utf-8") as f:
+                chunks = json.load(f)
+            embeddings = np.load(os.path.join(entry, EMBEDDINGS_FILE))
+            os.utime(entry)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return chunks, embeddings
+
+    def put(self, key, chunks, embeddings):
+        """
+        Stores an entry atomically, then evicts old entries if over budget.
+        Keys are content-addressed, so if another put of the same key got there
+        first its entry is kept as it is (a reader may be using it).
+        """
+        entry = self._entry_dir(key)
+        tmp = f"{entry}.tmp-{os.getpid()}-{threading.get_ident()}"
+        os.makedirs(tmp, exist_ok=True)
+        try:
+            with open(os.path.join(tmp, CHUNKS_FILE), "w", encoding="utf-8") as f:
+                json.dump(chunks, f)
+            np.save(os.path.join(tmp, EMBEDDINGS_FILE), np.asarray(embeddings, dtype=np.float32))
+            try:
+                os.replace(tmp, entry)
+            except OSError:
+                if not os.path.isdir(entry):
+                    raise
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+        self.evict()
+
+    def _entries(self):
+        """Returns [(mtime, size, path)] for every complete entry."""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if ".tmp-" in name or not os.path.isdir(path):
+                continue
+            try:
+                size = sum(
+                    os.path.getsize(os.path.join(path, f)) for f in os.listdir(path)
+                )
+                entries.append((os.path.getmtime(path), size, path))
+            except OSError:
+                continue
+        return entries
+
+    def size_bytes(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        """Removes least-recently-used entries until the cache fits in `max_bytes`."""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            with self._lock:
+                self.evictions += 1
+
+    def stats(self):
+        entries = self._entries()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(entries),
+            "size_bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+        }
+
+
+# --- Testing Block ---
+if __name__ == "__main__":
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = IngestCache(cache_dir=tmp_dir)
+        key = IngestCache.make_key("abc123", "all-MiniLM-L6-v2", chunk_size=300, overlap=50)
+        print(f"First lookup: {cache.get(key)}")
+        cache.put(key, ["chunk one", "chunk two"], np.zeros((2, 384), dtype=np.float32))
+        chunks, embeddings = cache.get(key)
+        print(f"Second lookup: {len(chunks)} chunks, embeddings {embeddings.shape}")
+        print(cache.stats())
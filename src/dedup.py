@@ -0,0 +1,282 @@
+"""
+Near-duplicate chunk detection with MinHash signatures and LSH banding.
+
+A chunk is reduced to the set of its 3-word shingles, and the shingle set to a
+MinHash signature of `bands * rows` values. Each band of `rows` values is hashed
+into one 64-bit bucket key, so two chunks become candidates when any band
+matches, which happens with high probability above roughly
+(1 / bands) ** (1 / rows) Jaccard similarity (0.68 for the defaults). Candidates
+are then confirmed with the exact Jaccard similarity of their shingle sets
+against `threshold`.
+
+Every step is per chunk: sketching costs O(chunk length) and a lookup O(bands)
+bucket probes, so checking N chunks is linear in N. A bucket holds every chunk
+registered under its key, so removing one chunk never hides the others. Bucket
+entries live in one sorted array (memory-mapped after a load) plus a dict for
+entries added since; the dict is folded into the array once it reaches a
+fraction of it.
+"""
+import os
+import threading
+import numpy as np
+
+from src.storage import open_array
+
+SHINGLE_WORDS = 3
+DEDUP_THRESHOLD = 0.8
+LSH_BANDS = 10
+LSH_ROWS = 6
+KEYS_FILE = "dedup_keys.u64"
+IDS_FILE = "dedup_ids.u32"
+# Keys added since the last merge are folded into the sorted base at this share of it
+MERGE_RATIO = 0.5
+MERGE_MIN = 65536
+
+_rng = np.random.default_rng(0x5EED)
+_PERM_A = _rng.integers(1, 2 ** 63, size=LSH_BANDS * LSH_ROWS, dtype=np.uint64) | np.uint64(1)
+_PERM_B = _rng.integers(0, 2 ** 63, size=LSH_BANDS * LSH_ROWS, dtype=np.uint64)
+_ROW_MIX = _rng.integers(1, 2 ** 63, size=LSH_ROWS, dtype=np.uint64) | np.uint64(1)
+_BAND_SALT = _rng.integers(0, 2 ** 63, size=LSH_BANDS, dtype=np.uint64)
+_SHINGLE_MIX = np.array([0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 1], dtype=np.uint64)
+# Word characters: ASCII letters, digits and "_", plus every non-ASCII code point
+_ASCII_WORD = np.zeros(128, dtype=bool)
+for _c in "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_":
+    _ASCII_WORD[ord(_c)] = True
+# Per-position multipliers for the word hashes: (M ** k mod 2 ** 64) // M for the
+# FNV prime M. Wrap-around makes these scrambled constants rather than powers of M;
+# positions past 63 share the last one. Stored bucket keys depend on these values.
+_POW = np.cumprod(np.full(64, 0x100000001B3, dtype=np.uint64)) // np.uint64(0x100000001B3)
+
+
+def word_hashes(text):
+    """
+    64-bit polynomial hash of every word of `text`, computed over the code
+    points with array operations instead of one Python call per word.
+    """
+    codes = np.frombuffer(text.lower().encode("utf-32-le"), dtype=np.uint32)
+    is_word = (codes >= 128) | _ASCII_WORD[np.minimum(codes, 127)]
+    chars = np.flatnonzero(is_word)
+    if len(chars) == 0:
+        return np.zeros(0, dtype=np.uint64)
+    starts_mask = is_word.copy()
+    starts_mask[1:] &= ~is_word[:-1]
+    starts = np.flatnonzero(starts_mask)
+    word_of_char = np.cumsum(starts_mask)[chars] - 1
+    position = np.minimum(chars - starts[word_of_char], len(_POW) - 1)
+    values = codes[chars].astype(np.uint64) * _POW[position]
+    return np.add.reduceat(values, np.searchsorted(chars, starts))
+
+
+def shingles(text):
+    """Sorted unique 64-bit hashes of the 3-word shingles of `text` (shorter texts: one shingle)."""
+    tokens = word_hashes(text)
+    if len(tokens) == 0:
+        return tokens
+    if len(tokens) < SHINGLE_WORDS:
+        tokens = np.concatenate([np.zeros(SHINGLE_WORDS - len(tokens), dtype=np.uint64), tokens])
+    n = len(tokens) - SHINGLE_WORDS + 1
+    combined = tokens[:n] * _SHINGLE_MIX[0]
+    for offset in range(1, SHINGLE_WORDS):
+        combined += tokens[offset:offset + n] * _SHINGLE_MIX[offset]
+    return np.unique(combined)
+
+
+def minhash(shingle_hashes):
+    """MinHash signature: per permutation, the smallest multiply-shift hash over all shingles."""
+    hashed = (_PERM_A[:, None] * shingle_hashes[None, :] + _PERM_B[:, None]) >> np.uint64(32)
+    return hashed.min(axis=1)
+
+
+def band_keys(signature):
+    """One 64-bit bucket key per LSH band."""
+    bands = signature.reshape(LSH_BANDS, LSH_ROWS)
+    keys = (bands * _ROW_MIX).sum(axis=1) ^ _BAND_SALT
+    # Final avalanche so nearby sums land in unrelated buckets
+    keys ^= keys >> np.uint64(33)
+    keys *= np.uint64(0xFF51AFD7ED558CCD)
+    keys ^= keys >> np.uint64(33)
+    return keys
+
+
+def jaccard(a, b):
+    """Exact Jaccard similarity of two sorted unique shingle arrays."""
+    if len(a) == 0 or len(b) == 0:
+        return 0.0
+    common = len(np.intersect1d(a, b, assume_unique=True))
+    return common / (len(a) + len(b) - common)
+
+
+class NearDuplicateIndex:
+    """
+    LSH bucket index keyed by chunk id. `find` returns the most similar
+    indexed chunk at or above `threshold`; shingles of candidates are fetched
+    through a callback, so the index itself stores only bucket keys and ids
+    (LSH_BANDS * 12 bytes per chunk).
+    """
+
+    def __init__(self, threshold=DEDUP_THRESHOLD):
+        self.threshold = threshold
+        self._base_keys = np.zeros(0, dtype=np.uint64)
+        self._base_ids = np.zeros(0, dtype=np.uint32)
+        self._recent = {}  # bucket key -> [chunk ids] added since the last merge
+        self._recent_entries = 0
+        self._removed = set()  # removed ids still present in the base arrays
+
+    def __len__(self):
+        """Bucket entries, counting those of removed chunks until the next merge."""
+        return len(self._base_keys) + self._recent_entries
+
+    @staticmethod
+    def sketch(text):
+        """Returns (shingles, band keys); both empty for text without words."""
+        shingle_hashes = shingles(text)
+        if len(shingle_hashes) == 0:
+            return shingle_hashes, shingle_hashes
+        return shingle_hashes, band_keys(minhash(shingle_hashes))
+
+    def candidates(self, keys):
+        """Every live chunk id registered under any of `keys`."""
+        found = set()
+        for key in keys.tolist():
+            found.update(self._recent.get(key, ()))
+        if len(self._base_keys):
+            starts = np.searchsorted(self._base_keys, keys, side="left")
+            ends = np.searchsorted(self._base_keys, keys, side="right")
+            for start, end in zip(starts.tolist(), ends.tolist()):
+                found.update(self._base_ids[start:end].tolist())
+        return found - self._removed if self._removed else found
+
+    def find(self, shingle_hashes, keys, get_shingles):
+        """
+        Returns (chunk id, similarity) of the best match at or above the threshold,
+        or (None, 0.0). `get_shingles(chunk_id)` returns a candidate's shingles,
+        or None if that chunk no longer exists.
+        """
+        best, best_similarity = None, 0.0
+        if len(keys) == 0:
+            return best, best_similarity
+        for chunk_id in self.candidates(keys):
+            other = get_shingles(chunk_id)
+            if other is None:
+                continue
+            similarity = jaccard(shingle_hashes, other)
+            if similarity >= self.threshold and similarity > best_similarity:
+                best, best_similarity = chunk_id, similarity
+        return best, best_similarity
+
+    def add(self, chunk_id, keys):
+        for key in keys.tolist():
+            self._recent.setdefault(key, []).append(chunk_id)
+        self._recent_entries += len(keys)
+        if self._recent_entries > max(MERGE_MIN, MERGE_RATIO * len(self._base_keys)):
+            self._merge()
+
+    def remove(self, ids):
+        """Drops the buckets of removed chunks so they are never offered as candidates."""
+        ids = {int(chunk_id) for chunk_id in ids}
+        for key in list(self._recent):
+            kept = [chunk_id for chunk_id in self._recent[key] if chunk_id not in ids]
+            self._recent_entries -= len(self._recent[key]) - len(kept)
+            if kept:
+                self._recent[key] = kept
+            else:
+                del self._recent[key]
+        if len(self._base_ids):
+            self._removed.update(ids)
+
+    def _merge(self, live_ids=None):
+        recent_keys = [key for key, ids in self._recent.items() for _ in ids]
+        recent_ids = [chunk_id for ids in self._recent.values() for chunk_id in ids]
+        keys = np.concatenate([self._base_keys, np.array(recent_keys, dtype=np.uint64)])
+        ids = np.concatenate([self._base_ids, np.array(recent_ids, dtype=np.uint32)])
+        if live_ids is not None:
+            live = np.isin(ids, live_ids)
+            keys, ids = keys[live], ids[live]
+        elif self._removed:
+            live = ~np.isin(ids, np.fromiter(self._removed, np.uint32, len(self._removed)))
+            keys, ids = keys[live], ids[live]
+        order = np.argsort(keys, kind="stable")
+        self._base_keys, self._base_ids = keys[order], ids[order]
+        self._recent = {}
+        self._recent_entries = 0
+        self._removed = set()
+
+    def memory_bytes(self):
+        private = len(self._recent) * 100 + self._recent_entries * 32
+        if not isinstance(self._base_keys, np.memmap):
+            private += self._base_keys.nbytes + self._base_ids.nbytes
+        return private
+
+    def save(self, directory, live_ids):
+        """Writes the buckets of `live_ids` as one sorted array pair."""
+        self._merge(live_ids)
+        self._base_keys.tofile(os.path.join(directory, KEYS_FILE))
+        self._base_ids.tofile(os.path.join(directory, IDS_FILE))
+
+    @staticmethod
+    def exists(directory):
+        return os.path.exists(os.path.join(directory, KEYS_FILE))
+
+    @classmethod
+    def open(cls, directory, threshold=DEDUP_THRESHOLD):
+        index = cls(threshold)
+        index._base_keys = open_array(directory, KEYS_FILE, np.uint64)
+        index._base_ids = open_array(directory, IDS_FILE, np.uint32)
+        return index
+
+
+class DedupStats:
+    """Process-wide counters for /dedup/stats."""
+
+    def __init__(self):
+        self.chunks_checked = 0
+        self.duplicates = 0
+        self.embeddings_avoided = 0
+        self._lock = threading.Lock()
+
+    def record(self, checked, duplicates, embeddings_avoided):
+        with self._lock:
+            self.chunks_checked += checked
+            self.duplicates += duplicates
+            self.embeddings_avoided += embeddings_avoided
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "chunks_checked": self.chunks_checked,
+                "duplicates": self.duplicates,
+                "embeddings_avoided": self.embeddings_avoided,
+            }
+
+
+dedup_stats = DedupStats()
+
+
+# --- Testing Block ---
+if __name__ == "__main__":
+    import time
+
+    rng = np.random.default_rng(1)
+    words = [f"w{i}" for i in range(5000)]
+    texts = [" ".join(rng.choice(words, size=150)) for _ in range(20000)]
+    # Every 10th text is a copy of an earlier one with a few words changed
+    for i in range(10, len(texts), 10):
+        copy = texts[i - 7].split()
+        copy[rng.integers(len(copy))] = "edited"
+        texts[i] = " ".join(copy)
+
+    index = NearDuplicateIndex()
+    kept = {}
+    duplicates = 0
+    start = time.perf_counter()
+    for chunk_id, text in enumerate(texts):
+        sh, keys = index.sketch(text)
+        match, _ = index.find(sh, keys, kept.get)
+        if match is None:
+            index.add(chunk_id, keys)
+            kept[chunk_id] = sh
+        else:
+            duplicates += 1
+    seconds = time.perf_counter() - start
+    print(f"{duplicates} duplicates of {len(texts) // 10 - 1} planted, "
+          f"{len(texts) / seconds:,.0f} chunks/s, {index.memory_bytes() / 1e6:.1f} MB")
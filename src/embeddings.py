@@ -0,0 +1,134 @@
+import threading
+import time
+import numpy as np
+
+from src.metrics import observe_stage
+
+
+class EmbeddingService:
+    """
+    Batched sentence-embedding encoder with throughput accounting.
+
+    Inputs are sorted by length (longest first) and cut into fixed-size batches,
+    so each batch pads to similar lengths instead of to the longest text in the
+    whole call. Results are returned in the caller's original order.
+
+    torch, sentence-transformers and the model weights are only loaded on first
+    use (or by `warm_up`), so constructing the service is free.
+
+    `token_spans` exposes the model's fast tokenizer to the chunker, so chunk
+    sizes are measured in the same tokens the model truncates on.
+    """
+
+    def __init__(self, model_name="all-MiniLM-L6-v2", batch_size=64, num_threads=None,
+                 normalize=False, sort_by_length=True, device="cpu"):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.num_threads = num_threads
+        self.normalize = normalize
+        self.sort_by_length = sort_by_length
+        self.device = device
+        self.chunks_encoded = 0
+        self.seconds = 0.0
+        self._stats_lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._model = None
+        self._tokenizer = None
+        self.dimension = None
+
+    @property
+    def loaded(self):
+        return self._model is not None
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    if self.num_threads:
+                        import torch
+                        torch.set_num_threads(self.num_threads)
+                    from sentence_transformers import SentenceTransformer
+                    model = SentenceTransformer(self.model_name, device=self.device)
+                    self.dimension = model.get_sentence_embedding_dimension()
+                    self._model = model
+        return self._model
+
+    @property
+    def tokenizer(self):
+        """
+        A separate instance of the model's fast (Rust) tokenizer. It is not shared
+        with the model, whose encode calls reconfigure truncation on every batch.
+        """
+        if self._tokenizer is None:
+            with self._load_lock:
+                if self._tokenizer is None:
+                    from transformers import AutoTokenizer
+                    name = self.model_name if "/" in self.model_name else f"sentence-transformers/{self.model_name}"
+                    tokenizer = AutoTokenizer.from_pretrained(name, use_fast=True).backend_tokenizer
+                    tokenizer.no_truncation()
+                    tokenizer.no_padding()
+                    self._tokenizer = tokenizer
+        return self._tokenizer
+
+    def token_spans(self, texts):
+        """
+        Tokenizes `texts` in one parallel batch call. Returns, per text, an int array
+        of shape (n_tokens, 2) with the character [start, end) of every token.
+        """
+        encodings = self.tokenizer.encode_batch(list(texts), add_special_tokens=False)
+        return [np.array(encoding.offsets, dtype=np.int64).reshape(-1, 2) for encoding in encodings]
+
+    def warm_up(self):
+        """Loads the model and tokenizer and runs one encode so the first real request is not slow."""
+        self.model.encode(["warm up"], show_progress_bar=False)
+        self.token_spans(["warm up"])
+
+    def encode(self, texts, batch_size=None):
+        """Encodes `texts` into a float32 matrix of shape (len(texts), dimension)."""
+        texts = list(texts)
+        model = self.model
+        if not texts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        batch_size = batch_size or self.batch_size
+
+        start = time.perf_counter()
+        if self.sort_by_length:
+            order = np.argsort([-len(text) for text in texts], kind="stable")
+        else:
+            order = np.arange(len(texts))
+
+        out = np.empty((len(texts), self.dimension), dtype=np.float32)
+        for begin in range(0, len(texts), batch_size):
+            idx = order[begin:begin + batch_size]
+            out[idx] = model.encode(
+                [texts[i] for i in idx],
+                batch_size=len(idx),
+                normalize_embeddings=self.normalize,
+                convert_to_numpy=True,
+                show_progress_bar=False,
+            )
+        elapsed = time.perf_counter() - start
+
+        with self._stats_lock:
+            self.chunks_encoded += len(texts)
+            self.seconds += elapsed
+        observe_stage("embed", elapsed)
+        return out
+
+    @property
+    def throughput(self):
+        """Average chunks encoded per second since startup."""
+        return self.chunks_encoded / self.seconds if self.seconds else 0.0
+
+    def stats(self):
+        return {
+            "model": self.model_name,
+            "batch_size": self.batch_size,
+            "num_threads": self.num_threads,
+            "normalize": self.normalize,
+            "loaded": self.loaded,
+            "chunks_encoded": self.chunks_encoded,
+            "seconds": round(self.seconds, 3),
+            "chunks_per_second": round(self.throughput, 1),
+        }
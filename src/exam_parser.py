@@ -0,0 +1,295 @@
+"""
+Parses scenario-exam generations into typed objects and validates them.
+
+The model is asked for the format in `build_mcq_messages`:
+
+    ### CASE STUDY A: <title>
+    <scenario>
+    1. <question>
+       a) <option> ... d) <option>
+       Answer: <option>
+       Explanation: <reason>
+
+`parse_exam` reads that in one pass over the lines and tolerates the usual
+deviations (markdown bold, "Q1:" numbering, "(b)" labels, missing blank lines).
+`validate_exam` attaches a list of issues to every question that cannot be
+shown as-is, so callers can regenerate just those questions.
+"""
+import re
+from dataclasses import asdict, dataclass, field
+from typing import List, Optional
+
+OPTION_LABELS = "abcd"
+QUESTIONS_PER_CASE = 3
+EXPECTED_CASES = 2
+
+CASE_HEADER = re.compile(r'^\s*#*\s*\**\s*CASE\s+STUDY\s*([A-Z0-9])?\b\s*[:.\-]?\s*(.*?)\**\s*$', re.IGNORECASE)
+# "1. ...", "Q1: ...", "**3)** ..." - but not "1.7." or "2.5 mg"
+QUESTION_LINE = re.compile(r'^\s*\**\s*(?:Q(?:uestion)?\s*)?(\d{1,2})\s*[.):](?![\d.])\**\s*(.*)$', re.IGNORECASE)
+OPTION_LINE = re.compile(r'^\s*[-*]?\s*\(?([a-dA-D])[).]\s+(.*)$')
+ANSWER_LINE = re.compile(r'^\s*\**\s*(?:Correct\s+)?Answer\s*\**\s*[:\-]\s*\**\s*(.*)$', re.IGNORECASE)
+EXPLANATION_LINE = re.compile(r'^\s*\**\s*Explanation\s*\**\s*[:\-]\s*\**\s*(.*)$', re.IGNORECASE)
+END_LINE = re.compile(r'^\s*(?:#+\s*)?END\s*$', re.IGNORECASE)
+ANSWER_LABEL = re.compile(r'^\(?([a-dA-D])(?:[).:\s]|$)')
+
+
+@dataclass
+class Option:
+    label: str
+    text: str
+
+
+@dataclass
+class Question:
+    number: int
+    text: str = ""
+    options: List[Option] = field(default_factory=list)
+    answer: Optional[str] = None  # option label, e.g. "b"
+    answer_text: str = ""  # the "Answer:" line as written
+    explanation: str = ""
+    issues: List[str] = field(default_factory=list)
+
+    @property
+    def valid(self):
+        return not self.issues
+
+
+@dataclass
+class CaseStudy:
+    label: str
+    title: str
+    scenario: str = ""
+    questions: List[Question] = field(default_factory=list)
+
+
+@dataclass
+class Exam:
+    cases: List[CaseStudy] = field(default_factory=list)
+    issues: List[str] = field(default_factory=list)
+    repaired: List[int] = field(default_factory=list)  # numbers of regenerated questions
+
+    @property
+    def questions(self):
+        return [question for case in self.cases for question in case.questions]
+
+    @property
+    def broken_questions(self):
+        return [question for question in self.questions if question.issues]
+
+    @property
+    def valid(self):
+        return not self.issues and not self.broken_questions
+
+    def to_dict(self):
+        return dict(asdict(self), valid=self.valid)
+
+    def to_text(self):
+        """Renders the exam back into the prompt format (used for downloads)."""
+        lines = []
+        for case in self.cases:
+            lines += [f"### CASE STUDY {case.label}: {case.title}", case.scenario, ""]
+            for q in case.questions:
+                lines.append(f"{q.number}. {q.text}")
+                lines += [f"   {option.label}) {option.text}" for option in q.options]
+                if q.answer_text:
+                    lines.append(f"   Answer: {q.answer_text}")
+                if q.explanation:
+                    lines.append(f"   Explanation: {q.explanation}")
+                lines.append("")
+        return "\n".join(lines).strip()
+
+
+def _join(existing, line):
+    return f"{existing} {line}".strip() if existing else line.strip()
+
+
+def _strip_bold(text):
+    return text.replace("**", "").strip()
+
+
+def _answer_label(answer_text, options):
+    """Maps an "Answer:" value ("b", "(b) Light", "Light intensity") to an option label."""
+    match = ANSWER_LABEL.match(answer_text)
+    if match:
+        return match.group(1).lower()
+    normalized = answer_text.strip().rstrip(".").lower()
+    for option in options:
+        if option.text.strip().rstrip(".").lower() == normalized:
+            return option.label
+    return None
+
+
+def parse_exam(text):
+    """Parses a generation into an Exam in a single pass over its lines."""
+    exam = Exam()
+    case = None
+    question = None
+    field_name = None  # which field continuation lines belong to
+
+    def start_case(label, title):
+        nonlocal case, question, field_name
+        case = CaseStudy(label=label or chr(ord("A") + len(exam.cases)), title=_strip_bold(title))
+        exam.cases.append(case)
+        question, field_name = None, "scenario"
+
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        if END_LINE.match(line):
+            break
+
+        match = CASE_HEADER.match(line)
+        if match:
+            start_case((match.group(1) or "").upper(), match.group(2))
+            continue
+
+        match = QUESTION_LINE.match(line)
+        if match:
+            if case is None:
+                start_case("", "")
+            question = Question(number=int(match.group(1)), text=_strip_bold(match.group(2)))
+            case.questions.append(question)
+            field_name = "text"
+            continue
+
+        if question is not None:
+            match = OPTION_LINE.match(line)
+            if match and not question.answer_text:
+                question.options.append(Option(match.group(1).lower(), _strip_bold(match.group(2))))
+                field_name = "option"
+                continue
+            match = ANSWER_LINE.match(line)
+            if match:
+                question.answer_text = _strip_bold(match.group(1))
+                field_name = "answer"
+                continue
+            match = EXPLANATION_LINE.match(line)
+            if match:
+                question.explanation = _strip_bold(match.group(1))
+                field_name = "explanation"
+                continue
+
+        # Continuation of whatever field came last
+        line = _strip_bold(line)
+        if field_name == "scenario":
+            case.scenario = _join(case.scenario, line)
+        elif field_name == "text":
+            question.text = _join(question.text, line)
+        elif field_name == "option":
+            question.options[-1].text = _join(question.options[-1].text, line)
+        elif field_name == "answer":
+            question.answer_text = _join(question.answer_text, line)
+        elif field_name == "explanation":
+            question.explanation = _join(question.explanation, line)
+
+    for question in exam.questions:
+        question.answer = _answer_label(question.answer_text, question.options)
+    return exam
+
+
+def parse_partial_exam(text):
+    """
+    Parses a generation that is still streaming. Only complete lines are read,
+    so a half-written question or option never shows up truncated.
+    """
+    return parse_exam(text[:text.rfind("\n") + 1])
+
+
+def parse_question(text, number):
+    """Parses a single regenerated question; returns None if none was found."""
+    questions = parse_exam(text).questions
+    if not questions:
+        return None
+    question = questions[0]
+    question.number = number
+    return question
+
+
+def _normalize(text):
+    return " ".join(re.findall(r"\w+", text.lower()))
+
+
+def question_issues(question):
+    """Problems that make a single question unusable."""
+    issues = []
+    if not question.text:
+        issues.append("missing question text")
+    labels = [option.label for option in question.options]
+    if labels != list(OPTION_LABELS[:len(labels)]) or len(labels) != len(OPTION_LABELS):
+        issues.append(f"expected options a-d, got {''.join(labels) or 'none'}")
+    elif len({_normalize(option.text) for option in question.options}) < len(labels):
+        issues.append("duplicate options")
+    if not question.answer_text:
+        issues.append("missing answer")
+    elif question.answer not in labels:
+        issues.append("answer does not match an option")
+    if not question.explanation:
+        issues.append("missing explanation")
+    return issues
+
+
+def validate_exam(exam, expected_cases=EXPECTED_CASES, per_case=QUESTIONS_PER_CASE):
+    """
+    Fills `issues` on the exam and on every question. Missing question numbers
+    are added as empty placeholder questions (flagged "missing question") so
+    they can be regenerated like any other broken question.
+    """
+    exam.issues = []
+    if len(exam.cases) != expected_cases:
+        exam.issues.append(f"expected {expected_cases} case studies, got {len(exam.cases)}")
+
+    seen = {}
+    for case_index, case in enumerate(exam.cases[:expected_cases]):
+        first = case_index * per_case + 1
+        numbers = {question.number for question in case.questions}
+        for number in range(first, first + per_case):
+            if number not in numbers:
+                case.questions.append(Question(number=number))
+        # Drop extra questions (e.g. a 7th) and keep the expected order
+        case.questions = sorted(
+            (q for q in case.questions if first <= q.number < first + per_case), key=lambda q: q.number
+        )
+        # The first question with a given number wins; later copies are dropped
+        unique = []
+        for question in case.questions:
+            if unique and unique[-1].number == question.number:
+                continue
+            unique.append(question)
+        case.questions = unique
+
+    for question in exam.questions:
+        question.issues = ["missing question"] if not question.text and not question.options else question_issues(question)
+        key = _normalize(question.text)
+        if key and key in seen:
+            question.issues.append(f"duplicate of question {seen[key]}")
+        elif key:
+            seen[key] = question.number
+    return exam
+
+
+# --- Testing Block ---
+if __name__ == "__main__":
+    sample = """### CASE STUDY A: Greenhouse
+A farm manager shades half of a greenhouse; the dose is 1.7. units per plant.
+
+1. Which process is limited?
+   a) Respiration
+   b) Photosynthesis
+   c) Transpiration
+   d) Germination
+   Answer: b) Photosynthesis
+   Explanation: Less light.
+2. Which process is limited?
+   a) Respiration
+   b) Photosynthesis
+   Answer: b
+### CASE STUDY B: Office
+Plants are moved away from windows.
+4. What happens to glucose production?
+   a) Increases b) Decreases
+   Answer: Decreases
+"""
+    exam = validate_exam(parse_exam(sample))
+    for question in exam.questions:
+        print(question.number, question.text[:40], question.answer, question.issues)
+    print("exam issues:", exam.issues)
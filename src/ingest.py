@@ -1,18 +1,178 @@
 import fitz
 from pptx import Presentation
 from docx import Document
+import io
+import multiprocessing
 import os
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from src import ocr
+
+# Page extraction fans out over a process pool once a PDF has more than one batch of pages
+PAGE_WORKERS = int(os.getenv("PAGE_WORKERS", max(1, min(4, (os.cpu_count() or 2) // 2))))
+PAGES_PER_TASK = 16
+# DOCX has no pages; paragraphs are grouped into blocks of this size instead
+DOCX_PARAGRAPHS_PER_BLOCK = 50
+
+_page_pool = None
+
+def _pool():
+    """Lazily starts the extraction pool. 'spawn' keeps workers free of the parent's model/threads."""
+    global _page_pool
+    if _page_pool is None:
+        _page_pool = ProcessPoolExecutor(
+            max_workers=PAGE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _page_pool
+
+def _open_pdf(source):
+    """`source` is a file path, or the document's bytes for uploads kept in memory."""
+    if isinstance(source, (bytes, bytearray)):
+        return fitz.open(stream=source, filetype="pdf")
+    return fitz.open(source)
+
+def _file_like(source):
+    return io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+
+def _extract_pdf_range(file_path, start, end, rasterize=False):
+    """
+    Worker task: returns [(page_number, text)] for the non-empty pages in
+    [start, end). With `rasterize`, image-only pages are included as
+    (page_number, OcrPage) instead of being dropped.
+    """
+    pages = []
+    with _open_pdf(file_path) as doc:
+        for page_num in range(start, end):
+            page = doc[page_num]
+            page_text = page.get_text()
+            if page_text.strip():
+                pages.append((page_num + 1, page_text))
+            elif rasterize and ocr.needs_ocr(page, page_text):
+                pages.append((page_num + 1, ocr.OcrPage(page_num + 1, *ocr.rasterize(page))))
+    return pages
+
+def _with_ocr(ranges, document_ocr):
+    """
+    Yields (page_number, text) from extracted page ranges in order, replacing
+    rasterized pages with their OCR text. A range's pages are all queued for
+    OCR before the first is waited on, so they run in parallel up to the
+    per-document cap while later ranges are still being extracted.
+    """
+    for pages in ranges:
+        handles = [(number, document_ocr.submit(content) if isinstance(content, ocr.OcrPage) else content)
+                   for number, content in pages]
+        for number, handle in handles:
+            text = document_ocr.text(handle)
+            if text.strip():
+                yield number, text
+
+def _extract_pptx(file_path):
+    """Worker task: returns [(slide_number, text)] for every slide with text."""
+    prs = Presentation(_file_like(file_path))
+    slides = []
+    for i, slide in enumerate(prs.slides):
+        slide_text = []
+        for shape in slide.shapes:
+            if hasattr(shape, "text"):
+                slide_text.append(shape.text)
+        if slide_text:
+            slides.append((i + 1, "\n".join(slide_text)))
+    return slides
+
+def _extract_docx(file_path):
+    """Worker task: returns [(None, text)] blocks of consecutive non-empty paragraphs."""
+    doc = Document(_file_like(file_path))
+    paragraphs = [para.text for para in doc.paragraphs if para.text.strip()]
+    return [
+        (None, "\n".join(paragraphs[i:i + DOCX_PARAGRAPHS_PER_BLOCK]))
+        for i in range(0, len(paragraphs), DOCX_PARAGRAPHS_PER_BLOCK)
+    ]
+
+def iter_pdf_pages(file_path, pages_per_task=PAGES_PER_TASK, use_ocr=None):
+    """
+    Yields (page_number, text) for every non-empty page, in order.
+    Page ranges are extracted in parallel, with at most two ranges per worker
+    in flight so memory stays bounded however long the document is.
+    `file_path` may also be the PDF's bytes; short documents are then read
+    in this process without touching the disk or the pool, longer ones are
+    written to a temporary file first so each range task is sent a path rather
+    than a copy of the whole document.
+
+    Pages without a text layer that show images (scans) are OCRed when
+    `use_ocr` is set (see src.ocr); otherwise they are skipped as before.
+    """
+    with _open_pdf(file_path) as doc:
+        page_count = doc.page_count
+
+    if use_ocr is None:
+        use_ocr = ocr.OCR_ENABLED
+    document_ocr = ocr.DocumentOcr() if use_ocr else None
+
+    spooled = None
+    if isinstance(file_path, (bytes, bytearray)) and page_count > pages_per_task:
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+            f.write(file_path)
+        file_path = spooled = f.name
+
+    def extracted_ranges():
+        if page_count <= pages_per_task:
+            yield _extract_pdf_range(file_path, 0, page_count, use_ocr)
+            return
+        ranges = deque((start, min(start + pages_per_task, page_count))
+                       for start in range(0, page_count, pages_per_task))
+        in_flight = deque()
+        while ranges or in_flight:
+            while ranges and len(in_flight) < 2 * PAGE_WORKERS:
+                start, end = ranges.popleft()
+                in_flight.append(_pool().submit(_extract_pdf_range, file_path, start, end, use_ocr))
+            yield in_flight.popleft().result()
+
+    try:
+        if document_ocr is None:
+            for pages in extracted_ranges():
+                yield from pages
+            return
+        yield from _with_ocr(extracted_ranges(), document_ocr)
+        report = document_ocr.report()
+        if report["ocred"] or report["cached"] or report["skipped"]:
+            print(f"OCR: {report['ocred']} pages in {report['seconds']}s, {report['cached']} from cache, "
+                  f"{report['skipped']} skipped (time budget or OCR unavailable).")
+    finally:
+        if spooled is not None:
+            os.remove(spooled)
+
+def iter_pptx_slides(file_path):
+    """Yields (slide_number, text) for every slide with text. Parsing runs in the worker pool."""
+    yield from _pool().submit(_extract_pptx, file_path).result()
+
+def iter_docx_blocks(file_path):
+    """Yields (None, text) paragraph blocks. Parsing runs in the worker pool."""
+    yield from _pool().submit(_extract_docx, file_path).result()
+
+def iter_document(file_path, file_type=None):
+    """
+    Streaming counterpart of `load_document`: yields (page_number, text) pieces
+    as they are extracted. Raises ValueError for unsupported formats.
+    `file_path` may be the document's bytes, with `file_type` (".pdf",
+    ".pptx" or ".docx") naming the format.
+    """
+    ext = (file_type or os.path.splitext(file_path)[1]).lower()
+
+    if ext == '.pdf':
+        return iter_pdf_pages(file_path)
+    elif ext == '.pptx':
+        return iter_pptx_slides(file_path)
+    elif ext == '.docx':
+        return iter_docx_blocks(file_path)
+    else:
+        raise ValueError(f"Unsupported file format: {ext}")
 
 def load_pdf(file_path):
     """Extracts text from a PDF file."""
     try:
-        doc = fitz.open(file_path)
-        text = []
-        for page_num, page in enumerate(doc):
-            page_text = page.get_text()
-            if page_text.strip():
-                text.append(f"--- Page {page_num + 1} ---\n{page_text}")
-        return "\n".join(text)
+        return "\n".join(f"--- Page {n} ---\n{text}" for n, text in iter_pdf_pages(file_path))
     except Exception as e:
         print(f"Error reading PDF {file_path}: {e}")
         return None
@@ -20,16 +180,7 @@ def load_pdf(file_path):
 def load_pptx(file_path):
     """Extracts text from a PPTX file."""
     try:
-        prs = Presentation(file_path)
-        text = []
-        for i, slide in enumerate(prs.slides):
-            slide_text = []
-            for shape in slide.shapes:
-                if hasattr(shape, "text"):
-                    slide_text.append(shape.text)
-            if slide_text:
-                text.append(f"--- Slide {i + 1} ---\n" + "\n".join(slide_text))
-        return "\n".join(text)
+        return "\n".join(f"--- Slide {n} ---\n{text}" for n, text in iter_pptx_slides(file_path))
     except Exception as e:
         print(f"Error reading PPTX {file_path}: {e}")
         return None
@@ -37,13 +188,8 @@ def load_pptx(file_path):
 def load_docx(file_path):
     """Extracts text from a DOCX file."""
     try:
-        doc = Document(file_path)
-        text = []
-        for i, para in enumerate(doc.paragraphs):
-            if para.text.strip():
-                text.append(para.text)
         # Join with newlines
-        return "\n".join(text)
+        return "\n".join(text for _, text in iter_docx_blocks(file_path))
     except Exception as e:
         print(f"Error reading DOCX {file_path}: {e}")
         return None
@@ -51,7 +197,7 @@ def load_docx(file_path):
 def load_document(file_path):
     """Wrapper to detect file extension and call appropriate loader."""
     ext = os.path.splitext(file_path)[1].lower()
-    
+
     if ext == '.pdf':
         return load_pdf(file_path)
     elif ext == '.pptx':
@@ -62,8 +208,15 @@ def load_document(file_path):
         print(f"Unsupported file format: {ext}")
         return None
 
+def shutdown():
+    global _page_pool
+    if _page_pool is not None:
+        _page_pool.shutdown(wait=False)
+        _page_pool = None
+    ocr.shutdown()
+
 # --- Testing Block ---
 if __name__ == "__main__":
     print("Ingestion module loaded.")
     # file_path = "data/notes.docx"
-    # print(load_document(file_path))
\ No newline at end of file
+    # print(load_document(file_path))
@@ -0,0 +1,371 @@
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+
+from src.workers import run_in_thread
+
+# Job / task states
+PENDING, RUNNING, DONE, FAILED, CANCELLED = "pending", "running", "done", "failed", "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    spec TEXT NOT NULL,
+    status TEXT NOT NULL,
+    max_concurrency INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    job_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (job_id, idx)
+);
+CREATE INDEX IF NOT EXISTS tasks_pending ON tasks (status, next_attempt_at);
+"""
+
+
+class JobStore:
+    """
+    SQLite persistence for batch jobs. One row per job plus one row per
+    generation task, so progress and partial results survive a restart.
+    """
+
+    def __init__(self, path="cache/jobs.sqlite3"):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def create_job(self, spec, tasks, max_concurrency):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.execute(
+                "INSERT INTO jobs VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, json.dumps(spec), PENDING, max_concurrency, now, now),
+            )
+            self._conn.executemany(
+                "INSERT INTO tasks (job_id, idx, params, status, updated_at) VALUES (?, ?, ?, ?, ?)",
+                [(job_id, i, json.dumps(params), PENDING, now) for i, params in enumerate(tasks)],
+            )
+            self._conn.execute("COMMIT")
+        return job_id
+
+    def recover(self):
+        """Tasks left running by a crashed/stopped process go back to the queue."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE tasks SET status = ?, updated_at = ? WHERE status = ?", (PENDING, time.time(), RUNNING)
+            )
+            return cursor.rowcount
+
+    def claim(self, saturated_jobs, now):
+        """
+        Marks the oldest runnable task as running. Returns
+        ((job_id, idx, params, attempts, spec), None), or (None, wake_at) when
+        nothing is runnable, where `wake_at` is the earliest retry time of tasks
+        still backing off (None if there are none). Tasks of jobs in
+        `saturated_jobs` are skipped.
+        """
+        exclude = ",".join("?" * len(saturated_jobs))
+        query = (
+            "SELECT t.job_id, t.idx, t.params, t.attempts, j.spec FROM tasks t JOIN jobs j ON j.id = t.job_id "
+            "WHERE t.status = ? AND t.next_attempt_at <= ? "
+            + (f"AND t.job_id NOT IN ({exclude}) " if saturated_jobs else "")
+            + "ORDER BY j.created_at, t.idx LIMIT 1"
+        )
+        with self._lock:
+            row = self._conn.execute(query, (PENDING, now, *saturated_jobs)).fetchone()
+            if row is None:
+                wake = self._conn.execute(
+                    "SELECT MIN(next_attempt_at) FROM tasks WHERE status = ? AND next_attempt_at > ?", (PENDING, now)
+                ).fetchone()[0]
+                return None, wake
+            job_id, idx, params, attempts, spec = row
+            self._conn.execute(
+                "UPDATE tasks SET status = ?, updated_at = ? WHERE job_id = ? AND idx = ?",
+                (RUNNING, now, job_id, idx),
+            )
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ? AND status = ?",
+                (RUNNING, now, job_id, PENDING),
+            )
+        return (job_id, idx, json.loads(params), attempts, json.loads(spec)), None
+
+    def finish_task(self, job_id, idx, status, attempts, result=None, error=None, next_attempt_at=0):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE tasks SET status = ?, attempts = ?, result = ?, error = ?, next_attempt_at = ?, updated_at = ? "
+                "WHERE job_id = ? AND idx = ? AND status = ?",
+                (status, attempts, result, error, next_attempt_at, now, job_id, idx, RUNNING),
+            )
+            self._update_job_status(job_id, now)
+
+    def _update_job_status(self, job_id, now):
+        open_tasks = self._conn.execute(
+            "SELECT COUNT(*) FROM tasks WHERE job_id = ? AND status IN (?, ?)", (job_id, PENDING, RUNNING)
+        ).fetchone()[0]
+        if open_tasks:
+            return
+        failed = self._conn.execute(
+            "SELECT COUNT(*) FROM tasks WHERE job_id = ? AND status = ?", (job_id, FAILED)
+        ).fetchone()[0]
+        self._conn.execute(
+            "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ? AND status NOT IN (?, ?, ?)",
+            (FAILED if failed else DONE, now, job_id, *FINISHED),
+        )
+
+    def cancel(self, job_id):
+        """Cancels the pending tasks of a job; tasks already running finish normally."""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE tasks SET status = ?, updated_at = ? WHERE job_id = ? AND status = ?",
+                (CANCELLED, now, job_id, PENDING),
+            )
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ? AND status NOT IN (?, ?, ?)",
+                (CANCELLED, now, job_id, *FINISHED),
+            )
+            return cursor.rowcount
+
+    def get(self, job_id, include_results=True):
+        """Returns a job with progress counters and per-task results, or None."""
+        with self._lock:
+            job = self._conn.execute(
+                "SELECT id, spec, status, max_concurrency, created_at, updated_at FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            if job is None:
+                return None
+            tasks = self._conn.execute(
+                "SELECT idx, params, status, attempts, result, error FROM tasks WHERE job_id = ? ORDER BY idx",
+                (job_id,),
+            ).fetchall()
+        progress = {state: 0 for state in (PENDING, RUNNING, DONE, FAILED, CANCELLED)}
+        for task in tasks:
+            progress[task[2]] += 1
+        out = {
+            "job_id": job[0],
+            "spec": json.loads(job[1]),
+            "status": job[2],
+            "max_concurrency": job[3],
+            "created_at": job[4],
+            "updated_at": job[5],
+            "total": len(tasks),
+            "progress": progress,
+        }
+        if include_results:
+            out["tasks"] = [
+                {"index": idx, **json.loads(params), "status": status, "attempts": attempts,
+                 "result": result, "error": error}
+                for idx, params, status, attempts, result, error in tasks
+            ]
+        return out
+
+    def list(self, limit=50):
+        with self._lock:
+            ids = [row[0] for row in self._conn.execute(
+                "SELECT id FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)
+            )]
+        return [self.get(job_id, include_results=False) for job_id in ids]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class JobQueue:
+    """
+    Runs batch generation jobs on a pool of asyncio workers.
+
+    A job is a list of independent tasks persisted in a JobStore. Workers
+    claim tasks oldest-job-first; at most `max_concurrency` tasks of one job
+    run at a time, so one large batch cannot starve everyone else. Failures of
+    the `retry_on` exception types are retried with jittered exponential
+    backoff (the retry time is stored, so a waiting task holds no worker);
+    anything else fails the task at once.
+
+    `run_task(spec, params)` is injected: an async function that produces the
+    result text of one task. This keeps the queue free of retrieval/LLM code
+    and lets it run against a fake client.
+
+    SQLite calls run on the worker thread pool so they never block the event
+    loop; claims are serialized by an asyncio lock so the per-job cap holds
+    while a claim is in flight.
+    """
+
+    def __init__(self, store, run_task, workers=4, max_concurrency=2, max_attempts=4,
+                 backoff_base=1.0, backoff_max=60.0, retry_on=(Exception,)):
+        self.store = store
+        self.run_task = run_task
+        self.workers = workers
+        self.max_concurrency = max_concurrency
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_on = retry_on
+        self._running = {}  # job id -> tasks of that job currently running
+        self._job_limits = {}  # job id -> its max_concurrency
+        self._wakeup = None
+        self._claim_lock = None
+        self._tasks = []
+
+    async def submit(self, spec, tasks, max_concurrency=None):
+        """Persists a job and returns its id; workers pick it up right away."""
+        limit = max(1, min(max_concurrency or self.max_concurrency, self.workers))
+        job_id = await run_in_thread(self.store.create_job, spec, tasks, limit)
+        self._job_limits[job_id] = limit
+        self._notify()
+        return job_id
+
+    async def cancel(self, job_id):
+        cancelled = await run_in_thread(self.store.cancel, job_id)
+        self._notify()
+        return cancelled
+
+    def _notify(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _saturated(self):
+        saturated = []
+        for job_id, running in list(self._running.items()):
+            limit = self._job_limits.get(job_id)
+            if limit is None:
+                job = await run_in_thread(self.store.get, job_id, include_results=False)
+                limit = self._job_limits[job_id] = job["max_concurrency"] if job else 1
+            if running >= limit:
+                saturated.append(job_id)
+        return saturated
+
+    def backoff(self, attempts):
+        """Full-jitter exponential backoff for the given (1-based) attempt number."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1)))
+
+    async def _run_one(self, job_id, idx, params, attempts, spec):
+        attempts += 1
+        try:
+            result = await self.run_task(spec, params)
+        except asyncio.CancelledError:
+            raise
+        except self.retry_on as e:
+            if attempts < self.max_attempts:
+                delay = self.backoff(attempts)
+                print(f"Job {job_id} task {idx} failed ({e}); retry {attempts} in {delay:.1f}s")
+                await run_in_thread(self.store.finish_task, job_id, idx, PENDING, attempts, error=str(e),
+                                    next_attempt_at=time.time() + delay)
+            else:
+                await run_in_thread(self.store.finish_task, job_id, idx, FAILED, attempts, error=str(e))
+        except Exception as e:
+            await run_in_thread(self.store.finish_task, job_id, idx, FAILED, attempts, error=str(e))
+        else:
+            await run_in_thread(self.store.finish_task, job_id, idx, DONE, attempts, result=result)
+
+    async def _claim(self):
+        """Claims the next runnable task and counts it against its job's cap."""
+        async with self._claim_lock:
+            saturated = await self._saturated()
+            claimed, wake_at = await run_in_thread(self.store.claim, saturated, time.time())
+            if claimed is not None:
+                self._running[claimed[0]] = self._running.get(claimed[0], 0) + 1
+            return claimed, wake_at
+
+    async def _worker(self):
+        while True:
+            claimed, wake_at = await self._claim()
+            if claimed is None:
+                self._wakeup.clear()
+                timeout = max(0.05, wake_at - time.time()) if wake_at else None
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            job_id = claimed[0]
+            try:
+                await self._run_one(*claimed)
+            finally:
+                self._running[job_id] -= 1
+                if not self._running[job_id]:
+                    del self._running[job_id]
+                self._notify()
+
+    def start(self):
+        """Starts the workers on the running event loop and resumes unfinished jobs."""
+        recovered = self.store.recover()
+        if recovered:
+            print(f"Resuming {recovered} interrupted job tasks.")
+        self._wakeup = asyncio.Event()
+        self._claim_lock = asyncio.Lock()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Stops the workers; interrupted tasks are picked up again after a restart."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await run_in_thread(self.store.recover)
+
+
+def expand_batch(topics, variants):
+    """One task per (topic, variant); without topics, `variants` tasks over the whole course."""
+    topics = [topic for topic in topics if topic.strip()] or [None]
+    return [{"topic": topic, "variant": v} for topic in topics for v in range(variants)]
+
+
+# --- Testing Block ---
+if __name__ == "__main__":
+    import tempfile
+
+    class FakeInferenceClient:
+        """Fails every third call, like a flaky upstream."""
+
+        def __init__(self):
+            self.calls = 0
+
+        async def complete(self, prompt):
+            self.calls += 1
+            await asyncio.sleep(0.05)
+            if self.calls % 3 == 0:
+                raise ConnectionError("503 Service Unavailable")
+            return f"Exam for {prompt}"
+
+    async def main():
+        client = FakeInferenceClient()
+
+        async def run_task(spec, params):
+            return await client.complete(f"{params['topic']} #{params['variant']}")
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            store = JobStore(os.path.join(tmp_dir, "jobs.sqlite3"))
+            queue = JobQueue(store, run_task, workers=4, max_concurrency=2, backoff_base=0.05,
+                             retry_on=(ConnectionError,))
+            queue.start()
+            job_id = await queue.submit({"request_type": "quiz"}, expand_batch(["cells", "energy"], 5))
+            while store.get(job_id, include_results=False)["status"] not in FINISHED:
+                await asyncio.sleep(0.1)
+            await queue.stop()
+            job = store.get(job_id)
+            print(job["status"], job["progress"], f"{client.calls} upstream calls")
+            store.close()
+
+    asyncio.run(main())
@@ -0,0 +1,168 @@
+"""
+Sparse lexical (BM25) index over chunk text.
+
+Postings are kept in compact typed arrays rather than Python lists: a saved
+index is one CSR layout (per-term offsets into flat id / term-frequency arrays)
+that is memory-mapped on load, and postings added since then go to per-term
+`array.array` buffers. Removing a chunk zeroes its length, which masks its
+postings until the next save rewrites the CSR without them.
+"""
+import json
+import math
+import os
+import re
+from array import array
+import numpy as np
+
+from src.storage import open_array
+
+LEXICAL_TOKEN = re.compile(r"[a-z0-9]+(?:[-_'.][a-z0-9]+)*")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this "
+    "to was were what which who will with how why when where does do can".split()
+)
+VOCAB_FILE = "lexical_vocab.json"
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text):
+    return [t for t in LEXICAL_TOKEN.findall(text.lower()) if t not in STOPWORDS]
+
+
+class LexicalIndex:
+    """Incrementally updatable BM25 index keyed by VectorDB chunk ids."""
+
+    def __init__(self):
+        self.vocab = {}  # term -> term id
+        self._base_offsets = np.zeros(1, dtype=np.uint64)
+        self._base_ids = np.zeros(0, dtype=np.uint32)
+        self._base_tf = np.zeros(0, dtype=np.uint16)
+        self._ids = {}  # term id -> array("I") of chunk ids added since the last load
+        self._tf = {}  # term id -> array("H") of matching term frequencies
+        self._doc_len = np.zeros(0, dtype=np.uint32)  # indexed by chunk id; 0 = absent
+        self.total_len = 0
+        self.num_docs = 0
+
+    def _grow(self, size):
+        if size > len(self._doc_len):
+            grown = np.zeros(max(size, 2 * len(self._doc_len)), dtype=np.uint32)
+            grown[:len(self._doc_len)] = self._doc_len
+            self._doc_len = grown
+
+    def add(self, chunk_ids, texts):
+        """Indexes `texts` under the matching chunk ids."""
+        self._grow(max(chunk_ids, default=-1) + 1)
+        for chunk_id, text in zip(chunk_ids, texts):
+            counts = {}
+            for term in tokenize(text):
+                counts[term] = counts.get(term, 0) + 1
+            if not counts:
+                continue
+            for term, tf in counts.items():
+                term_id = self.vocab.setdefault(term, len(self.vocab))
+                if term_id not in self._ids:
+                    self._ids[term_id], self._tf[term_id] = array("I"), array("H")
+                self._ids[term_id].append(chunk_id)
+                self._tf[term_id].append(min(tf, 65535))
+            length = sum(counts.values())
+            self._doc_len[chunk_id] = length
+            self.total_len += length
+            self.num_docs += 1
+
+    def remove(self, chunk_ids):
+        for chunk_id in chunk_ids:
+            if chunk_id < len(self._doc_len) and self._doc_len[chunk_id]:
+                self.total_len -= int(self._doc_len[chunk_id])
+                self.num_docs -= 1
+                self._doc_len[chunk_id] = 0
+
+    def _postings(self, term_id):
+        ids, tfs = [], []
+        if term_id + 1 < len(self._base_offsets):
+            start, end = int(self._base_offsets[term_id]), int(self._base_offsets[term_id + 1])
+            ids.append(self._base_ids[start:end])
+            tfs.append(self._base_tf[start:end])
+        if term_id in self._ids:
+            ids.append(np.frombuffer(self._ids[term_id], dtype=np.uint32))
+            tfs.append(np.frombuffer(self._tf[term_id], dtype=np.uint16))
+        if not ids:
+            return np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=np.uint16)
+        if len(ids) == 1:
+            return ids[0], tfs[0]
+        return np.concatenate(ids), np.concatenate(tfs)
+
+    def search(self, query, k=10):
+        """Returns up to `k` (chunk id, BM25 score) pairs, best first."""
+        if not self.num_docs:
+            return []
+        avg_len = self.total_len / self.num_docs
+        all_ids, all_scores = [], []
+        for term in set(tokenize(query)):
+            term_id = self.vocab.get(term)
+            if term_id is None:
+                continue
+            ids, tfs = self._postings(term_id)
+            lengths = self._doc_len[ids]
+            live = lengths > 0
+            ids, tfs, lengths = ids[live], tfs[live].astype(np.float32), lengths[live]
+            if not len(ids):
+                continue
+            idf = math.log(1 + (self.num_docs - len(ids) + 0.5) / (len(ids) + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / avg_len)
+            all_ids.append(ids)
+            all_scores.append(idf * tfs * (BM25_K1 + 1) / (tfs + norm))
+        if not all_ids:
+            return []
+
+        scores = np.bincount(np.concatenate(all_ids), weights=np.concatenate(all_scores),
+                             minlength=len(self._doc_len))
+        k = min(k, int(np.count_nonzero(scores)))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top]
+
+    def memory_bytes(self):
+        """Private memory: doc lengths and postings added since the last load."""
+        postings = sum(len(a) * 4 for a in self._ids.values()) + sum(len(a) * 2 for a in self._tf.values())
+        return self._doc_len.nbytes + postings
+
+    def save(self, directory):
+        """Writes a compacted CSR copy of the index (removed chunks dropped) into `directory`."""
+        offsets = np.zeros(len(self.vocab) + 1, dtype=np.uint64)
+        with open(os.path.join(directory, "lexical_ids.u32"), "wb") as f_ids, \
+                open(os.path.join(directory, "lexical_tf.u16"), "wb") as f_tf:
+            position = 0
+            for term_id in range(len(self.vocab)):
+                ids, tfs = self._postings(term_id)
+                live = self._doc_len[ids] > 0
+                ids[live].tofile(f_ids)
+                tfs[live].tofile(f_tf)
+                position += int(live.sum())
+                offsets[term_id + 1] = position
+        offsets.tofile(os.path.join(directory, "lexical_offsets.u64"))
+        self._doc_len.tofile(os.path.join(directory, "lexical_doc_len.u32"))
+        terms = sorted(self.vocab, key=self.vocab.get)
+        with open(os.path.join(directory, VOCAB_FILE), "w", encoding="utf-8") as f:
+            json.dump({"terms": terms, "total_len": self.total_len, "num_docs": self.num_docs}, f)
+
+    @staticmethod
+    def exists(directory):
+        return os.path.exists(os.path.join(directory, VOCAB_FILE))
+
+    @classmethod
+    def open(cls, directory):
+        index = cls()
+        with open(os.path.join(directory, VOCAB_FILE), "r", encoding="utf-8") as f:
+            state = json.load(f)
+        index.vocab = {term: i for i, term in enumerate(state["terms"])}
+        index.total_len = state["total_len"]
+        index.num_docs = state["num_docs"]
+        index._base_offsets = open_array(directory, "lexical_offsets.u64", np.uint64)
+        index._base_ids = open_array(directory, "lexical_ids.u32", np.uint32)
+        index._base_tf = open_array(directory, "lexical_tf.u16", np.uint16)
+        # Doc lengths are updated in place on removal, so they are read, not mapped
+        index._doc_len = np.fromfile(os.path.join(directory, "lexical_doc_len.u32"), dtype=np.uint32)
+        return index
@@ -0,0 +1,520 @@
+"""
+Chat-completion backends behind `src/llm_engine.py`.
+
+Every backend takes the same chat `messages` and sampling parameters and
+exposes four calls, so caching, stop detection and concurrency limits stay in
+the engine:
+
+    complete(messages, max_tokens, **params)  -> str
+    stream(messages, max_tokens, **params)    -> iterator of text deltas
+    acomplete / astream                        -> the async counterparts
+
+- HFBackend: the Hugging Face Inference API (or any endpoint speaking the same
+  protocol, e.g. a llama.cpp / TGI server via HF_INFERENCE_URL).
+- LocalBackend: a small instruction-tuned model run on CPU with transformers.
+  Concurrent prompts are collected for a few milliseconds and decoded as one
+  batch, with every row streamed back to its own caller.
+- StubBackend: deterministic canned answers with simulated latency, for tests
+  and benchmarks without network access.
+"""
+import asyncio
+import queue
+import re
+import threading
+import time
+
+from src.llm_scheduler import LLMConfigError
+
+# --- Hugging Face Inference API ---
+
+class HFBackend:
+    name = "hf"
+
+    def __init__(self, model, token=None, timeout=None):
+        self.model = model
+        self.token = token
+        self.timeout = timeout  # seconds per call; a timed-out call raises and is retried by the engine
+        self._client = None
+        self._async_client = None
+
+    def _check_api_key(self):
+        if not self.token:
+            raise LLMConfigError("HF_API_KEY not found in .env file. Please add it.")
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._check_api_key()
+            from huggingface_hub import InferenceClient
+            self._client = InferenceClient(token=self.token, timeout=self.timeout)
+        return self._client
+
+    @property
+    def async_client(self):
+        if self._async_client is None:
+            self._check_api_key()
+            from huggingface_hub import AsyncInferenceClient
+            self._async_client = AsyncInferenceClient(token=self.token, timeout=self.timeout)
+        return self._async_client
+
+    def warm_up(self):
+        return self.async_client
+
+    def complete(self, messages, max_tokens, **params):
+        response = self.client.chat_completion(model=self.model, messages=messages, max_tokens=max_tokens, **params)
+        return response.choices[0].message.content.strip()
+
+    def stream(self, messages, max_tokens, **params):
+        stream = self.client.chat_completion(
+            model=self.model, messages=messages, max_tokens=max_tokens, stream=True, **params
+        )
+        try:
+            for chunk in stream:
+                yield chunk.choices[0].delta.content or ""
+        finally:
+            # Closing the stream drops the HTTP response and ends generation upstream
+            if hasattr(stream, "close"):
+                stream.close()
+
+    async def acomplete(self, messages, max_tokens, **params):
+        response = await self.async_client.chat_completion(
+            model=self.model, messages=messages, max_tokens=max_tokens, **params
+        )
+        return response.choices[0].message.content.strip()
+
+    async def astream(self, messages, max_tokens, **params):
+        stream = await self.async_client.chat_completion(
+            model=self.model, messages=messages, max_tokens=max_tokens, stream=True, **params
+        )
+        try:
+            async for chunk in stream:
+                yield chunk.choices[0].delta.content or ""
+        finally:
+            if hasattr(stream, "aclose"):
+                await stream.aclose()
+
+
+# --- Local CPU model with dynamic batching ---
+
+class _Request:
+    """One prompt in flight on the local backend. `push` receives text deltas, then None (or an exception)."""
+
+    def __init__(self, messages, max_tokens, params, push):
+        self.messages = messages
+        self.max_tokens = max_tokens
+        self.params = params
+        self.push = push
+        self.tokens = []  # token ids of the current, not yet fully emitted line
+        self.printed = 0  # characters of `tokens` already emitted
+        self.generated = 0
+        self.done = False
+        self.cancelled = False  # the caller stopped reading (stop marker found, client gone)
+
+    def emit(self, item):
+        try:
+            self.push(item)
+        except RuntimeError:
+            # The caller's event loop is gone
+            self.cancelled = True
+
+
+class _BatchState:
+    """
+    Streamer and stopping criterion for one `generate` call over a batch.
+    `generate` hands over the next token of every row after each step; each row
+    is decoded incrementally and sent to its own caller. A row ends on EOS, its
+    own `max_tokens` or cancellation, and the batch stops once every row ended.
+    """
+
+    def __init__(self, requests, tokenizer, eos_ids):
+        self.requests = requests
+        self.tokenizer = tokenizer
+        self.eos_ids = eos_ids
+        self._prompt_seen = False
+
+    def _flush(self, request):
+        text = self.tokenizer.decode(request.tokens, skip_special_tokens=True)
+        if len(text) > request.printed:
+            request.emit(text[request.printed:])
+        request.tokens, request.printed = [], 0
+
+    def _finish(self, request):
+        if not request.done:
+            if not request.cancelled:
+                self._flush(request)
+                request.emit(None)
+            request.done = True
+
+    def put(self, value):
+        if not self._prompt_seen:
+            # The first call carries the prompts
+            self._prompt_seen = True
+            return
+        for request, token in zip(self.requests, value.reshape(-1).tolist()):
+            if request.done:
+                continue
+            if request.cancelled or token in self.eos_ids:
+                self._finish(request)
+                continue
+            request.tokens.append(token)
+            request.generated += 1
+            text = self.tokenizer.decode(request.tokens, skip_special_tokens=True)
+            if text.endswith("\n"):
+                self._flush(request)
+            elif not text.endswith("\ufffd") and len(text) > request.printed:
+                # Hold back incomplete multi-byte characters
+                request.emit(text[request.printed:])
+                request.printed = len(text)
+            if request.generated >= request.max_tokens:
+                self._finish(request)
+
+    def end(self):
+        for request in self.requests:
+            self._finish(request)
+
+    def __call__(self, input_ids, scores, **kwargs):
+        import torch
+        return torch.tensor([r.done or r.cancelled for r in self.requests], device=input_ids.device)
+
+
+class LocalBackend:
+    """
+    Runs an instruction-tuned model on CPU with transformers (already installed
+    for sentence-transformers). Linear layers are int8-quantized dynamically.
+
+    Requests from any thread or event loop go into one queue. A single decode
+    thread takes the first waiting request, collects whatever else arrives
+    within `max_wait` seconds (up to `max_batch_size`), and decodes them as one
+    left-padded batch, which costs little more per step than a single prompt on
+    a memory-bound CPU. Requests with different sampling parameters are decoded
+    in separate batches.
+    """
+
+    name = "local"
+
+    def __init__(self, model="Qwen/Qwen2.5-0.5B-Instruct", max_batch_size=8, max_wait=0.02,
+                 num_threads=None, quantize=True):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.num_threads = num_threads
+        self.quantize = quantize
+        self.batches = 0
+        self.batched_requests = 0
+        self._queue = queue.Queue()
+        self._load_lock = threading.Lock()
+        self._thread = None
+        self._model = None
+        self._tokenizer = None
+
+    def _load(self):
+        with self._load_lock:
+            if self._model is not None:
+                return
+            import torch
+            from transformers import AutoModelForCausalLM, AutoTokenizer
+            if self.num_threads:
+                torch.set_num_threads(self.num_threads)
+            tokenizer = AutoTokenizer.from_pretrained(self.model, padding_side="left")
+            if tokenizer.pad_token is None:
+                tokenizer.pad_token = tokenizer.eos_token
+            model = AutoModelForCausalLM.from_pretrained(self.model, torch_dtype=torch.float32)
+            model.eval()
+            if self.quantize:
+                model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+            self._tokenizer = tokenizer
+            self._model = model
+
+    def warm_up(self):
+        self._load()
+        self._ensure_thread()
+
+    def _ensure_thread(self):
+        with self._load_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="local-llm", daemon=True)
+                self._thread.start()
+
+    def close(self):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def _submit(self, messages, max_tokens, params, push):
+        self._ensure_thread()
+        request = _Request(messages, max_tokens, params, push)
+        self._queue.put(request)
+        return request
+
+    def _next_batch(self):
+        """Blocks for one request, then gathers more for up to `max_wait` seconds."""
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if request is None:
+                self._queue.put(None)
+                break
+            batch.append(request)
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            groups = {}
+            for request in batch:
+                if not request.cancelled:
+                    groups.setdefault(tuple(sorted(request.params.items())), []).append(request)
+            for requests in groups.values():
+                try:
+                    self._generate(requests)
+                except Exception as e:
+                    for request in requests:
+                        if not request.done:
+                            request.done = True
+                            request.emit(e)
+
+    def _generate(self, requests):
+        self._load()
+        import torch
+        from transformers import StoppingCriteriaList
+
+        tokenizer = self._tokenizer
+        prompts = [
+            tokenizer.apply_chat_template(r.messages, tokenize=False, add_generation_prompt=True)
+            for r in requests
+        ]
+        inputs = tokenizer(prompts, return_tensors="pt", padding=True, add_special_tokens=False)
+        eos_ids = self._model.generation_config.eos_token_id
+        eos_ids = set(eos_ids if isinstance(eos_ids, list) else [eos_ids, tokenizer.eos_token_id])
+        state = _BatchState(requests, tokenizer, eos_ids)
+
+        params = requests[0].params
+        temperature = params.get("temperature", 0.0)
+        sampling = {"do_sample": True, "temperature": temperature, "top_p": params.get("top_p", 1.0)} \
+            if temperature > 0 else {"do_sample": False}
+        self.batches += 1
+        self.batched_requests += len(requests)
+        with torch.inference_mode():
+            self._model.generate(
+                **inputs,
+                max_new_tokens=max(r.max_tokens for r in requests),
+                pad_token_id=tokenizer.pad_token_id,
+                streamer=state,
+                stopping_criteria=StoppingCriteriaList([state]),
+                **sampling,
+            )
+
+    def stream(self, messages, max_tokens, **params):
+        out = queue.Queue()
+        request = self._submit(messages, max_tokens, params, out.put)
+        try:
+            while True:
+                item = out.get()
+                if item is None:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            # Stops decoding this row if the caller broke off early
+            request.cancelled = True
+
+    def complete(self, messages, max_tokens, **params):
+        return "".join(self.stream(messages, max_tokens, **params)).strip()
+
+    async def astream(self, messages, max_tokens, **params):
+        loop = asyncio.get_running_loop()
+        out = asyncio.Queue()
+        request = self._submit(messages, max_tokens, params,
+                               lambda item: loop.call_soon_threadsafe(out.put_nowait, item))
+        try:
+            while True:
+                item = await out.get()
+                if item is None:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            request.cancelled = True
+
+    async def acomplete(self, messages, max_tokens, **params):
+        return "".join([piece async for piece in self.astream(messages, max_tokens, **params)]).strip()
+
+
+# --- Deterministic stub ---
+
+STUB_EXAM = """### CASE STUDY A: Greenhouse Yield
+A farm manager notices tomato plants under shade cloth grow slower than those in full sun.
+
+1. Which process is most limited by the shade cloth?
+   a) Respiration
+   b) Photosynthesis
+   c) Transpiration
+   d) Germination
+   Answer: b) Photosynthesis
+   Explanation: Less light reduces the light-dependent reactions.
+
+2. What should the manager measure first?
+   a) Soil pH
+   b) Light intensity
+   c) Root length
+   d) Fruit colour
+   Answer: b) Light intensity
+   Explanation: Light is the variable that changed.
+
+3. Which product of photosynthesis drops first?
+   a) Oxygen
+   b) Nitrogen
+   c) Carbon dioxide
+   d) Water
+   Answer: a) Oxygen
+   Explanation: Oxygen is released by the light-dependent reactions.
+
+### CASE STUDY B: Office Plants
+An office moves its plants away from the windows during renovation.
+
+4. What happens to glucose production?
+   a) It increases
+   b) It decreases
+   c) It stays the same
+   d) It stops at night only
+   Answer: b) It decreases
+   Explanation: Less light means less glucose is produced.
+
+5. Which organelle is affected?
+   a) Mitochondria
+   b) Nucleus
+   c) Chloroplast
+   d) Ribosome
+   Answer: c) Chloroplast
+   Explanation: Photosynthesis takes place in chloroplasts.
+
+6. What is the best short-term fix?
+   a) More water
+   b) Artificial grow lights
+   c) More fertiliser
+   d) Repotting
+   Answer: b) Artificial grow lights
+   Explanation: They restore the missing light energy.
+
+### END
+"""
+
+STUB_SUMMARY = """- Photosynthesis converts light energy into chemical energy stored in glucose.
+- It takes place in the chloroplasts of plant cells.
+- Light intensity, carbon dioxide and temperature limit its rate.
+- Oxygen is released as a by-product."""
+
+STUB_QUESTION = """{number}. Which factor would restore the rate of photosynthesis fastest?
+   a) Adding fertiliser
+   b) Increasing light intensity
+   c) Watering more often
+   d) Lowering the temperature
+   Answer: b) Increasing light intensity
+   Explanation: Light is the limiting factor in the scenario.
+
+### END
+"""
+
+_SINGLE_QUESTION = re.compile(r'ONE new Multiple Choice Question about this case study, numbered (\d+)')
+
+
+def stub_completion(messages):
+    """The canned answer for a prompt built by `src/llm_engine.py`: summary, single question or full exam."""
+    prompt = messages[-1]["content"] if messages else ""
+    match = _SINGLE_QUESTION.search(prompt)
+    if match:
+        return STUB_QUESTION.format(number=match.group(1))
+    if prompt.startswith("Summarize"):
+        return STUB_SUMMARY
+    return STUB_EXAM
+
+
+def stub_tokens(text):
+    """Splits text into word-ish pieces, keeping whitespace so the stream reassembles exactly."""
+    pieces, current = [], ""
+    for ch in text:
+        current += ch
+        if ch.isspace():
+            pieces.append(current)
+            current = ""
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+class StubBackend:
+    """
+    Deterministic backend: the same prompt always gets the same well-formed
+    answer, after `latency` seconds to the first token and then
+    `tokens_per_second` (0 = no delay).
+    """
+
+    name = "stub"
+    model = "stub"
+
+    def __init__(self, latency=0.0, tokens_per_second=0.0):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.calls = 0
+
+    def warm_up(self):
+        pass
+
+    def _tokens(self, messages, max_tokens):
+        self.calls += 1
+        return stub_tokens(stub_completion(messages))[:max_tokens]
+
+    def _decode_seconds(self, n_tokens):
+        return n_tokens / self.tokens_per_second if self.tokens_per_second else 0.0
+
+    def complete(self, messages, max_tokens, **params):
+        tokens = self._tokens(messages, max_tokens)
+        time.sleep(self.latency + self._decode_seconds(len(tokens)))
+        return "".join(tokens).strip()
+
+    def stream(self, messages, max_tokens, **params):
+        tokens = self._tokens(messages, max_tokens)
+        time.sleep(self.latency)
+        for token in tokens:
+            yield token
+            time.sleep(self._decode_seconds(1))
+
+    async def acomplete(self, messages, max_tokens, **params):
+        tokens = self._tokens(messages, max_tokens)
+        await asyncio.sleep(self.latency + self._decode_seconds(len(tokens)))
+        return "".join(tokens).strip()
+
+    async def astream(self, messages, max_tokens, **params):
+        tokens = self._tokens(messages, max_tokens)
+        await asyncio.sleep(self.latency)
+        for token in tokens:
+            yield token
+            await asyncio.sleep(self._decode_seconds(1))
+
+
+# --- Testing Block ---
+if __name__ == "__main__":
+    async def main():
+        backend = StubBackend(latency=0.05, tokens_per_second=2000)
+        messages = [{"role": "user", "content": "Summarize the key concepts from this text"}]
+        start = time.perf_counter()
+        results = await asyncio.gather(*(backend.acomplete(messages, 50) for _ in range(10)))
+        print(f"10 concurrent stub calls in {time.perf_counter() - start:.2f}s")
+        print(results[0] == "".join(backend.stream(messages, 50)).strip())
+
+    asyncio.run(main())
@@ -1,54 +1,376 @@
 import os
+import re
+import time
+import asyncio
+import itertools
 from dotenv import load_dotenv
-from huggingface_hub import InferenceClient
+from src.preprocess import estimate_tokens, truncate_to_tokens
+from src.metrics import LLM_CALLS, LLM_TOKENS, observe_stage, timed
+from src.response_cache import ResponseCache
+from src.exam_parser import parse_exam, parse_question, question_issues, validate_exam
+from src.llm_backends import HFBackend, LocalBackend, StubBackend
+from src.llm_scheduler import (
+    LLM_RETRIES, LLMError, LLMScheduler, TRANSIENT_ERRORS, classify_error, retry_delay
+)
 
 # Load API Key
 load_dotenv()
 HF_API_KEY = os.getenv("HF_API_KEY")
 
-if not HF_API_KEY:
-    raise ValueError("HF_API_KEY not found in .env file. Please add it.")
-
 # Using Zephyr model from Hugging Face
 repo_id = "HuggingFaceH4/zephyr-7b-beta"
-client = InferenceClient(token=HF_API_KEY)
+# HF_INFERENCE_URL points the clients at a dedicated endpoint (or a local stub server)
+model_id = os.getenv("HF_INFERENCE_URL", repo_id)
+
+# LLM_BACKEND selects who answers: "hf" (Inference API, default), "local"
+# (small quantized model on this machine's CPU) or "stub" (canned answers).
+LLM_BACKENDS = ("hf", "local", "stub")
+LLM_BACKEND = os.getenv("LLM_BACKEND", "hf")
+# Seconds before an upstream HF call is abandoned (and retried)
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 120))
+
+def create_backend(name):
+    if name == "hf":
+        return HFBackend(model_id, HF_API_KEY, timeout=LLM_TIMEOUT)
+    if name == "local":
+        return LocalBackend(
+            model=os.getenv("LOCAL_LLM_MODEL", "Qwen/Qwen2.5-0.5B-Instruct"),
+            max_batch_size=int(os.getenv("LOCAL_LLM_BATCH_SIZE", 8)),
+            max_wait=float(os.getenv("LOCAL_LLM_BATCH_WAIT_MS", 20)) / 1000,
+            num_threads=int(os.getenv("LOCAL_LLM_THREADS", 0)) or None,
+            quantize=os.getenv("LOCAL_LLM_QUANTIZE", "1") == "1",
+        )
+    if name == "stub":
+        return StubBackend(
+            latency=float(os.getenv("STUB_LATENCY", 0)),
+            tokens_per_second=float(os.getenv("STUB_TOKENS_PER_SECOND", 0)),
+        )
+    raise ValueError(f"Unknown LLM backend {name!r}, expected one of {LLM_BACKENDS}")
+
+# Backends build their clients / load their model on first use, so importing
+# this module stays cheap and does not fail when the key is missing
+_backend = None
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        _backend = create_backend(LLM_BACKEND)
+    return _backend
+
+# Upstream calls in flight at once, and the rate limits they are paced to
+# (0 = unlimited). Only the HF Inference API is rate limited by default.
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 8))
+LLM_REQUESTS_PER_SECOND = float(os.getenv("LLM_REQUESTS_PER_SECOND", 5 if LLM_BACKEND == "hf" else 0))
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", 100_000 if LLM_BACKEND == "hf" else 0))
+# Calls waiting for a slot beyond this many, or for longer than this, fail with HTTP 503
+LLM_QUEUE_SIZE = int(os.getenv("LLM_QUEUE_SIZE", 256))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", 60))
+# Transient upstream failures (429, 5xx, timeouts, dropped connections) are
+# retried with full-jitter exponential backoff
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 3))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", 0.5))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", 20))
+
+# Every upstream call, blocking or async, takes a slot here first; waiting
+# calls are served round-robin across sessions
+llm_scheduler = LLMScheduler(
+    max_in_flight=LLM_MAX_CONCURRENCY,
+    requests_per_second=LLM_REQUESTS_PER_SECOND,
+    tokens_per_minute=LLM_TOKENS_PER_MINUTE,
+    max_queue=LLM_QUEUE_SIZE,
+    max_wait=LLM_QUEUE_TIMEOUT,
+)
+
+# Context token budgets: what fits in Zephyr's 4k window next to the
+# instructions and the requested completion length
+MCQ_CONTEXT_TOKENS = 1500
+SUMMARY_CONTEXT_TOKENS = 2500
+
+# Sampling settings shared by the blocking and streaming paths
+SAMPLING_PARAMS = {
+    "temperature": 0.3,  # Low temperature to prevent hallucination loops
+    "top_p": 0.9,
+}
+
+# Identical model + prompt + sampling params -> identical exam, so completions are cached.
+# RESPONSE_CACHE_DIR adds an on-disk backend shared across restarts and workers.
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 1024)),
+    ttl_seconds=int(os.getenv("RESPONSE_CACHE_TTL", 24 * 3600)),
+    disk_dir=os.getenv("RESPONSE_CACHE_DIR") or None,
+)
+
+def _cache_key(messages, max_tokens):
+    return ResponseCache.make_key(get_backend().model, messages, dict(SAMPLING_PARAMS, max_tokens=max_tokens))
+
+def _call_cost(messages, max_tokens):
+    """Tokens a call may consume against the per-minute budget: the prompt plus the full completion."""
+    return sum(estimate_tokens(message["content"]) for message in messages) + max_tokens
+
+def _failed_call(e, attempt):
+    """
+    Classifies a failed upstream call. Returns (error, seconds to wait before
+    retrying); the delay is None when the error is final.
+    """
+    LLM_CALLS.inc(outcome="error")
+    error = classify_error(e)
+    delay = retry_delay(error, attempt, LLM_MAX_RETRIES, LLM_BACKOFF_BASE, LLM_BACKOFF_MAX)
+    if delay is not None:
+        LLM_RETRIES.inc(error=type(error).__name__)
+        print(f"LLM call failed ({type(error).__name__}: {error}); retry {attempt} in {delay:.1f}s")
+    return error, delay
+
+def _record_call(messages, text, seconds, first_token=None):
+    """Latency and estimated token counts of one upstream call (cache hits are not calls)."""
+    observe_stage("llm", seconds)
+    if first_token is not None:
+        observe_stage("llm_first_token", first_token)
+    LLM_CALLS.inc(outcome="ok")
+    LLM_TOKENS.inc(sum(estimate_tokens(message["content"]) for message in messages), kind="prompt")
+    LLM_TOKENS.inc(estimate_tokens(text), kind="completion")
+
+STOP_MARKERS = ["[/USER]", "[/ASSISTANT]", "User:", "### END"]
+# A 7th question starting on its own line
+QUESTION_7_PATTERN = re.compile(r'^[ \t]*7\.(?!\d)', re.MULTILINE)
 
 def clean_model_output(text):
     """
     Cuts off text immediately when the model starts hallucinating or
     tries to generate a 7th question.
     """
-    stop_markers = ["[/USER]", "[/ASSISTANT]", "User:", "### END"]
-    for marker in stop_markers:
+    for marker in STOP_MARKERS:
         if marker in text:
             text = text.split(marker)[0]
     
-    # Force stop if it tries to write question 7
-    if "7." in text:
-        text = text.split("7.")[0]
+    # Force stop if it tries to write question 7 (on its own line, so "1.7." survives)
+    match = QUESTION_7_PATTERN.search(text)
+    if match:
+        text = text[:match.start()]
 
     return text.strip()
-def generate_response(messages, max_tokens=1500):
+
+class StopDetector:
+    """
+    Applies the stop conditions of `clean_model_output` to a token stream.
+    `feed` returns the text that is safe to emit plus whether generation should stop.
+    The last few characters are held back so a marker split across two deltas
+    is never emitted half-way.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.emitted = 0
+        self.holdback = max(len(marker) for marker in STOP_MARKERS) - 1
+
+    def _stop_position(self):
+        positions = [self.buffer.find(marker) for marker in STOP_MARKERS]
+        match = QUESTION_7_PATTERN.search(self.buffer)
+        if match:
+            positions.append(match.start())
+        positions = [p for p in positions if p != -1]
+        return min(positions) if positions else None
+
+    def feed(self, delta):
+        self.buffer += delta
+        stop = self._stop_position()
+        if stop is not None:
+            text = self.buffer[self.emitted:stop]
+            self.emitted = stop
+            return text, True
+        safe_end = max(self.emitted, len(self.buffer) - self.holdback)
+        text = self.buffer[self.emitted:safe_end]
+        self.emitted = safe_end
+        return text, False
+
+    def flush(self):
+        text = self.buffer[self.emitted:]
+        self.emitted = len(self.buffer)
+        return text
+
+def generate_response(messages, max_tokens=1500, fresh=False, session_id=None):
     """
     Helper to send chat messages to HF API.
     Removed 'repetition_penalty' to fix the TypeError.
+    Served from the response cache unless `fresh` is set. The completion is
+    returned and cached with `clean_model_output` applied, the same form the
+    streaming calls produce, so either path can serve the other's entries.
+    The call waits for a scheduler slot and transient failures are retried;
+    anything else raises an LLMError subclass.
     """
-    try:
-        response = client.chat_completion(
-            model=repo_id,
-            messages=messages,
-            max_tokens=max_tokens,
-            temperature=0.3, # Low temperature to prevent hallucination loops
-            top_p=0.9
-        )
-        return response.choices[0].message.content.strip()
-        return clean_model_output(raw_text)
-    except Exception as e:
-        return f"Error communicating with HF API: {e}"
+    key = _cache_key(messages, max_tokens)
+    if not fresh:
+        cached = response_cache.get(key)
+        if cached is not None:
+            return cached
+    for attempt in itertools.count(1):
+        with llm_scheduler.slot(session_id, _call_cost(messages, max_tokens)) as slot:
+            start = time.perf_counter()
+            try:
+                raw_text = get_backend().complete(messages, max_tokens, **SAMPLING_PARAMS)
+            except Exception as e:
+                error, delay = _failed_call(e, attempt)
+            else:
+                slot.used_tokens = _call_cost(messages, estimate_tokens(raw_text))
+                _record_call(messages, raw_text, time.perf_counter() - start)
+                text = clean_model_output(raw_text)
+                response_cache.put(key, text)
+                return text
+        if delay is None:
+            raise error
+        time.sleep(delay)
 
-def generate_scenario_mcqs(text_chunk):
+def stream_response(messages, max_tokens=1500, fresh=False, session_id=None):
     """
-    Generates 2 distinct Case Studies and 3 MCQs per case study.
+    Streaming counterpart of `generate_response`: yields text deltas as the
+    model produces them. As soon as a stop condition shows up the upstream
+    stream is closed, so no tokens are paid for past the end of the exam.
+    A cached completion is yielded in one piece; a completed stream is cached.
+    A failure before the first delta is retried like `generate_response`;
+    after that, the LLMError is raised to the consumer.
+    """
+    key = _cache_key(messages, max_tokens)
+    if not fresh:
+        cached = response_cache.get(key)
+        if cached is not None:
+            # Entries cached before completions were stored cleaned may still run past a stop marker
+            yield clean_model_output(cached)
+            return
+
+    for attempt in itertools.count(1):
+        stream = None
+        pieces = []
+        first_token = None
+        with llm_scheduler.slot(session_id, _call_cost(messages, max_tokens)) as slot:
+            start = time.perf_counter()
+            try:
+                stream = get_backend().stream(messages, max_tokens, **SAMPLING_PARAMS)
+                detector = StopDetector()
+                for delta in stream:
+                    if first_token is None:
+                        first_token = time.perf_counter() - start
+                    text, stopped = detector.feed(delta)
+                    if text:
+                        pieces.append(text)
+                        yield text
+                    if stopped:
+                        print("Stop condition reached, cancelling upstream stream.")
+                        break
+                else:
+                    tail = detector.flush()
+                    if tail:
+                        pieces.append(tail)
+                        yield tail
+                text = "".join(pieces).strip()
+                slot.used_tokens = _call_cost(messages, estimate_tokens(text))
+                _record_call(messages, text, time.perf_counter() - start, first_token)
+                response_cache.put(key, text)
+                return
+            except Exception as e:
+                error, delay = _failed_call(e, attempt)
+            finally:
+                # Closing the stream ends generation upstream
+                if stream is not None:
+                    stream.close()
+        if delay is None or first_token is not None:
+            raise error
+        time.sleep(delay)
+
+async def _acomplete(messages, max_tokens, session_id=None):
+    for attempt in itertools.count(1):
+        async with llm_scheduler.aslot(session_id, _call_cost(messages, max_tokens)) as slot:
+            start = time.perf_counter()
+            try:
+                text = await get_backend().acomplete(messages, max_tokens, **SAMPLING_PARAMS)
+            except Exception as e:
+                error, delay = _failed_call(e, attempt)
+            else:
+                slot.used_tokens = _call_cost(messages, estimate_tokens(text))
+                _record_call(messages, text, time.perf_counter() - start)
+                return clean_model_output(text)
+        # Backoff happens without a slot, so other sessions keep going meanwhile
+        if delay is None:
+            raise error
+        await asyncio.sleep(delay)
+
+async def agenerate_response(messages, max_tokens=1500, fresh=False, session_id=None):
+    """
+    Async version of `generate_response` for the FastAPI handlers. Calls wait
+    for a scheduler slot (at most LLM_MAX_CONCURRENCY in flight, paced to the
+    rate limits, round-robin across sessions).
+    Cached completions are returned directly, and identical concurrent requests
+    share a single upstream call. `fresh` forces a new completion.
+    Transient failures are retried with backoff; what still fails raises an
+    LLMError subclass whose `status_code` the API answers with.
+    """
+    return await response_cache.get_or_compute(
+        _cache_key(messages, max_tokens),
+        lambda: _acomplete(messages, max_tokens, session_id),
+        fresh=fresh,
+    )
+
+async def astream_response(messages, max_tokens=1500, fresh=False, session_id=None):
+    """
+    Async version of `stream_response`. Holds a scheduler slot for the whole
+    stream and closes the upstream stream as soon as a stop condition shows up.
+    """
+    key = _cache_key(messages, max_tokens)
+    if not fresh:
+        cached = response_cache.get(key)
+        if cached is not None:
+            # Entries cached before completions were stored cleaned may still run past a stop marker
+            yield clean_model_output(cached)
+            return
+
+    for attempt in itertools.count(1):
+        stream = None
+        pieces = []
+        first_token = None
+        async with llm_scheduler.aslot(session_id, _call_cost(messages, max_tokens)) as slot:
+            start = time.perf_counter()
+            try:
+                stream = get_backend().astream(messages, max_tokens, **SAMPLING_PARAMS)
+                detector = StopDetector()
+                async for delta in stream:
+                    if first_token is None:
+                        first_token = time.perf_counter() - start
+                    text, stopped = detector.feed(delta)
+                    if text:
+                        pieces.append(text)
+                        yield text
+                    if stopped:
+                        print("Stop condition reached, cancelling upstream stream.")
+                        break
+                else:
+                    tail = detector.flush()
+                    if tail:
+                        pieces.append(tail)
+                        yield tail
+                text = "".join(pieces).strip()
+                slot.used_tokens = _call_cost(messages, estimate_tokens(text))
+                _record_call(messages, text, time.perf_counter() - start, first_token)
+                response_cache.put(key, text)
+                return
+            except Exception as e:
+                error, delay = _failed_call(e, attempt)
+            finally:
+                if stream is not None:
+                    await stream.aclose()
+        # Text already sent cannot be taken back, so only a stream that failed before its first delta is retried
+        if delay is None or first_token is not None:
+            raise error
+        await asyncio.sleep(delay)
+
+# Source-code indentation of the triple-quoted prompts below, and trailing blanks
+PROMPT_INDENT = re.compile(r'^ {4}|[ \t]+$', re.MULTILINE)
+
+def compact_prompt(prompt):
+    """Strips the indentation the prompt templates carry from the source; it is paid for in tokens on every call."""
+    return PROMPT_INDENT.sub("", prompt).strip()
+
+@timed("prompt_build")
+def build_mcq_messages(text_chunk):
+    """
+    Builds the chat messages for 2 distinct Case Studies and 3 MCQs per case study.
     """
     
     system_msg = (
@@ -64,7 +386,7 @@ def generate_scenario_mcqs(text_chunk):
     Based on the text below, generate a Scenario-Based Exam.
     
     TEXT MATERIAL:
-    "{text_chunk[:2500]}"
+    "{truncate_to_tokens(text_chunk, MCQ_CONTEXT_TOKENS)}"
     
     ---
     
@@ -104,20 +426,177 @@ def generate_scenario_mcqs(text_chunk):
     
     messages = [
         {"role": "system", "content": system_msg},
-        {"role": "user", "content": user_prompt}
+        {"role": "user", "content": compact_prompt(user_prompt)}
     ]
-    
-    return generate_response(messages, max_tokens=2000)
+    return messages
 
-def generate_summary(text_chunk):
+@timed("prompt_build")
+def build_summary_messages(text_chunk):
     """
-    Generates a plain-english summary.
+    Builds the chat messages for a plain-english summary.
     """
-    messages = [
+    return [
         {"role": "system", "content": "You are a helpful tutor."},
-        {"role": "user", "content": f"Summarize the key concepts from this text in simple bullet points:\n\n{text_chunk[:3000]}"}
+        {"role": "user", "content": f"Summarize the key concepts from this text in simple bullet points:\n\n{truncate_to_tokens(text_chunk, SUMMARY_CONTEXT_TOKENS)}"}
     ]
-    return generate_response(messages, max_tokens=800)
+
+@timed("prompt_build")
+def build_question_messages(text_chunk, case, number, existing_questions):
+    """
+    Builds the chat messages that regenerate a single broken question of a case
+    study, instead of re-running the whole exam.
+    """
+    system_msg = (
+        "You are a strict academic examiner. "
+        "Output ONLY the requested question in the requested format."
+    )
+    avoid = "\n".join(f"- {q}" for q in existing_questions if q) or "- (none)"
+    user_prompt = f"""
+    TEXT MATERIAL:
+    "{truncate_to_tokens(text_chunk, QUESTION_CONTEXT_TOKENS)}"
+
+    CASE STUDY {case.label}: {case.title}
+    {case.scenario}
+
+    Questions already asked (do not repeat them):
+    {avoid}
+
+    Write exactly ONE new Multiple Choice Question about this case study, numbered {number}.
+
+    FORMAT:
+
+    {number}. [Question]
+       a) [Option]
+       b) [Option]
+       c) [Option]
+       d) [Option]
+       Answer: [Correct Option]
+       Explanation: [Reason]
+
+    ### END
+    """
+    return [
+        {"role": "system", "content": system_msg},
+        {"role": "user", "content": compact_prompt(user_prompt)}
+    ]
+
+MCQ_MAX_TOKENS = 2000
+SUMMARY_MAX_TOKENS = 800
+# One question with four options, answer and explanation
+QUESTION_MAX_TOKENS = 350
+QUESTION_CONTEXT_TOKENS = 1000
+# Broken questions regenerated per exam; anything beyond that stays flagged
+MAX_QUESTION_REPAIRS = 3
+
+def generate_scenario_mcqs(text_chunk, fresh=False, session_id=None):
+    """
+    Generates 2 distinct Case Studies and 3 MCQs per case study.
+    """
+    return clean_model_output(generate_response(build_mcq_messages(text_chunk), max_tokens=MCQ_MAX_TOKENS,
+                                                fresh=fresh, session_id=session_id))
+
+def generate_summary(text_chunk, fresh=False, session_id=None):
+    """
+    Generates a plain-english summary.
+    """
+    return generate_response(build_summary_messages(text_chunk), max_tokens=SUMMARY_MAX_TOKENS, fresh=fresh,
+                             session_id=session_id)
+
+def stream_scenario_mcqs(text_chunk, fresh=False, session_id=None):
+    """Streams the scenario exam as it is generated."""
+    return stream_response(build_mcq_messages(text_chunk), max_tokens=MCQ_MAX_TOKENS, fresh=fresh,
+                           session_id=session_id)
+
+def stream_summary(text_chunk, fresh=False, session_id=None):
+    """Streams the summary as it is generated."""
+    return stream_response(build_summary_messages(text_chunk), max_tokens=SUMMARY_MAX_TOKENS, fresh=fresh,
+                           session_id=session_id)
+
+async def agenerate_scenario_mcqs(text_chunk, fresh=False, session_id=None):
+    return clean_model_output(await agenerate_response(build_mcq_messages(text_chunk), max_tokens=MCQ_MAX_TOKENS,
+                                                       fresh=fresh, session_id=session_id))
+
+async def agenerate_summary(text_chunk, fresh=False, session_id=None):
+    return await agenerate_response(build_summary_messages(text_chunk), max_tokens=SUMMARY_MAX_TOKENS,
+                                    fresh=fresh, session_id=session_id)
+
+def astream_scenario_mcqs(text_chunk, fresh=False, session_id=None):
+    return astream_response(build_mcq_messages(text_chunk), max_tokens=MCQ_MAX_TOKENS, fresh=fresh,
+                            session_id=session_id)
+
+def astream_summary(text_chunk, fresh=False, session_id=None):
+    return astream_response(build_summary_messages(text_chunk), max_tokens=SUMMARY_MAX_TOKENS, fresh=fresh,
+                            session_id=session_id)
+
+async def _arepair_question(text_chunk, case, question, existing_questions, session_id=None):
+    messages = build_question_messages(text_chunk, case, question.number, existing_questions)
+    raw = await agenerate_response(messages, max_tokens=QUESTION_MAX_TOKENS, fresh=True, session_id=session_id)
+    return parse_question(clean_model_output(raw), question.number)
+
+async def arepair_exam(exam, text_chunk, session_id=None):
+    """
+    Regenerates only the broken questions of a validated exam (at most
+    MAX_QUESTION_REPAIRS, concurrently). A replacement is kept only if it is
+    itself valid. Returns the exam, re-validated.
+    """
+    broken = exam.broken_questions[:MAX_QUESTION_REPAIRS]
+    if not broken:
+        return exam
+    existing = [q.text for q in exam.questions if q.valid]
+    cases = {id(q): case for case in exam.cases for q in case.questions}
+    replacements = await asyncio.gather(
+        *(_arepair_question(text_chunk, cases[id(q)], q, existing, session_id) for q in broken),
+        return_exceptions=True,
+    )
+    for old, new in zip(broken, replacements):
+        if isinstance(new, BaseException) or new is None or question_issues(new):
+            print(f"Could not repair question {old.number}: {new if isinstance(new, BaseException) else old.issues}")
+            continue
+        questions = cases[id(old)].questions
+        questions[questions.index(old)] = new
+        exam.repaired.append(new.number)
+    return validate_exam(exam)
+
+def parse_and_validate(raw_text):
+    """Parses a (possibly uncleaned) exam generation and validates it."""
+    return validate_exam(parse_exam(clean_model_output(raw_text)))
+
+def _repair_key(text_chunk, exam_text):
+    """Cache key of the repaired version of one generated exam."""
+    return ResponseCache.make_key(
+        get_backend().model,
+        [{"role": "exam", "content": exam_text}],
+        {"repair_of": _cache_key(build_mcq_messages(text_chunk), MCQ_MAX_TOKENS), "max_repairs": MAX_QUESTION_REPAIRS},
+    )
+
+async def afinish_exam(raw_text, text_chunk, fresh=False, session_id=None):
+    """
+    Parses and validates a generated exam and regenerates its broken questions.
+    The repaired exam is cached under the generation it came from, so serving a
+    cached exam again reuses its repairs instead of paying for (and varying) new
+    ones; identical concurrent requests share one repair. `fresh` repairs anew.
+    """
+    exam = parse_and_validate(raw_text)
+    if not exam.cases or not exam.broken_questions:
+        return exam
+
+    async def repair():
+        await arepair_exam(exam, text_chunk, session_id)
+        return {"text": exam.to_text(), "repaired": exam.repaired}
+
+    repaired = await response_cache.get_or_compute(_repair_key(text_chunk, raw_text), repair, fresh=fresh)
+    exam = parse_and_validate(repaired["text"])
+    exam.repaired = list(repaired["repaired"])
+    return exam
+
+async def agenerate_exam(text_chunk, fresh=False, session_id=None):
+    """
+    Generates a scenario exam and returns (text, Exam): parsed once, validated,
+    and with broken questions regenerated individually. Raises LLMError if the
+    exam itself cannot be generated.
+    """
+    raw = await agenerate_scenario_mcqs(text_chunk, fresh=fresh, session_id=session_id)
+    return raw, await afinish_exam(raw, text_chunk, fresh=fresh, session_id=session_id)
 
 # --- Testing Block ---
 if __name__ == "__main__":
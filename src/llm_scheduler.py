@@ -0,0 +1,408 @@
+"""
+Client-side scheduling of upstream LLM calls.
+
+Every call to the backend first takes a slot from an LLMScheduler:
+
+- at most `max_in_flight` calls run at once;
+- a requests-per-second and a tokens-per-minute token bucket keep the call
+  rate under the upstream quota, so a class starting exams together is spread
+  out here instead of being throttled (HTTP 429) there;
+- waiting calls are queued per session and slots go round-robin across
+  sessions, so one student's batch job cannot push everybody else back;
+- the queue is bounded in length and in waiting time; past either, a call
+  fails fast with LLMOverloaded instead of piling up.
+
+Slots are granted from whichever thread submits or releases one, or from a
+small timer thread while the buckets refill, so blocking callers (threads)
+and async callers (any event loop) share the same limits.
+
+Upstream exceptions are mapped by `classify_error` onto the LLMError types
+below, which carry the HTTP status the API answers with and whether a retry
+can help; `retry_delay` gives the jittered exponential backoff for those.
+"""
+import asyncio
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+
+from src.metrics import registry
+
+# Seconds a client is told to wait (Retry-After) when the local queue is full
+OVERLOADED_RETRY_AFTER = 5
+
+LLM_QUEUE_WAIT = registry.histogram(
+    "examprep_llm_queue_wait_seconds", "Time LLM calls waited for a scheduler slot before going upstream.")
+LLM_REJECTED = registry.counter(
+    "examprep_llm_rejected_total", "LLM calls refused by the scheduler (queue_full, queue_timeout).",
+    labels=("reason",))
+LLM_RETRIES = registry.counter(
+    "examprep_llm_retries_total", "Upstream LLM calls retried after a transient error, by error type.",
+    labels=("error",))
+
+
+class LLMError(Exception):
+    """An upstream inference call failed. `status_code` is the HTTP status the API answers with."""
+
+    status_code = 502
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after  # seconds, from the upstream Retry-After header if it sent one
+
+
+class LLMRateLimited(LLMError):
+    """Upstream throttled the call (HTTP 429)."""
+
+    status_code = 429
+
+
+class LLMOverloaded(LLMError):
+    """The local queue of upstream calls is full, or the call waited too long in it."""
+
+    status_code = 503
+
+
+class LLMTimeout(LLMError):
+    """The upstream call timed out."""
+
+    status_code = 504
+
+
+class LLMUnavailable(LLMError):
+    """Connection failure or server error (5xx) upstream."""
+
+
+class LLMRejected(LLMError):
+    """Upstream refused the request (a 4xx other than 429), or failed in a way retrying cannot fix."""
+
+
+class LLMConfigError(LLMError):
+    """The backend is misconfigured (missing or invalid API key)."""
+
+    status_code = 500
+
+
+# Worth retrying later; the job queue retries exactly these
+TRANSIENT_ERRORS = (LLMRateLimited, LLMOverloaded, LLMTimeout, LLMUnavailable)
+# Retried right away (after backoff) by the engine; LLMOverloaded comes from this
+# process's own queue, so retrying it here would only queue the call again
+RETRYABLE_UPSTREAM = (LLMRateLimited, LLMTimeout, LLMUnavailable)
+
+
+def _status(e):
+    """HTTP status of an exception from requests/huggingface_hub (`.response.status_code`) or aiohttp (`.status`)."""
+    for holder, attribute in ((getattr(e, "response", None), "status_code"), (e, "status"), (e, "status_code")):
+        value = getattr(holder, attribute, None)
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def _retry_after(e):
+    headers = getattr(getattr(e, "response", None), "headers", None) or getattr(e, "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def classify_error(e):
+    """Maps any exception raised by a backend call onto an LLMError (returned, not raised)."""
+    if isinstance(e, LLMError):
+        return e
+    message = str(e) or type(e).__name__
+    status = _status(e)
+    if status == 429:
+        return LLMRateLimited(message, retry_after=_retry_after(e))
+    if status in (401, 403):
+        return LLMConfigError(message)
+    if status in (408, 504):
+        return LLMTimeout(message)
+    if status is not None and status >= 500:
+        return LLMUnavailable(message, retry_after=_retry_after(e))
+    if status is not None:
+        return LLMRejected(message)
+    name = type(e).__name__
+    if isinstance(e, (TimeoutError, asyncio.TimeoutError)) or "Timeout" in name:
+        return LLMTimeout(message)
+    if isinstance(e, ConnectionError) or "Connection" in name or "Connect" in name:
+        return LLMUnavailable(message)
+    return LLMRejected(message)
+
+
+def retry_delay(error, attempt, max_retries, backoff_base, backoff_max):
+    """
+    Seconds to wait before retry number `attempt` (1-based) of a failed call,
+    or None when it should not be retried. Full-jitter exponential backoff,
+    but never sooner than an upstream Retry-After.
+    """
+    if not isinstance(error, RETRYABLE_UPSTREAM) or attempt > max_retries:
+        return None
+    delay = random.uniform(0, min(backoff_max, backoff_base * 2 ** (attempt - 1)))
+    if error.retry_after:
+        delay = max(delay, min(error.retry_after, backoff_max))
+    return delay
+
+
+class TokenBucket:
+    """`rate` units per second refill the bucket up to `capacity`. A rate of 0 means unlimited."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.level = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """Seconds until `amount` can be taken; a request larger than the bucket waits for a full one."""
+        if not self.rate:
+            return 0.0
+        self._refill(now)
+        return max(0.0, (min(amount, self.capacity) - self.level) / self.rate)
+
+    def take(self, amount, now):
+        if self.rate:
+            self._refill(now)
+            self.level -= min(amount, self.capacity)
+
+    def give_back(self, amount):
+        if self.rate:
+            self.level = min(self.capacity, self.level + amount)
+
+
+class Ticket:
+    """One call waiting for, or holding, a slot. Set `used_tokens` before release to refund the estimate."""
+
+    __slots__ = ("session", "cost", "enqueued", "wake", "granted", "abandoned", "used_tokens")
+
+    def __init__(self, session, cost, wake):
+        self.session = session
+        self.cost = cost
+        self.enqueued = time.monotonic()
+        self.wake = wake
+        self.granted = False
+        self.abandoned = False
+        self.used_tokens = None
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class LLMScheduler:
+    """
+    Admission control for upstream calls: `slot` / `aslot` wait for a free
+    slot (fairly across sessions, within the rate limits) and hold it for the
+    duration of the block. `cost` is the call's estimated token count, prompt
+    plus max_tokens; what the completion did not use is refunded on release.
+    """
+
+    def __init__(self, max_in_flight=8, requests_per_second=0.0, tokens_per_minute=0, max_queue=256,
+                 max_wait=60.0, burst=None):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.requests = TokenBucket(requests_per_second, burst or max(1.0, requests_per_second))
+        self.tokens = TokenBucket(tokens_per_minute / 60, tokens_per_minute)
+        self.in_flight = 0
+        self.waiting = 0
+        self.granted = 0
+        self.rejected = 0
+        self._queues = OrderedDict()  # session -> deque of tickets; the order is the round-robin order
+        self._cond = threading.Condition()
+        self._thread = None
+
+    # --- dispatch (all under self._cond) ---
+
+    def _pop(self, session):
+        """Removes the session's head ticket and moves the session to the back of the rotation."""
+        tickets = self._queues.pop(session)
+        ticket = tickets.popleft()
+        if tickets:
+            self._queues[session] = tickets
+        if not ticket.abandoned:
+            self.waiting -= 1
+        return ticket
+
+    def _dispatch(self):
+        """Grants slots while any are free. Returns seconds until the buckets allow the next grant, or None."""
+        now = time.monotonic()
+        while self._queues and self.in_flight < self.max_in_flight:
+            session, tickets = next(iter(self._queues.items()))
+            ticket = tickets[0]
+            if ticket.abandoned:
+                self._pop(session)
+                continue
+            wait = max(self.requests.wait_time(1, now), self.tokens.wait_time(ticket.cost, now))
+            if wait > 0:
+                return wait
+            self._pop(session)
+            self.requests.take(1, now)
+            self.tokens.take(ticket.cost, now)
+            self.in_flight += 1
+            self.granted += 1
+            ticket.granted = True
+            LLM_QUEUE_WAIT.observe(now - ticket.enqueued)
+            try:
+                ticket.wake()
+            except RuntimeError:
+                # The waiter's event loop is gone
+                ticket.granted = False
+                self.in_flight -= 1
+        return None
+
+    def _timer(self):
+        """Re-runs dispatch when the buckets have refilled enough for the next waiting call."""
+        with self._cond:
+            while True:
+                wait = self._dispatch()
+                self._cond.wait(wait)
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._timer, name="llm-scheduler", daemon=True)
+            self._thread.start()
+
+    def _enqueue(self, session, cost, wake):
+        ticket = Ticket(session or "", cost, wake)
+        with self._cond:
+            if self.waiting >= self.max_queue:
+                self.rejected += 1
+                LLM_REJECTED.inc(reason="queue_full")
+                raise LLMOverloaded("Too many generations are waiting; please try again shortly.",
+                                    retry_after=OVERLOADED_RETRY_AFTER)
+            self._queues.setdefault(ticket.session, deque()).append(ticket)
+            self.waiting += 1
+            self._dispatch()
+            if not ticket.granted:
+                self._ensure_thread()
+                self._cond.notify()
+        return ticket
+
+    def _abandon(self, ticket):
+        """The waiter gave up. Returns False if the slot had been granted already (the caller then owns it)."""
+        with self._cond:
+            if ticket.granted:
+                return False
+            ticket.abandoned = True
+            self.waiting -= 1
+            return True
+
+    def _timed_out(self):
+        self.rejected += 1
+        LLM_REJECTED.inc(reason="queue_timeout")
+        return LLMOverloaded(f"No upstream slot became free within {self.max_wait:g}s; please try again shortly.",
+                             retry_after=OVERLOADED_RETRY_AFTER)
+
+    def release(self, ticket):
+        with self._cond:
+            self.in_flight -= 1
+            if ticket.used_tokens is not None and ticket.used_tokens < ticket.cost:
+                self.tokens.give_back(ticket.cost - ticket.used_tokens)
+            self._dispatch()
+            self._cond.notify()
+
+    # --- waiting for a slot ---
+
+    def acquire(self, session, cost):
+        """Blocks until a slot is granted; raises LLMOverloaded if the queue is full or the wait too long."""
+        event = threading.Event()
+        ticket = self._enqueue(session, cost, event.set)
+        if not event.wait(self.max_wait) and self._abandon(ticket):
+            raise self._timed_out()
+        return ticket
+
+    async def aacquire(self, session, cost):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        ticket = self._enqueue(session, cost, lambda: loop.call_soon_threadsafe(_resolve, future))
+        try:
+            await asyncio.wait_for(future, self.max_wait)
+        except asyncio.TimeoutError:
+            if self._abandon(ticket):
+                raise self._timed_out() from None
+        except BaseException:
+            # Cancelled (client gone): give the slot back if it was granted meanwhile
+            if not self._abandon(ticket):
+                self.release(ticket)
+            raise
+        return ticket
+
+    @contextmanager
+    def slot(self, session, cost):
+        ticket = self.acquire(session, cost)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    @asynccontextmanager
+    async def aslot(self, session, cost):
+        ticket = await self.aacquire(session, cost)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "in_flight": self.in_flight,
+                "max_in_flight": self.max_in_flight,
+                "waiting": self.waiting,
+                "waiting_sessions": sum(1 for tickets in self._queues.values()
+                                        if any(not t.abandoned for t in tickets)),
+                "granted": self.granted,
+                "rejected": self.rejected,
+                "requests_per_second": self.requests.rate,
+                "tokens_per_minute": round(self.tokens.rate * 60),
+            }
+
+
+# --- Testing Block ---
+if __name__ == "__main__":
+    async def main():
+        scheduler = LLMScheduler(max_in_flight=2, requests_per_second=20, tokens_per_minute=0, max_queue=50)
+        order = []
+
+        async def call(session, i):
+            async with scheduler.aslot(session, cost=100):
+                order.append(session)
+                await asyncio.sleep(0.01)
+
+        # One session floods the queue first; the second still gets every other slot
+        start = time.perf_counter()
+        await asyncio.gather(*[call("batch", i) for i in range(10)], *[call("student", i) for i in range(3)])
+        print(f"13 calls at 20 req/s in {time.perf_counter() - start:.2f}s, order: {' '.join(s[0] for s in order)}")
+        print(scheduler.stats())
+
+        print(type(classify_error(TimeoutError("read timed out"))).__name__,
+              type(classify_error(ConnectionResetError("reset"))).__name__,
+              retry_delay(LLMRateLimited("slow down", retry_after=2), 1, 3, 0.5, 20))
+
+        tight = LLMScheduler(max_in_flight=1, max_queue=1, max_wait=0.05)
+        async with tight.aslot("a", 1):
+            waiter = asyncio.ensure_future(call_tight(tight))
+            await asyncio.sleep(0)
+            try:
+                await tight.aacquire("c", 1)
+            except LLMOverloaded as e:
+                print(f"queue full -> {e.status_code}: {e}")
+            try:
+                await waiter
+            except LLMOverloaded as e:
+                print(f"queue timeout -> {e.status_code}: {e}")
+        print(tight.stats())
+
+    async def call_tight(scheduler):
+        async with scheduler.aslot("b", 1):
+            pass
+
+    asyncio.run(main())
@@ -0,0 +1,309 @@
+"""
+Process-wide counters and latency histograms, rendered in the Prometheus text
+exposition format by `/metrics`, plus an opt-in sampling profiler for slow
+requests.
+
+Recording is a lock, a bisect over fixed buckets and two additions, so the
+instrumentation stays on in production; nothing is allocated per observation
+once a label combination has been seen.
+"""
+import os
+import sys
+import time
+import threading
+from bisect import bisect_left
+from collections import Counter as StackCounter
+from contextlib import ContextDecorator, contextmanager
+
+# Seconds; covers a 1 ms tokenizer call up to a slow 2-minute generation
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _label_text(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic count per label combination."""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels[name] for name in self.labels), 0)
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield self.name, _label_text(self.labels, key), value
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label combination, like a Prometheus client's."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [per-bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        slot = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[slot] += 1
+            series[-1] += value
+
+    def count(self, **labels):
+        series = self._series.get(tuple(labels[name] for name in self.labels))
+        return sum(series[:-1]) if series else 0
+
+    def samples(self):
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        for key, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), values[:-1]):
+                cumulative += count
+                labels = _label_text(self.labels + ("le",), key + (_number(bound),))
+                yield f"{self.name}_bucket", labels, cumulative
+            yield f"{self.name}_sum", _label_text(self.labels, key), values[-1]
+            yield f"{self.name}_count", _label_text(self.labels, key), cumulative
+
+
+class CallbackMetric:
+    """Values read from elsewhere at scrape time: `read()` returns {label values tuple: value}."""
+
+    def __init__(self, name, help_text, kind, labels, read):
+        self.name = name
+        self.help = help_text
+        self.kind = kind
+        self.labels = tuple(labels)
+        self.read = read
+
+    def samples(self):
+        for key, value in sorted(self.read().items()):
+            yield self.name, _label_text(self.labels, key), value
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name!r} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self._register(Counter(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, help_text, labels, buckets))
+
+    def callback(self, name, help_text, read, kind="gauge", labels=()):
+        return self._register(CallbackMetric(name, help_text, kind, labels, read))
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram(
+    "examprep_stage_seconds", "Time spent in one pipeline stage per call.", labels=("stage",))
+REQUEST_SECONDS = registry.histogram(
+    "examprep_http_request_seconds", "HTTP request latency until the response starts.",
+    labels=("method", "route", "status"))
+CHUNKS = registry.counter(
+    "examprep_chunks_total", "Chunks by ingestion stage (chunked, deduplicated, embedded, indexed).",
+    labels=("stage",))
+LLM_TOKENS = registry.counter(
+    "examprep_llm_tokens_total", "Estimated tokens sent to and received from the LLM backend.", labels=("kind",))
+LLM_CALLS = registry.counter(
+    "examprep_llm_calls_total", "Upstream LLM calls by outcome (ok, error).", labels=("outcome",))
+
+
+class timed(ContextDecorator):
+    """
+    Records the wall time of a block (or, as a decorator, of every call) under
+    examprep_stage_seconds{stage=...}.
+    """
+
+    def __init__(self, stage):
+        self.stage = stage
+        self._starts = threading.local()
+
+    def __enter__(self):
+        starts = self._starts.__dict__.setdefault("stack", [])
+        starts.append(time.perf_counter())
+        return self
+
+    def __exit__(self, *exc):
+        STAGE_SECONDS.observe(time.perf_counter() - self._starts.stack.pop(), stage=self.stage)
+        return False
+
+
+def observe_stage(stage, seconds):
+    STAGE_SECONDS.observe(seconds, stage=stage)
+
+
+class SlowRequestProfiler:
+    """
+    Opt-in sampling profiler: while at least one profiled block is running, a
+    background thread samples the Python stacks of every thread each
+    `interval` seconds. When a block takes longer than `threshold` seconds its
+    samples are written to `out_dir` as collapsed stacks ("frame;frame;frame
+    count" per line), the input format of flamegraph.pl and speedscope.
+
+    Samples cover the whole process, so worker-pool threads doing the request's
+    blocking work are included; concurrent requests see each other's stacks.
+    Disabled (no thread, no sampling) when `threshold` is None.
+    """
+
+    def __init__(self, threshold=None, interval=0.005, out_dir="cache/profiles", max_files=100):
+        self.threshold = threshold
+        self.interval = interval
+        self.out_dir = out_dir
+        self.max_files = max_files
+        self.profiles_written = 0
+        self._active = []
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def enabled(self):
+        return self.threshold is not None
+
+    @staticmethod
+    def _frame_name(frame):
+        code = frame.f_code
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+    def _sample_loop(self):
+        own_id = threading.get_ident()
+        while True:
+            with self._lock:
+                if not self._active:
+                    self._thread = None
+                    return
+                active = list(self._active)
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            stacks = []
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                frames = []
+                while frame is not None:
+                    frames.append(self._frame_name(frame))
+                    frame = frame.f_back
+                frames.append(names.get(thread_id, str(thread_id)))
+                stacks.append(";".join(reversed(frames)))
+            for samples in active:
+                samples.update(stacks)
+            time.sleep(self.interval)
+
+    @contextmanager
+    def profile(self, label):
+        if not self.enabled:
+            yield
+            return
+        samples = StackCounter()
+        with self._lock:
+            self._active.append(samples)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._sample_loop, name="profiler", daemon=True)
+                self._thread.start()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._active.remove(samples)
+            if elapsed >= self.threshold and samples and self.profiles_written < self.max_files:
+                self._write(label, elapsed, samples)
+
+    def _write(self, label, elapsed, samples):
+        os.makedirs(self.out_dir, exist_ok=True)
+        safe_label = "".join(c if c.isalnum() else "_" for c in label).strip("_")[:60]
+        path = os.path.join(self.out_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{int(elapsed * 1000)}ms-{safe_label}.folded")
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in samples.most_common():
+                f.write(f"{stack} {count}\n")
+        self.profiles_written += 1
+        print(f"Slow request ({elapsed:.2f}s) {label}: profile written to {path}")
+
+
+# --- Testing Block ---
+if __name__ == "__main__":
+    import tempfile
+
+    for _ in range(1000):
+        with timed("demo"):
+            pass
+    CHUNKS.inc(5, stage="embedded")
+
+    @timed("decorated")
+    def work():
+        time.sleep(0.01)
+    work()
+
+    start = time.perf_counter()
+    for _ in range(100000):
+        STAGE_SECONDS.observe(0.003, stage="overhead")
+    print(f"observe: {(time.perf_counter() - start) * 10:.2f} us per call")
+    print(registry.render()[:800])
+
+    with tempfile.TemporaryDirectory() as out_dir:
+        profiler = SlowRequestProfiler(threshold=0.05, interval=0.002, out_dir=out_dir)
+        with profiler.profile("GET /slow"):
+            sum(i * i for i in range(2_000_000))
+        files = os.listdir(out_dir)
+        print(f"profiles: {files}")
+        with open(os.path.join(out_dir, files[0]), encoding="utf-8") as f:
+            print(f.readline().strip()[:200])
@@ -1,81 +1,691 @@
-from sentence_transformers import SentenceTransformer
 import faiss
 import numpy as np
-import pickle
 import os
+import shutil
+import threading
 
-# Initialize the embedding model (downloads on first run)
-embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+from src.dedup import DEDUP_THRESHOLD, NearDuplicateIndex, dedup_stats
+from src.embeddings import EmbeddingService
+from src.lexical import LexicalIndex
+from src.metrics import CHUNKS, timed
+from src.retrieval import reciprocal_rank_fusion
+from src.storage import ChunkStore, VectorStore, INDEX_FILE, META_FILE, decode_runs, encode_runs, read_meta, write_store
+from src.topics import TopicMap
+
+# Embedding model; weights are downloaded/loaded on first use
+EMBEDDING_MODEL_NAME = 'all-MiniLM-L6-v2'
+embedding_service = EmbeddingService(
+    EMBEDDING_MODEL_NAME,
+    batch_size=int(os.getenv("EMBED_BATCH_SIZE", 64)),
+    num_threads=int(os.getenv("EMBED_THREADS", 0)) or None,
+    normalize=os.getenv("EMBED_NORMALIZE", "0") == "1",
+)
+
+DEFAULT_DOC_ID = "default"
+
+# Index kinds accepted by build_index / VectorDB(index_kind=...)
+INDEX_KINDS = ("flat", "ivf", "hnsw", "ivfpq")
+# Vector storage formats: full float32, half precision, or 8-bit scalar quantization
+STORAGE_TYPES = ("float32", "fp16", "int8")
+# IVF kinds need k-means training; FAISS wants ~39 points per centroid
+TRAINED_KINDS = ("ivf", "ivfpq")
+MIN_POINTS_PER_CENTROID = 39
+# int8 storage learns per-dimension ranges; this many vectors are plenty for that
+SQ_TRAIN_POINTS = 1000
+# HNSW cannot delete in place; rebuild once this fraction of it is tombstoned
+HNSW_COMPACT_RATIO = 0.2
+# search_batch modes: dense vectors only, or dense fused with BM25
+RETRIEVAL_MODES = ("dense", "hybrid")
+RRF_K = 60
+# Candidates taken from each retriever before fusion, as a multiple of k
+FUSION_DEPTH = 4
+
+def embed_chunks(chunks):
+    """Encodes a list of text chunks into a float32 embedding matrix."""
+    print("Generating embeddings...")
+    CHUNKS.inc(len(chunks), stage="embedded")
+    return embedding_service.encode(chunks)
+
+def embed_queries(queries):
+    """Encodes all queries of a request in a single batched call."""
+    return embedding_service.encode(queries)
+
+def needs_training(kind, storage="float32"):
+    return kind in TRAINED_KINDS or storage == "int8"
+
+def bytes_per_vector(kind, dimension, storage="float32", pq_m=48, **_):
+    """Size of one stored vector (or PQ code) for an index configuration."""
+    if kind == "ivfpq":
+        return pq_m
+    return {"float32": 4, "fp16": 2, "int8": 1}[storage] * dimension
+
+def build_index(kind, dimension, metric="l2", storage="float32", nlist=256, pq_m=48,
+                hnsw_m=32, ef_search=64, nprobe=8):
+    """
+    Index factory for the supported index kinds:
+      flat  - exact brute-force search (IndexFlat)
+      ivf   - inverted lists over exact vectors (IndexIVFFlat), needs training
+      hnsw  - graph-based search (IndexHNSWFlat), no training
+      ivfpq - inverted lists over product-quantized codes (IndexIVFPQ), needs training
+    `metric` is "l2" or "ip" (inner product; callers normalize vectors so it equals cosine).
+    `storage` keeps vectors as float32, fp16 or int8 (scalar quantizer) for flat, ivf
+    and hnsw; int8 needs a short training pass. ivfpq always stores PQ codes.
+    flat and hnsw are wrapped in IndexIDMap2 so they accept external ids; the IVF
+    indexes store external ids natively.
+    """
+    if kind not in INDEX_KINDS:
+        raise ValueError(f"Unknown index kind {kind!r}. Use one of {INDEX_KINDS}.")
+    if metric not in ("l2", "ip"):
+        raise ValueError(f"Unknown metric {metric!r}. Use 'l2' or 'ip'.")
+    if storage not in STORAGE_TYPES:
+        raise ValueError(f"Unknown storage {storage!r}. Use one of {STORAGE_TYPES}.")
+    faiss_metric = faiss.METRIC_INNER_PRODUCT if metric == "ip" else faiss.METRIC_L2
+    qtype = faiss.ScalarQuantizer.QT_fp16 if storage == "fp16" else faiss.ScalarQuantizer.QT_8bit
+
+    if kind == "flat":
+        if storage == "float32":
+            return faiss.IndexIDMap2(faiss.IndexFlat(dimension, faiss_metric))
+        return faiss.IndexIDMap2(faiss.IndexScalarQuantizer(dimension, qtype, faiss_metric))
+
+    if kind == "hnsw":
+        if storage == "float32":
+            hnsw = faiss.IndexHNSWFlat(dimension, hnsw_m, faiss_metric)
+        else:
+            hnsw = faiss.IndexHNSWSQ(dimension, qtype, hnsw_m, faiss_metric)
+        hnsw.hnsw.efSearch = ef_search
+        return faiss.IndexIDMap2(hnsw)
+
+    quantizer = faiss.IndexFlat(dimension, faiss_metric)
+    if kind == "ivf" and storage == "float32":
+        index = faiss.IndexIVFFlat(quantizer, dimension, nlist, faiss_metric)
+    elif kind == "ivf":
+        index = faiss.IndexIVFScalarQuantizer(quantizer, dimension, nlist, qtype, faiss_metric)
+    else:
+        index = faiss.IndexIVFPQ(quantizer, dimension, nlist, pq_m, 8, faiss_metric)
+    index.nprobe = nprobe
+    return index
+
+def _source(record):
+    return (record["doc_id"], record["page"], record["offset"])
+
+def _as_record(chunk, doc_id):
+    """Normalizes a chunk (plain string or dict from chunk_pages) into a metadata record."""
+    if isinstance(chunk, str):
+        chunk = {"text": chunk}
+    return {
+        "text": chunk["text"],
+        "doc_id": doc_id,
+        "page": chunk.get("page"),
+        "offset": chunk.get("offset", 0),
+    }
 
 class VectorDB:
-    def __init__(self, index_file="faiss_index.bin", metadata_file="metadata.pkl"):
+    """
+    Multi-document vector store.
+
+    Every chunk gets a stable integer id inside the FAISS index, so a document's
+    vectors can be appended or removed without touching (or re-embedding) the rest
+    of the corpus. `metadata` maps chunk id -> {"text", "doc_id", "page", "offset"}
+    and `vectors` keeps the raw (prepared) float32 vector of every live chunk.
+    `lexical` is a BM25 index over the same chunks, kept in step with the vectors,
+    so `search_batch` can fuse exact-term matches with dense similarity.
+
+    Chunks that are near-duplicates (MinHash/LSH, Jaccard >= `dedup_threshold`)
+    of an indexed chunk are not embedded or indexed again. Their locations are
+    kept as back-references in `duplicates` (chunk id -> [(doc_id, page,
+    offset)]) and reported with search hits as "also_in". When the document
+    owning a chunk is removed, the chunk passes to its next back-reference.
+    `dedup_threshold=None` turns this off.
+
+    `save` writes the pickle-free directory format from `src.storage` to
+    `store_dir`; `load` memory-maps it, so opening a large store is near-instant
+    and only the chunks and vectors that are actually read become resident.
+
+    `index_kind` selects the index from `build_index`, and `storage` in the index
+    params picks float32, fp16 or int8 vectors. Configurations that need training
+    (IVF kinds, int8) start out on an exact flat index and are trained
+    automatically once enough vectors exist.
+    """
+
+    def __init__(self, store_dir="vector_store", index_kind="flat", metric="l2",
+                 dedup_threshold=DEDUP_THRESHOLD, **index_params):
+        if index_kind not in INDEX_KINDS:
+            raise ValueError(f"Unknown index kind {index_kind!r}. Use one of {INDEX_KINDS}.")
         self.index = None
-        self.metadata = []  # To store the actual text alongside vectors
-        self.index_file = index_file
-        self.metadata_file = metadata_file
+        self.metadata = ChunkStore()  # chunk id -> record with the actual text and its source location
+        self.vectors = VectorStore()  # chunk id -> raw vector, used for training and rebuilds
+        self.lexical = LexicalIndex()  # BM25 postings over chunk text
+        self.documents = {}  # doc id -> list of chunk ids, in document order
+        self.dedup_threshold = dedup_threshold
+        self.dedup = NearDuplicateIndex(dedup_threshold or 1.0)  # LSH buckets over chunk text
+        self.duplicates = {}  # chunk id -> [(doc_id, page, offset)] of skipped near-duplicates
+        self._dedup_stale = False  # store loaded without dedup buckets; rebuilt on the next add
+        self.topics = TopicMap()  # k-means clusters of the chunk embeddings
+        self._topics_stale = False  # store loaded without a topic map; fitted on first use
+        self.store_dir = store_dir
+        self.index_kind = index_kind
+        self.metric = metric
+        self.index_params = index_params
+        self.trained = not needs_training(index_kind, self.storage)
+        self._dimension = None
+        self._tombstones = set()  # removed ids still present in an HNSW graph
+        self._next_id = 0
+        self._index_mapped = False  # IVF inverted lists memory-mapped read-only (IO_FLAG_MMAP)
+        # FAISS indexes are not safe to mutate while being searched
+        self._lock = threading.RLock()
+
+    def reset(self):
+        with self._lock:
+            self.index = None
+            self.metadata = ChunkStore()
+            self.vectors = VectorStore()
+            self.lexical = LexicalIndex()
+            self.documents = {}
+            self.dedup = NearDuplicateIndex(self.dedup_threshold or 1.0)
+            self.duplicates = {}
+            self._dedup_stale = False
+            self.topics = TopicMap()
+            self._topics_stale = False
+            self.trained = not needs_training(self.index_kind, self.storage)
+            self._dimension = None
+            self._tombstones = set()
+            self._next_id = 0
+            self._index_mapped = False
+
+    @property
+    def storage(self):
+        return self.index_params.get("storage", "float32")
 
-    def create_index(self, chunks):
+    def is_empty(self):
+        return self.index is None or not self.metadata
+
+    def memory_bytes(self):
+        """
+        Approximate private memory: index vectors/codes, id map, and the vectors and
+        chunk text added since the last load. Memory-mapped files are not counted;
+        they live in the shared page cache and can be dropped by the OS at any time.
+        """
+        private = (self.vectors.memory_bytes() + self.metadata.memory_bytes() + self.lexical.memory_bytes()
+                   + self.dedup.memory_bytes() + self.topics.memory_bytes())
+        if self.index is None or self._index_mapped:
+            return private
+        if self.trained:
+            per_vector = bytes_per_vector(self.index_kind, self._dimension, **self.index_params)
+        else:
+            per_vector = self._dimension * 4
+        if self.index_kind == "hnsw":
+            per_vector += self.index_params.get("hnsw_m", 32) * 2 * 4
+        return self.index.ntotal * (per_vector + 8) + private
+
+    @property
+    def train_threshold(self):
+        """Number of vectors collected on the flat staging index before training kicks in."""
+        if self.index_kind in TRAINED_KINDS:
+            return MIN_POINTS_PER_CENTROID * self.index_params.get("nlist", 256)
+        return SQ_TRAIN_POINTS
+
+    def _prepare(self, vectors):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if self.metric == "ip":
+            vectors = vectors.copy()
+            faiss.normalize_L2(vectors)
+        return vectors
+
+    def _ensure_index(self, dimension):
+        if self.index is None:
+            self._dimension = dimension
+            # Trained configurations stage on an exact flat index until they can be trained
+            if self.trained:
+                self.index = build_index(self.index_kind, dimension, self.metric, **self.index_params)
+            else:
+                self.index = build_index("flat", dimension, self.metric)
+
+    def _ensure_writable(self):
+        """Re-reads a memory-mapped (read-only) index into memory before mutating it."""
+        if self._index_mapped:
+            self.index = faiss.read_index(os.path.join(self.store_dir, INDEX_FILE))
+            self._index_mapped = False
+
+    def _maybe_train(self):
+        """Moves the staged vectors into a freshly trained index once there are enough."""
+        if self.trained or self.index.ntotal < self.train_threshold:
+            return
+        ids, vectors = self.vectors.live()
+
+        print(f"Training {self.index_kind} index on {len(ids)} vectors...")
+        index = build_index(self.index_kind, self._dimension, self.metric, **self.index_params)
+        index.train(vectors)
+        index.add_with_ids(vectors, ids)
+        self.index = index
+        self.trained = True
+
+    def _compact(self):
+        """Rebuilds an HNSW graph without its tombstoned vectors."""
+        live_ids, vectors = self.vectors.live()
+        if self.trained:
+            index = build_index(self.index_kind, self._dimension, self.metric, **self.index_params)
+        else:
+            index = build_index("flat", self._dimension, self.metric)
+        if len(live_ids):
+            if not index.is_trained:
+                # int8 storage (IndexHNSWSQ): the scalar quantizer learns its ranges first
+                index.train(vectors)
+            index.add_with_ids(vectors, live_ids)
+        self.index = index
+        self._tombstones = set()
+
+    def _chunk_shingles(self, chunk_id):
+        record = self.metadata.get(chunk_id)
+        return None if record is None else self.dedup.sketch(record["text"])[0]
+
+    def _rebuild_dedup(self):
+        """Indexes the text of a store saved before near-duplicate detection existed."""
+        self.dedup = NearDuplicateIndex(self.dedup_threshold)
+        for chunk_id, record in self.metadata.items():
+            self.dedup.add(chunk_id, self.dedup.sketch(record["text"])[1])
+        self._dedup_stale = False
+
+    def _deduplicate(self, records):
+        """
+        Splits incoming records into new chunks and near-duplicates of indexed ones
+        (or of earlier records of the same batch). New chunks get their ids reserved
+        and their LSH buckets registered right away. Returns (positions of new
+        records, their ids, [(existing chunk id, position)] of duplicates).
+        """
+        if self._dedup_stale:
+            self._rebuild_dedup()
+        pending = {}  # reserved id -> shingles of new records not yet in metadata
+        keep, ids, merged = [], [], []
+        for position, record in enumerate(records):
+            shingle_hashes, keys = self.dedup.sketch(record["text"])
+            match, _ = self.dedup.find(
+                shingle_hashes, keys,
+                lambda chunk_id: pending[chunk_id] if chunk_id in pending else self._chunk_shingles(chunk_id),
+            )
+            if match is not None:
+                merged.append((match, position))
+                continue
+            chunk_id = self._next_id
+            self._next_id += 1
+            self.dedup.add(chunk_id, keys)
+            pending[chunk_id] = shingle_hashes
+            keep.append(position)
+            ids.append(chunk_id)
+        return keep, ids, merged
+
+    def add_document(self, doc_id, chunks, embeddings=None):
+        """
+        Appends one document's chunks to the live index.
+        `chunks` may be plain strings or records from `chunk_pages` (whose
+        "duplicates" back-references from ingestion are kept). Re-adding an
+        existing doc id replaces its previous chunks. Near-duplicates of indexed
+        chunks are recorded as back-references instead of being embedded and
+        indexed. Cost depends only on the size of this document, not on the
+        size of the corpus.
+        Returns the number of chunks added.
+        """
+        if not chunks:
+            return 0
+
+        records = [_as_record(chunk, doc_id) for chunk in chunks]
+        ingested_duplicates = [
+            [] if isinstance(chunk, str) else
+            [(doc_id, ref.get("page"), ref.get("offset", 0)) for ref in chunk.get("duplicates", ())]
+            for chunk in chunks
+        ]
+        with self._lock:
+            if doc_id in self.documents:
+                self.remove_document(doc_id)
+            if self.dedup_threshold:
+                keep, ids, merged = self._deduplicate(records)
+            else:
+                keep = list(range(len(records)))
+                ids = list(range(self._next_id, self._next_id + len(records)))
+                self._next_id += len(records)
+                merged = []
+            for chunk_id, position in merged:
+                refs = self.duplicates.setdefault(chunk_id, [])
+                refs.append(_source(records[position]))
+                refs.extend(ingested_duplicates[position])
+            # Registered now, so the document exists even if every chunk was a duplicate
+            self.documents[doc_id] = []
+
+        # Encode outside the lock so searches keep running meanwhile
+        embeddings_avoided = 0
+        if embeddings is None:
+            embeddings = embed_chunks([records[i]["text"] for i in keep]) if keep else None
+            embeddings_avoided = len(merged)
+        elif merged:
+            embeddings = np.asarray(embeddings)[keep]
+        dedup_stats.record(len(records), len(merged), embeddings_avoided)
+        CHUNKS.inc(len(merged), stage="deduplicated")
+
+        with self._lock:
+            self.documents[doc_id] = ids
+            if keep:
+                embeddings = self._prepare(embeddings)
+                self._ensure_index(embeddings.shape[1])
+                self._ensure_writable()
+                id_array = np.array(ids, dtype=np.int64)
+                with timed("index_add"):
+                    self.index.add_with_ids(embeddings, id_array)
+                self.vectors.add(id_array, embeddings)
+                for chunk_id, position in zip(ids, keep):
+                    self.metadata[chunk_id] = records[position]
+                    if ingested_duplicates[position]:
+                        self.duplicates.setdefault(chunk_id, []).extend(ingested_duplicates[position])
+                self.lexical.add(ids, [records[position]["text"] for position in keep])
+                self._maybe_train()
+                with timed("topic_update"):
+                    self._update_topics(id_array, embeddings)
+
+        CHUNKS.inc(len(keep), stage="indexed")
+        skipped = f", skipped {len(merged)} near-duplicates" if merged else ""
+        print(f"Added {len(keep)} chunks for document {doc_id}{skipped}.")
+        return len(keep)
+
+    def _drop_references(self, doc_id):
+        """Removes every back-reference into `doc_id`. Returns how many there were."""
+        dropped = 0
+        for chunk_id in list(self.duplicates):
+            refs = self.duplicates[chunk_id]
+            remaining = [ref for ref in refs if ref[0] != doc_id]
+            dropped += len(refs) - len(remaining)
+            if remaining:
+                self.duplicates[chunk_id] = remaining
+            else:
+                del self.duplicates[chunk_id]
+        return dropped
+
+    def remove_document(self, doc_id):
+        """
+        Removes all vectors and metadata of a document. Chunks that other documents
+        also contain stay indexed and pass to the first of them.
+        Returns the number of chunks and back-references removed.
+        """
+        with self._lock:
+            ids = self.documents.pop(doc_id, None)
+            if ids is None:
+                return 0
+            removed = self._drop_references(doc_id)
+            deleted = []
+            for chunk_id in ids:
+                refs = self.duplicates.pop(chunk_id, None)
+                if not refs:
+                    deleted.append(chunk_id)
+                    continue
+                owner_doc, page, offset = refs[0]
+                self.metadata[chunk_id] = dict(self.metadata[chunk_id], doc_id=owner_doc, page=page, offset=offset)
+                self.documents.setdefault(owner_doc, []).append(chunk_id)
+                if refs[1:]:
+                    self.duplicates[chunk_id] = refs[1:]
+            removed += len(ids)
+            if not deleted:
+                return removed
+            self._ensure_writable()
+            for chunk_id in deleted:
+                self.metadata.pop(chunk_id)
+            self.vectors.remove(deleted)
+            self.lexical.remove(deleted)
+            self.topics.remove(deleted)
+            self.dedup.remove(deleted)
+
+            if self.index_kind == "hnsw":
+                self._tombstones.update(deleted)
+                if len(self._tombstones) > HNSW_COMPACT_RATIO * self.index.ntotal:
+                    self._compact()
+            else:
+                self.index.remove_ids(np.array(deleted, dtype=np.int64))
+        return removed
+
+    def create_index(self, chunks, embeddings=None):
         """
         Takes a list of text chunks, embeds them, and adds them to a FAISS index.
+        Precomputed `embeddings` (e.g. from the ingestion cache) skip the encoding step.
+        Replaces everything currently indexed; use `add_document` to append instead.
         """
         if not chunks:
             return
-        
-        # 1. Generate Embeddings
-        print("Generating embeddings...")
-        embeddings = embedding_model.encode(chunks)
-        
-        # 2. Initialize FAISS Index
-        dimension = embeddings.shape[1]
-        self.index = faiss.IndexFlatL2(dimension)
-        
-        # 3. Add to Index
-        self.index.add(np.array(embeddings))
-        
-        # 4. Store Metadata (the actual text)
-        self.metadata = chunks
-        
+
+        self.reset()
+        self.add_document(DEFAULT_DOC_ID, chunks, embeddings=embeddings)
         print(f"Index created with {len(chunks)} chunks.")
 
-    def search(self, query, k=3):
+    def _refit_topics(self):
+        ids, vectors = self.vectors.live()
+        self.topics.fit(ids, vectors)
+        self._topics_stale = False
+
+    def _update_topics(self, ids, vectors):
+        """
+        Folds a new document into the topic map. The map is refit from all
+        stored vectors when it is missing or the corpus has doubled or halved
+        since the last fit, so incremental updates never drift far.
+        """
+        if self._topics_stale or self.topics.needs_refit(len(self.vectors)):
+            self._refit_topics()
+        else:
+            self.topics.update(ids, vectors)
+
+    def _ensure_topics(self):
+        if self._topics_stale or self.topics.needs_refit(len(self.topics.ids)):
+            self._refit_topics()
+
+    def topic_summary(self):
+        """
+        Returns one entry per non-empty cluster, largest first: its size, keyword
+        labels and representative (most central) chunk record.
+        """
+        with self._lock:
+            if self.is_empty():
+                return []
+            self._ensure_topics()
+            sizes = self.topics.sizes()
+            labels = self.topics.keywords(lambda chunk_id: self.metadata[chunk_id]["text"])
+            representatives = self.topics.representatives()
+            return [
+                {"topic": int(cluster), "size": int(sizes[cluster]), "keywords": labels[cluster],
+                 "representative": dict(self.metadata[int(representatives[cluster])], id=int(representatives[cluster]))}
+                for cluster in np.argsort(-sizes, kind="stable") if sizes[cluster]
+            ]
+
+    def sample_topics(self, n, seed=None):
+        """
+        Returns the records (with "id") of up to `n` chunks spread over the topic
+        map, one per cluster, in insertion order. No search is run: with
+        seed=None these are the representatives of the largest clusters, and a
+        seed draws a different member set for each value.
+        """
+        with self._lock:
+            if self.is_empty():
+                return []
+            self._ensure_topics()
+            return [dict(self.metadata[chunk_id], id=chunk_id) for chunk_id in sorted(self.topics.sample(n, seed=seed))]
+
+    def first_records(self, n):
+        """Returns the metadata records (with "id") of the first `n` chunks in insertion order."""
+        with self._lock:
+            return [dict(record, id=chunk_id) for _, (chunk_id, record) in zip(range(n), self.metadata.items())]
+
+    def first_chunks(self, n):
+        """Returns the text of the first `n` chunks in insertion order."""
+        return [record["text"] for record in self.first_records(n)]
+
+    def _hit(self, chunk_id, record, score):
+        hit = dict(record, id=chunk_id, score=score)
+        refs = self.duplicates.get(chunk_id)
+        if refs:
+            hit["also_in"] = [{"doc_id": doc_id, "page": page, "offset": offset} for doc_id, page, offset in refs]
+        return hit
+
+    def search_vectors(self, query_vectors, k=3):
+        """
+        Searches the index with a matrix of query vectors in a single FAISS call.
+        Returns one list of metadata records per query, each record with an added
+        "id" and "score" (L2 distance, or cosine similarity for metric="ip").
+        """
+        if self.is_empty():
+            return [[] for _ in range(len(query_vectors))]
+
+        query_vectors = self._prepare(query_vectors)
+
+        with self._lock:
+            # Over-fetch to make up for removed vectors still sitting in an HNSW graph
+            with timed("vector_search"):
+                scores, indices = self.index.search(query_vectors, k + len(self._tombstones))
+
+            results = []
+            for row_scores, row_ids in zip(scores, indices):
+                hits = []
+                for score, idx in zip(row_scores, row_ids):
+                    record = self.metadata.get(int(idx))
+                    if idx != -1 and record is not None:
+                        hits.append(self._hit(int(idx), record, float(score)))
+                    if len(hits) == k:
+                        break
+                results.append(hits)
+
+        return results
+
+    def search_records(self, query, k=3):
         """
         Searches the index for the 'k' most similar chunks to the query.
-        Returns a list of text chunks.
+        Returns a list of metadata records, each with an added "id" and "score".
         """
-        if self.index is None:
+        if self.is_empty():
             print("Index is empty.")
             return []
+        return self.search_batch([query], k)[0]
 
-        # Convert query to vector
-        query_vector = embedding_model.encode([query])
-        
-        # Search FAISS
-        distances, indices = self.index.search(np.array(query_vector), k)
-        
+    def search_lexical(self, query, k=3):
+        """Returns the top-k records by BM25 alone, each with an added "id" and "score"."""
+        with self._lock:
+            return [self._hit(chunk_id, self.metadata[chunk_id], score)
+                    for chunk_id, score in self.lexical.search(query, k)]
+
+    def search_batch(self, queries, k=3, mode="hybrid"):
+        """
+        Retrieves the top-k records for every query using one batched `encode`
+        and one `index.search` over the whole query matrix.
+        With mode="hybrid" the dense candidates are fused with BM25 candidates by
+        reciprocal rank fusion; "score" is then the fused score (higher is better).
+        """
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode {mode!r}. Use one of {RETRIEVAL_MODES}.")
+        if self.is_empty() or not queries:
+            return [[] for _ in queries]
+        if mode == "dense":
+            return self.search_vectors(embed_queries(queries), k)
+
+        depth = k * FUSION_DEPTH
+        dense_lists = self.search_vectors(embed_queries(queries), depth)
         results = []
-        for idx in indices[0]:
-            if idx != -1 and idx < len(self.metadata):
-                results.append(self.metadata[idx])
-        
+        with self._lock:
+            for query, dense_hits in zip(queries, dense_lists):
+                with timed("lexical_search"):
+                    lexical_ids = [chunk_id for chunk_id, _ in self.lexical.search(query, depth)]
+                by_id = {hit["id"]: hit for hit in dense_hits}
+                fused = reciprocal_rank_fusion([list(by_id), lexical_ids], RRF_K)[:k]
+                results.append([
+                    dict(by_id[chunk_id], score=score) if chunk_id in by_id
+                    else self._hit(chunk_id, self.metadata[chunk_id], score)
+                    for chunk_id, score in fused
+                ])
         return results
 
+    def search(self, query, k=3):
+        """
+        Searches the index for the 'k' most similar chunks to the query.
+        Returns a list of text chunks.
+        """
+        return [record["text"] for record in self.search_records(query, k)]
+
+    def exists_on_disk(self):
+        return os.path.exists(os.path.join(self.store_dir, META_FILE))
+
+    def delete_from_disk(self):
+        shutil.rmtree(self.store_dir, ignore_errors=True)
+
+    def _write_indexes(self, directory):
+        faiss.write_index(self.index, os.path.join(directory, INDEX_FILE))
+        self.lexical.save(directory)
+        if self.dedup_threshold and not self._dedup_stale:
+            self.dedup.save(directory, self.vectors.live_ids())
+        if not self._topics_stale:
+            self.topics.save(directory)
+
     def save(self):
-        """Saves the FAISS index and metadata to disk."""
-        if self.index:
-            faiss.write_index(self.index, self.index_file)
-            with open(self.metadata_file, "wb") as f:
-                pickle.dump(self.metadata, f)
-            print("Index and metadata saved.")
+        """Saves the FAISS index, raw vectors and chunk metadata to `store_dir`."""
+        with self._lock:
+            if self.index:
+                meta = {
+                    "index_kind": self.index_kind,
+                    "metric": self.metric,
+                    "index_params": self.index_params,
+                    "trained": self.trained,
+                    "dimension": self._dimension,
+                    "next_id": self._next_id,
+                    "tombstones": sorted(self._tombstones),
+                    "documents": {doc_id: encode_runs(ids) for doc_id, ids in self.documents.items()},
+                    "duplicates": [[chunk_id, refs] for chunk_id, refs in self.duplicates.items()],
+                    "topics": None if self._topics_stale else self.topics.meta(),
+                }
+                write_store(self.store_dir, self.metadata, self.vectors, meta, self._write_indexes)
+                print("Index and metadata saved.")
 
     def load(self):
-        """Loads the FAISS index and metadata from disk."""
-        if os.path.exists(self.index_file) and os.path.exists(self.metadata_file):
-            self.index = faiss.read_index(self.index_file)
-            with open(self.metadata_file, "rb") as f:
-                self.metadata = pickle.load(f)
-            print("Index loaded from disk.")
-        else:
+        """
+        Opens a saved store. Vectors and chunk text are memory-mapped rather than
+        read; the FAISS index is mapped too where the index type supports it.
+        """
+        if not self.exists_on_disk():
             print("No index found on disk.")
+            return
+        with self._lock:
+            meta = read_meta(self.store_dir)
+            index_path = os.path.join(self.store_dir, INDEX_FILE)
+            try:
+                self.index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+                # IO_FLAG_MMAP only maps the inverted lists of a trained IVF index; flat
+                # and HNSW indexes (and the flat staging index) are read into memory
+                self._index_mapped = meta["index_kind"] in TRAINED_KINDS and meta["trained"]
+            except RuntimeError:
+                # Not every index type can be mapped; fall back to a regular read
+                self.index = faiss.read_index(index_path)
+                self._index_mapped = False
+            self.index_kind = meta["index_kind"]
+            self.metric = meta["metric"]
+            self.index_params = meta["index_params"]
+            self.trained = meta["trained"]
+            self._dimension = meta["dimension"]
+            self._next_id = meta["next_id"]
+            self._tombstones = set(meta["tombstones"])
+            self.documents = {doc_id: decode_runs(runs) for doc_id, runs in meta["documents"].items()}
+            self.duplicates = {chunk_id: [tuple(ref) for ref in refs] for chunk_id, refs in meta.get("duplicates", [])}
+            self.metadata = ChunkStore.open(self.store_dir, meta["doc_names"])
+            self.vectors = VectorStore.open(self.store_dir, self._dimension)
+            if LexicalIndex.exists(self.store_dir):
+                self.lexical = LexicalIndex.open(self.store_dir)
+            else:
+                # Store saved before BM25 existed: index the chunk text once
+                self.lexical = LexicalIndex()
+                for chunk_id, record in self.metadata.items():
+                    self.lexical.add([chunk_id], [record["text"]])
+            if NearDuplicateIndex.exists(self.store_dir):
+                self.dedup = NearDuplicateIndex.open(self.store_dir, self.dedup_threshold or 1.0)
+                self._dedup_stale = False
+            else:
+                # Saved before near-duplicate detection: buckets are built on the next add
+                self.dedup = NearDuplicateIndex(self.dedup_threshold or 1.0)
+                self._dedup_stale = bool(self.dedup_threshold)
+            if meta.get("topics") and TopicMap.exists(self.store_dir):
+                self.topics = TopicMap.open(self.store_dir, meta["topics"])
+                self._topics_stale = False
+            else:
+                # Saved before topic maps: clustered on first use
+                self.topics = TopicMap()
+                self._topics_stale = True
+        print("Index loaded from disk.")
 
 # --- Testing Block ---
 if __name__ == "__main__":
@@ -86,19 +696,33 @@ if __name__ == "__main__":
         "Newton's first law states that an object in motion stays in motion.",
         "Python is a high-level programming language."
     ]
-    
+
     # Initialize DB
     db = VectorDB()
-    
+
     # Create Index
     db.create_index(chunks)
-    
+
     # Test Search
     query = "How do plants make food?"
     results = db.search(query, k=1)
-    
+
     print(f"\nQuery: {query}")
     print(f"Result: {results[0]}")
-    
+
+    # Test Append / Delete
+    db.add_document("physics", ["Energy can neither be created nor destroyed."])
+    print(f"After append: {db.index.ntotal} vectors")
+    db.remove_document("physics")
+    print(f"After delete: {db.index.ntotal} vectors")
+
+    # Test an approximate index mode on normalized vectors
+    hnsw_db = VectorDB(index_kind="hnsw", metric="ip")
+    hnsw_db.create_index(chunks)
+    print(f"HNSW result: {hnsw_db.search(query, k=1)[0]}")
+
     # Test Save/Load
-    db.save()
\ No newline at end of file
+    db.save()
+    reloaded = VectorDB()
+    reloaded.load()
+    print(f"Reloaded: {reloaded.search(query, k=1)[0]}")
@@ -0,0 +1,215 @@
+"""
+OCR fallback for PDF pages without a text layer (scanned slides and notes).
+
+Extraction workers rasterize text-less pages that carry images to grayscale
+PNGs; this module OCRs them with the Tesseract engine built into PyMuPDF
+(`Pixmap.pdfocr_tobytes`, which needs Tesseract's language data installed,
+see TESSDATA_PREFIX) in a process pool of its own, so OCR never competes with
+text extraction for workers.
+
+Every document gets a `DocumentOcr` that keeps at most OCR_PAGES_PER_DOCUMENT
+of its pages in the pool at once and stops OCRing once OCR_TIME_BUDGET
+seconds have passed, so a 300-page scan cannot starve other uploads; pages
+past the budget are left out and counted. Results are cached on disk by the
+SHA-256 of the rasterized page, so re-uploads and repeated slides are free.
+"""
+import hashlib
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+
+import fitz
+
+from src.metrics import observe_stage, registry
+
+OCR_ENABLED = os.getenv("OCR_ENABLED", "1") == "1"
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+OCR_PAGES_PER_DOCUMENT = int(os.getenv("OCR_PAGES_PER_DOCUMENT", 2))
+OCR_TIME_BUDGET = float(os.getenv("OCR_TIME_BUDGET", 120))
+OCR_LANGUAGE = os.getenv("OCR_LANGUAGE", "eng")
+OCR_CACHE_DIR = os.getenv("OCR_CACHE_DIR", "cache/ocr")
+# Resolution pages are rasterized at; Tesseract is most accurate around 200-300 dpi
+OCR_DPI = 200
+
+OCR_PAGES = registry.counter(
+    "examprep_ocr_pages_total", "Text-less PDF pages by OCR outcome (ocred, cached, skipped).", labels=("outcome",))
+
+_ocr_pool = None
+_pool_lock = threading.Lock()
+
+
+def _pool():
+    """Lazily starts the OCR pool ('spawn', like the extraction pool)."""
+    global _ocr_pool
+    with _pool_lock:
+        if _ocr_pool is None:
+            _ocr_pool = ProcessPoolExecutor(max_workers=OCR_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _ocr_pool
+
+
+def needs_ocr(page, page_text):
+    """A page is OCRed when it has no text layer but does show images (a scan or a screenshot slide)."""
+    return not page_text.strip() and bool(page.get_images(full=False))
+
+
+def rasterize(page, dpi=OCR_DPI):
+    """Returns (sha256 hex digest, PNG bytes) of the page rendered in grayscale."""
+    png = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY).tobytes("png")
+    return hashlib.sha256(png).hexdigest(), png
+
+
+def _ocr_png(png, language, dpi):
+    """Worker task: returns (text, seconds) for one rasterized page."""
+    start = time.perf_counter()
+    pix = fitz.Pixmap(png)
+    pix.set_dpi(dpi, dpi)
+    with fitz.open("pdf", pix.pdfocr_tobytes(language=language)) as doc:
+        text = doc[0].get_text()
+    return text, time.perf_counter() - start
+
+
+class OcrCache:
+    """Page text keyed by the digest of the rasterized page, one small file per page."""
+
+    def __init__(self, cache_dir=OCR_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, digest):
+        return os.path.join(self.cache_dir, digest[:2], f"{digest}.txt")
+
+    def get(self, digest):
+        try:
+            with open(self._path(digest), encoding="utf-8") as f:
+                text = f.read()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return text
+
+    def put(self, digest, text):
+        path = self._path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+
+ocr_cache = OcrCache()
+
+
+class OcrPage:
+    """A text-less page waiting for OCR: its rasterized PNG and that PNG's digest."""
+
+    __slots__ = ("page_number", "digest", "png")
+
+    def __init__(self, page_number, digest, png):
+        self.page_number = page_number
+        self.digest = digest
+        self.png = png
+
+
+class DocumentOcr:
+    """
+    OCR of one document's pages. `submit` queues a page, `text` blocks until
+    its text is known. Pages must be asked for in submission order, which is
+    how extraction yields them; the earliest queued pages are the ones kept
+    in the pool. Returns "" for pages past the time budget or when OCR fails.
+    """
+
+    def __init__(self, max_in_flight=None, time_budget=None, cache=None):
+        self.max_in_flight = max_in_flight or OCR_PAGES_PER_DOCUMENT
+        self.time_budget = time_budget or OCR_TIME_BUDGET
+        self.cache = cache or ocr_cache
+        self.deadline = None
+        self.failed = False
+        self.pages_ocred = 0
+        self.pages_cached = 0
+        self.pages_skipped = 0
+        self.seconds = 0.0
+        self._queued = deque()
+        self._futures = {}  # page number -> (page, future), for pages in the pool
+
+    def _pump(self):
+        while not self.failed and self._queued and len(self._futures) < self.max_in_flight:
+            page = self._queued.popleft()
+            self._futures[page.page_number] = (page, _pool().submit(_ocr_png, page.png, OCR_LANGUAGE, OCR_DPI))
+
+    def submit(self, page):
+        if self.deadline is None:
+            self.deadline = time.monotonic() + self.time_budget
+        cached = self.cache.get(page.digest)
+        if cached is not None:
+            self.pages_cached += 1
+            return cached
+        self._queued.append(page)
+        self._pump()
+        return page
+
+    def text(self, handle):
+        """`handle` is what `submit` returned: the cached text, or the queued page."""
+        if isinstance(handle, str):
+            return handle
+        self._pump()
+        entry = self._futures.pop(handle.page_number, None)
+        if entry is None or self.failed:
+            self.pages_skipped += 1
+            self._drop(handle)
+            return ""
+        _, future = entry
+        try:
+            text, seconds = future.result(timeout=max(0.0, self.deadline - time.monotonic()))
+        except FutureTimeout:
+            future.cancel()
+            self._expire()
+            self.pages_skipped += 1
+            return ""
+        except Exception as e:
+            # Usually missing Tesseract language data; do not retry every page
+            print(f"OCR failed on page {handle.page_number}: {e}")
+            self.failed = True
+            self.pages_skipped += 1
+            return ""
+        finally:
+            self._pump()
+        self.cache.put(handle.digest, text)
+        self.pages_ocred += 1
+        self.seconds += seconds
+        observe_stage("ocr_page", seconds)
+        return text
+
+    def _drop(self, page):
+        try:
+            self._queued.remove(page)
+        except ValueError:
+            pass
+
+    def _expire(self):
+        """Budget spent: nothing else of this document goes to the pool."""
+        self.failed = True
+        for _, future in self._futures.values():
+            future.cancel()
+
+    def report(self):
+        OCR_PAGES.inc(self.pages_ocred, outcome="ocred")
+        OCR_PAGES.inc(self.pages_cached, outcome="cached")
+        OCR_PAGES.inc(self.pages_skipped, outcome="skipped")
+        return {"ocred": self.pages_ocred, "cached": self.pages_cached, "skipped": self.pages_skipped,
+                "seconds": round(self.seconds, 3)}
+
+
+def shutdown():
+    global _ocr_pool
+    with _pool_lock:
+        if _ocr_pool is not None:
+            _ocr_pool.shutdown(wait=False, cancel_futures=True)
+            _ocr_pool = None
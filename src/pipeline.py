@@ -0,0 +1,81 @@
+import numpy as np
+from src.ingest import iter_document
+from src.preprocess import BoilerplateFilter, iter_chunk_records
+from src.dedup import DEDUP_THRESHOLD, NearDuplicateIndex, dedup_stats
+from src.metrics import CHUNKS, observe_stage
+
+# Chunks are embedded in fixed-size batches as soon as a batch fills up
+EMBED_BATCH_SIZE = 64
+
+
+def ingest_document(file_path, chunk_size=254, overlap=32, embed_fn=None, batch_size=EMBED_BATCH_SIZE,
+                    token_spans=None, strip_boilerplate=True, dedup_threshold=DEDUP_THRESHOLD, file_type=None):
+    """
+    Streaming ingestion: pages are extracted in parallel and yielded in order,
+    cleaned and chunked a few pages at a time, and embedded in fixed-size batches
+    while later pages are still being extracted. The full document text is
+    never materialized.
+
+    `chunk_size` and `overlap` are in tokens of `token_spans` (by default the
+    embedding model's own tokenizer, so chunks never exceed what it can encode).
+    Running headers and footers are detected across pages and stripped before
+    chunking, so they are neither embedded nor later sent to the LLM.
+    Chunks that are near-duplicates of an earlier chunk of the same document
+    (Jaccard >= `dedup_threshold` over word shingles; None disables) are not
+    embedded; the kept chunk lists their positions under "duplicates".
+
+    `file_path` may also be the document's bytes, with `file_type` naming
+    the format (see `iter_document`).
+
+    Returns (chunk_records, embeddings), or (None, None) if no text was found.
+    """
+    if embed_fn is None:
+        from src.models import embed_chunks
+        embed_fn = embed_chunks
+    if token_spans is None:
+        from src.models import embedding_service
+        token_spans = embedding_service.token_spans
+
+    boilerplate = BoilerplateFilter() if strip_boilerplate else None
+    dedup = NearDuplicateIndex(dedup_threshold) if dedup_threshold else None
+    shingles = []  # per kept record, for verifying LSH candidates
+    checked = skipped = 0
+    timings = {}
+    records = []
+    batches = []
+    pending = []
+    for record in iter_chunk_records(iter_document(file_path, file_type), chunk_size, overlap, token_spans, boilerplate, timings):
+        if dedup is not None:
+            checked += 1
+            shingle_hashes, keys = dedup.sketch(record["text"])
+            match, _ = dedup.find(shingle_hashes, keys, shingles.__getitem__)
+            if match is not None:
+                records[match].setdefault("duplicates", []).append(
+                    {"page": record["page"], "offset": record["offset"]})
+                skipped += 1
+                continue
+            dedup.add(len(records), keys)
+            shingles.append(shingle_hashes)
+        records.append(record)
+        pending.append(record["text"])
+        if len(pending) == batch_size:
+            batches.append(embed_fn(pending))
+            pending = []
+    if pending:
+        batches.append(embed_fn(pending))
+
+    name = file_path if isinstance(file_path, str) else f"{len(file_path)}-byte {file_type} upload"
+    for stage, seconds in timings.items():
+        observe_stage(stage, seconds)
+    CHUNKS.inc(len(records) + skipped, stage="chunked")
+    CHUNKS.inc(skipped, stage="deduplicated")
+
+    if boilerplate is not None and boilerplate.lines_removed:
+        print(f"Stripped {boilerplate.lines_removed} header/footer lines from {name}.")
+    if dedup is not None:
+        dedup_stats.record(checked, skipped, skipped)
+        if skipped:
+            print(f"Skipped {skipped} near-duplicate chunks of {name}.")
+    if not records:
+        return None, None
+    return records, np.vstack(batches).astype(np.float32, copy=False)
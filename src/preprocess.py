@@ -1,23 +1,33 @@
 import re
+import time
+from itertools import islice
+import numpy as np
+
+# Markers inserted by src/ingest.py in front of every page / slide
+PAGE_MARKER = re.compile(r'^--- (?:Page|Slide) (\d+) ---$', re.MULTILINE)
 
 def clean_text(text):
     """
-    Normalizes text:
-    1. Removes multiple spaces and newlines.
-    2. Removes specific symbols if needed.
+    Normalizes text while keeping its structure:
+    1. Collapses runs of spaces/tabs inside a line to a single space.
+    2. Drops lines that are only a number (stray page numbers).
+    3. Collapses runs of blank lines to one blank line (a paragraph break).
+    Line breaks, and with them the page / slide markers, are preserved.
     """
-    # Replace multiple newlines/spaces with a single space
-    text = re.sub(r'\s+', ' ', text)
-    
+    text = re.sub(r'[^\S\n]+', ' ', text)
+    text = re.sub(r' ?\n ?', '\n', text)
+
     # Remove extremely short useless segments (like page numbers standing alone)
-    text = re.sub(r'^\d+\s*$', '', text) 
-    
+    text = re.sub(r'^\d+$', '', text, flags=re.MULTILINE)
+
+    text = re.sub(r'\n{3,}', '\n\n', text)
     return text.strip()
 
 def chunk_text(text, chunk_size=300, overlap=50):
     """
     Splits text into chunks of approximately `chunk_size` words.
     Includes `overlap` words from the previous chunk to maintain context.
+    Legacy word-count chunker; ingestion uses the token-budgeted `iter_chunk_records`.
     """
     words = text.split()
     
@@ -37,6 +47,227 @@ def chunk_text(text, chunk_size=300, overlap=50):
     
     return chunks
 
+# Rough token proxy: words and standalone punctuation marks
+TOKEN_PATTERN = re.compile(r'\w+|[^\w\s]')
+
+def estimate_tokens(text):
+    """Approximates the LLM token count of `text` without loading a tokenizer."""
+    return len(TOKEN_PATTERN.findall(text))
+
+def truncate_to_tokens(text, max_tokens):
+    """Cuts `text` after roughly `max_tokens` tokens, on a token boundary."""
+    for i, match in enumerate(TOKEN_PATTERN.finditer(text)):
+        if i == max_tokens:
+            return text[:match.start()].rstrip()
+    return text
+
+def split_pages(raw_text):
+    """
+    Splits extracted document text on the page / slide markers.
+    Returns a list of (page_number, text); documents without markers
+    (e.g. DOCX) come back as a single entry with page_number None.
+    """
+    matches = list(PAGE_MARKER.finditer(raw_text))
+    if not matches:
+        return [(None, raw_text)]
+    
+    pages = []
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(raw_text)
+        pages.append((int(match.group(1)), raw_text[match.end():end]))
+    return pages
+
+def regex_token_spans(texts):
+    """
+    Tokenizer-free stand-in for `EmbeddingService.token_spans`: (start, end)
+    character spans of the `TOKEN_PATTERN` tokens of every text.
+    """
+    return [
+        np.array([m.span() for m in TOKEN_PATTERN.finditer(text)], dtype=np.int64).reshape(-1, 2)
+        for text in texts
+    ]
+
+SENTENCE_END_CODES = np.array([ord(c) for c in ".?!:;"], dtype=np.uint32)
+
+def _last_break(is_break):
+    """For every token index i, the largest break index <= i (or -1)."""
+    positions = np.where(is_break, np.arange(len(is_break)), -1)
+    return np.maximum.accumulate(positions) if len(positions) else positions
+
+def chunk_spans(text, spans, max_tokens=256, overlap=32):
+    """
+    Cuts one page into windows of at most `max_tokens` tokens in a single pass.
+
+    `spans` are the (start, end) character offsets of the page's tokens. Each
+    window ends at the last paragraph break that still fits, else the last line
+    break, else the last sentence end, and only cuts mid-sentence when none of
+    those falls in the second half of the window. Consecutive windows share
+    `overlap` tokens. Yields (char_start, char_end) of every window; chunk text
+    is a single slice of `text`, so no per-chunk word lists are built.
+    """
+    n = len(spans)
+    if n == 0:
+        return
+    starts, ends = spans[:, 0], spans[:, 1]
+    # Classify the gap in front of every token with prefix counts over the code
+    # points instead of inspecting gaps one by one
+    codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+    newline = codes == 10
+    newlines = np.concatenate(([0], np.cumsum(newline)))
+    blank_lines = np.concatenate(([0], np.cumsum(newline[:-1] & newline[1:])))
+    gap_start, gap_end = ends[:-1], starts[1:]
+    # A break at index i means "a new unit starts at token i"; index n is always a break
+    paragraph = np.ones(n + 1, dtype=bool)
+    line = np.ones(n + 1, dtype=bool)
+    sentence = np.ones(n + 1, dtype=bool)
+    paragraph[0] = line[0] = sentence[0] = False
+    paragraph[1:n] = blank_lines[np.maximum(gap_end - 1, gap_start)] > blank_lines[gap_start]
+    line[1:n] = newlines[gap_end] > newlines[gap_start]
+    sentence[1:n] = np.isin(codes[gap_start - 1], SENTENCE_END_CODES) & (gap_end > gap_start)
+    last_breaks = [_last_break(paragraph), _last_break(line), _last_break(sentence)]
+
+    overlap = min(overlap, max_tokens // 2)
+    begin = 0
+    while begin < n:
+        limit = min(begin + max_tokens, n)
+        end = limit
+        if limit < n:
+            for last in last_breaks:
+                if last[limit] > begin + max_tokens // 2:
+                    end = int(last[limit])
+                    break
+        yield int(starts[begin]), int(ends[end - 1])
+        if end == n:
+            break
+        begin = max(end - overlap, begin + 1)
+
+def boilerplate_key(line):
+    """Normalizes a line for repeat detection: "Page 3 of 20" and "Page 4 of 20" share a key."""
+    return re.sub(r'\d+', '#', " ".join(line.lower().split()))
+
+class BoilerplateFilter:
+    """
+    Detects running headers and footers (course title, "Page 3 of 20", a
+    copyright line) while a document streams through ingestion, and strips
+    them from the page edges before chunking.
+
+    Only the first and last `edge_lines` lines of a page are candidates. A
+    candidate becomes boilerplate once it has been seen on at least `min_pages`
+    pages and on at least `min_share` of the pages seen so far. Counts carry
+    over between page batches, so a footer is usually known after the first
+    batch and is stripped from every later page as well.
+    """
+
+    def __init__(self, edge_lines=2, min_pages=3, min_share=0.4, max_chars=100):
+        self.edge_lines = edge_lines
+        self.min_pages = min_pages
+        self.min_share = min_share
+        self.max_chars = max_chars
+        self.counts = {}
+        self.pages_seen = 0
+        self.lines_removed = 0
+
+    def _edges(self, lines):
+        # Short pages only contribute their first and last line
+        edge = self.edge_lines if len(lines) > 2 * self.edge_lines else 1
+        return lines[:edge] + lines[-edge:]
+
+    def observe(self, texts):
+        """Counts the edge lines of a batch of cleaned pages (each line once per page)."""
+        for text in texts:
+            lines = [line for line in text.split("\n") if line.strip()]
+            self.pages_seen += 1
+            for key in {boilerplate_key(line) for line in self._edges(lines) if len(line) <= self.max_chars}:
+                self.counts[key] = self.counts.get(key, 0) + 1
+
+    def is_boilerplate(self, line):
+        if len(line) > self.max_chars:
+            return False
+        count = self.counts.get(boilerplate_key(line), 0)
+        return count >= self.min_pages and count >= self.min_share * self.pages_seen
+
+    def strip(self, text):
+        """Removes boilerplate lines from the top and bottom edge of one cleaned page."""
+        lines = text.split("\n")
+        top, bottom = 0, len(lines)
+        for _ in range(self.edge_lines):
+            while top < bottom and not lines[top].strip():
+                top += 1
+            if top < bottom and self.is_boilerplate(lines[top]):
+                top += 1
+                self.lines_removed += 1
+        for _ in range(self.edge_lines):
+            while bottom > top and not lines[bottom - 1].strip():
+                bottom -= 1
+            if bottom > top and self.is_boilerplate(lines[bottom - 1]):
+                bottom -= 1
+                self.lines_removed += 1
+        if top == 0 and bottom == len(lines):
+            return text
+        if not any(line.strip() for line in lines[top:bottom]):
+            # Never strip a page down to nothing
+            return text
+        return "\n".join(lines[top:bottom]).strip()
+
+# Pages tokenized per batch call; fast tokenizers parallelize across a batch
+TOKENIZE_PAGES_PER_BATCH = 16
+
+def iter_chunk_records(pages, chunk_size=256, overlap=32, token_spans=regex_token_spans, boilerplate=None,
+                       timings=None):
+    """
+    Cleans and chunks a stream of (page_number, text) pieces a few pages at a time,
+    so only a small window of pages is ever held in memory. Chunks never cross a
+    page / slide boundary and hold at most `chunk_size` tokens as counted by
+    `token_spans` (pass `EmbeddingService.token_spans` for the model's tokenizer).
+    Yields dicts {"text", "page", "offset"} where `offset` is the character offset
+    of the chunk within its cleaned page; pieces without a page number (DOCX
+    blocks) share one running offset.
+
+    With a `BoilerplateFilter`, repeated page headers and footers are detected
+    batch by batch and removed from pages before they are chunked.
+
+    A `timings` dict accumulates the seconds spent waiting for pages
+    ("extract"), cleaning them ("clean") and tokenizing and splitting them
+    ("chunk"); time spent by the consumer between chunks is not counted.
+    """
+    if timings is None:
+        timings = {}
+    for stage in ("extract", "clean", "chunk"):
+        timings.setdefault(stage, 0.0)
+    running_offset = 0
+    pages = iter(pages)
+    while True:
+        start = time.perf_counter()
+        raw = list(islice(pages, TOKENIZE_PAGES_PER_BATCH))
+        extracted = time.perf_counter()
+        timings["extract"] += extracted - start
+        if not raw:
+            return
+        batch = [(page, clean_text(page_text)) for page, page_text in raw]
+        if boilerplate is not None:
+            # DOCX blocks are not pages and have no running headers
+            boilerplate.observe(text for page, text in batch if page is not None)
+            batch = [(page, text if page is None else boilerplate.strip(text)) for page, text in batch]
+        cleaned_at = time.perf_counter()
+        timings["clean"] += cleaned_at - extracted
+        records = []
+        for (page, cleaned), spans in zip(batch, token_spans([text for _, text in batch])):
+            base = running_offset if page is None else 0
+            for start, end in chunk_spans(cleaned, spans, chunk_size, overlap):
+                records.append({"text": cleaned[start:end], "page": page, "offset": base + start})
+            if page is None and cleaned:
+                running_offset += len(cleaned) + 1
+        timings["chunk"] += time.perf_counter() - cleaned_at
+        yield from records
+
+def chunk_pages(raw_text, chunk_size=256, overlap=32, token_spans=regex_token_spans):
+    """
+    Cleans and chunks each page separately so every chunk keeps its source location.
+    Returns a list of dicts: {"text", "page", "offset"} where `offset` is the
+    character offset of the chunk within its page.
+    """
+    return list(iter_chunk_records(split_pages(raw_text), chunk_size, overlap, token_spans))
+
 if __name__ == "__main__":
     # Test Data
     raw_sample = """
@@ -56,6 +287,19 @@ if __name__ == "__main__":
     print("\n--- Cleaned ---")
     print(cleaned)
     
+    # token-budgeted chunking test
+    pages = [(1, "First paragraph. " * 60 + "\n\n" + "Second paragraph. " * 60), (2, "Slide two.")]
+    for record in iter_chunk_records(pages, chunk_size=100, overlap=10):
+        print(f"page={record['page']} offset={record['offset']} tokens={estimate_tokens(record['text'])}")
+
+    # boilerplate test: the footer repeats on every slide and is stripped
+    topics = ["Cells", "Membranes", "Enzymes", "Respiration", "Photosynthesis"]
+    slides = [(n, f"{topic}\n{topic} are covered in chapter {n}.\nBIO 101 - Week 3 - Slide {n}")
+              for n, topic in enumerate(topics, start=1)]
+    boilerplate = BoilerplateFilter()
+    records = list(iter_chunk_records(slides, chunk_size=100, overlap=10, boilerplate=boilerplate))
+    print(f"\n--- Boilerplate --- removed {boilerplate.lines_removed} lines: {records[0]['text']!r}")
+
     # dummy chunking test
     long_text = "word " * 1000
     chunks = chunk_text(long_text, chunk_size=100, overlap=20)
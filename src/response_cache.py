@@ -0,0 +1,152 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """
+    TTL + LRU cache for LLM completions, keyed on a hash of the model, the
+    prompt messages and the sampling parameters.
+
+    Entries live in memory; if `disk_dir` is set they are also written there
+    as JSON files so they survive restarts and are shared between workers.
+    `get_or_compute` coalesces concurrent identical requests: only the first
+    caller hits the upstream API, the others await its result.
+    """
+
+    def __init__(self, max_entries=1024, ttl_seconds=3600, disk_dir=None, disk_max_entries=10_000):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_dir = disk_dir
+        self.disk_max_entries = disk_max_entries
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._entries = OrderedDict()  # key -> (expires_at, value), least recently used first
+        self._inflight = {}  # key -> asyncio.Future of the call in progress
+        self._lock = threading.Lock()
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(model, messages, params):
+        raw = json.dumps({"model": model, "messages": messages, "params": params}, sort_keys=True)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _read_disk(self, key):
+        try:
+            with open(self._disk_path(key), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry["expires_at"] < time.time():
+            return None
+        return entry["expires_at"], entry["value"]
+
+    def _write_disk(self, key, expires_at, value):
+        path = self._disk_path(key)
+        tmp = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"expires_at": expires_at, "value": value}, f)
+        os.replace(tmp, path)
+
+        files = [os.path.join(self.disk_dir, name) for name in os.listdir(self.disk_dir) if name.endswith(".json")]
+        if len(files) > self.disk_max_entries:
+            files.sort(key=os.path.getmtime)
+            for old in files[: len(files) - self.disk_max_entries]:
+                try:
+                    os.remove(old)
+                except OSError:
+                    pass
+
+    def get(self, key):
+        """Returns the cached value, or None if missing or expired."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < now:
+                del self._entries[key]
+                entry = None
+            if entry is None and self.disk_dir:
+                entry = self._read_disk(key)
+                if entry is not None:
+                    self._entries[key] = entry
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        if self.disk_dir:
+            self._write_disk(key, expires_at, value)
+
+    async def get_or_compute(self, key, compute, fresh=False):
+        """
+        Returns the cached value for `key`, or awaits `compute()` and caches it.
+        Identical concurrent calls share one in-flight `compute()`. With `fresh`
+        the cache and any in-flight call are bypassed, and the new value replaces
+        the cached one.
+        """
+        if not fresh:
+            value = self.get(key)
+            if value is not None:
+                return value
+            inflight = self._inflight.get(key)
+            if inflight is not None:
+                self.coalesced += 1
+                try:
+                    return await asyncio.shield(inflight)
+                except asyncio.CancelledError:
+                    if not inflight.cancelled():
+                        raise  # this caller was cancelled
+                # The caller computing it was cancelled; take over (or join whoever did first)
+                return await self.get_or_compute(key, compute)
+
+        future = asyncio.get_running_loop().create_future()
+        if not fresh:
+            self._inflight[key] = future
+        try:
+            value = await compute()
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # waiters re-raise it; don't warn about it being unretrieved
+            raise
+        except BaseException:
+            # Cancelled: waiting callers must not hang on a future nobody will resolve
+            future.cancel()
+            raise
+        else:
+            self.put(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "entries": len(self._entries),
+                "in_flight": len(self._inflight),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "disk_dir": self.disk_dir,
+            }
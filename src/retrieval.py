@@ -0,0 +1,228 @@
+import re
+import numpy as np
+from src.preprocess import estimate_tokens, truncate_to_tokens
+
+# Compression works on sentences and on lines (slide bullets have no full stop)
+SENTENCE_BREAK = re.compile(r'(?<=[.!?])[^\S\n]+|\s*\n\s*')
+# Short lines repeated across passages are headers, footers or slide titles
+REPEATED_LINE_MAX_CHARS = 100
+REPEATED_LINE_MIN_WORDS = 3
+# A sentence at least this similar to one already kept adds nothing
+DUPLICATE_SIMILARITY = 0.95
+
+
+def interleave_hits(hit_lists):
+    """
+    Merges per-query result lists round-robin (1st hit of every query, then 2nd, ...)
+    and drops chunks already retrieved by an earlier query, so every topic gets
+    represented before any single topic takes more of the budget.
+    """
+    seen = set()
+    merged = []
+    for rank in range(max((len(hits) for hits in hit_lists), default=0)):
+        for hits in hit_lists:
+            if rank < len(hits) and hits[rank]["id"] not in seen:
+                seen.add(hits[rank]["id"])
+                merged.append(hits[rank])
+    return merged
+
+
+def reciprocal_rank_fusion(ranked_id_lists, k=60):
+    """
+    Fuses several rankings of the same items with reciprocal rank fusion:
+    score(id) = sum over rankings of 1 / (k + rank). Only ranks are used, so
+    scores on different scales (L2 distance, BM25) combine without calibration.
+    Returns [(id, fused score)] best first.
+    """
+    fused = {}
+    for ranked_ids in ranked_id_lists:
+        for rank, item_id in enumerate(ranked_ids, start=1):
+            fused[item_id] = fused.get(item_id, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
+
+
+def _source_key(record):
+    page = record.get("page")
+    return (record.get("doc_id") or "", -1 if page is None else page, record.get("offset", 0))
+
+
+def merge_overlapping(records):
+    """
+    Joins chunks that overlap or touch in their source (same document and page,
+    and the next chunk starts at most one character after the previous one ends;
+    offsets are character offsets within the cleaned page). The overlapping
+    text is only kept once. Returns passages in reading order.
+    """
+    passages = []
+    for record in sorted(records, key=_source_key):
+        text = record["text"]
+        offset = record.get("offset", 0)
+        last = passages[-1] if passages else None
+        if (
+            last is not None
+            and last["doc_id"] == record.get("doc_id")
+            and last["page"] == record.get("page")
+            and offset <= last["end"] + 1
+        ):
+            if offset > last["end"]:
+                last["parts"].append(" ")
+            last["parts"].append(text[max(last["end"] - offset, 0):])
+            last["end"] = max(last["end"], offset + len(text))
+            continue
+        passages.append({
+            "doc_id": record.get("doc_id"),
+            "page": record.get("page"),
+            "parts": [text],
+            "end": offset + len(text),
+        })
+    return ["".join(passage["parts"]) for passage in passages]
+
+
+def drop_repeated_lines(passages):
+    """
+    Keeps only the first occurrence of a short line that shows up again in a
+    later passage (a running header or footer in documents ingested before
+    boilerplate stripping, or shared by several documents).
+    """
+    seen = set()
+    result = []
+    for passage in passages:
+        lines = []
+        keys = set()
+        for line in passage.split("\n"):
+            key = " ".join(line.lower().split())
+            if len(key) <= REPEATED_LINE_MAX_CHARS and len(key.split()) >= REPEATED_LINE_MIN_WORDS:
+                if key in seen:
+                    continue
+                keys.add(key)
+            lines.append(line)
+        seen |= keys
+        text = "\n".join(lines).strip()
+        if text:
+            result.append(text)
+    return result
+
+
+def _sentences(passage):
+    """Yields (start, end) of the sentences / lines of a passage."""
+    start = 0
+    for match in SENTENCE_BREAK.finditer(passage):
+        if passage[start:match.start()].strip():
+            yield start, match.start()
+        start = match.end()
+    if passage[start:].strip():
+        yield start, len(passage)
+
+
+def compress_passages(passages, target_tokens, embed_fn):
+    """
+    Extractive compression to `target_tokens`: every sentence is embedded, scored
+    by its centrality (mean cosine similarity to all other sentences of the
+    context), and the most central sentences are kept until the target is met,
+    skipping near-duplicates of sentences already kept. Kept sentences stay in
+    reading order and keep their line breaks.
+    """
+    units = [(i, start, end) for i, passage in enumerate(passages) for start, end in _sentences(passage)]
+    texts = [passages[i][start:end] for i, start, end in units]
+    tokens = np.array([estimate_tokens(text) for text in texts])
+    if tokens.sum() <= target_tokens or len(units) < 2:
+        return passages
+
+    vectors = np.asarray(embed_fn(texts), dtype=np.float32)
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    similarity = vectors @ vectors.T
+    centrality = (similarity.sum(axis=1) - 1.0) / (len(units) - 1)
+
+    kept = []
+    used = 0
+    for i in np.argsort(-centrality, kind="stable").tolist():
+        if used + tokens[i] > target_tokens:
+            continue
+        if kept and similarity[i, kept].max() >= DUPLICATE_SIMILARITY:
+            continue
+        kept.append(i)
+        used += tokens[i]
+
+    compressed = [[] for _ in passages]
+    previous_end = {}
+    for i in sorted(kept):
+        passage, start, end = units[i]
+        parts = compressed[passage]
+        if parts:
+            # Keep a line break if there was one between the two kept sentences
+            parts.append("\n" if "\n" in passages[passage][previous_end[passage]:start] else " ")
+        parts.append(passages[passage][start:end])
+        previous_end[passage] = end
+    return ["".join(parts) for parts in compressed if parts]
+
+
+def assemble_context(hit_lists, token_budget, target_tokens=None, embed_fn=None):
+    """
+    Builds the LLM context from retrieval results.
+    Takes chunks in interleaved relevance order until `token_budget` is spent,
+    merges overlapping neighbours, drops repeated header/footer lines and, with
+    `target_tokens` and an `embed_fn`, compresses the result extractively.
+
+    Returns (context, report) where the report counts prompt tokens saved by
+    each stage relative to concatenating the raw chunks.
+    """
+    selected = []
+    used = 0
+    for record in interleave_hits(hit_lists):
+        tokens = estimate_tokens(record["text"])
+        if used + tokens > token_budget:
+            if not selected:
+                # A single oversized chunk still gets used, trimmed to the budget
+                selected.append(dict(record, text=truncate_to_tokens(record["text"], token_budget)))
+                used = estimate_tokens(selected[0]["text"])
+            break
+        selected.append(record)
+        used += tokens
+
+    passages = merge_overlapping(selected)
+    merged_tokens = sum(estimate_tokens(passage) for passage in passages)
+    passages = drop_repeated_lines(passages)
+    deduplicated_tokens = sum(estimate_tokens(passage) for passage in passages)
+    if target_tokens and embed_fn is not None:
+        passages = compress_passages(passages, target_tokens, embed_fn)
+    context = "\n\n".join(passages)
+    context_tokens = estimate_tokens(context)
+
+    report = {
+        "chunks": len(selected),
+        "raw_tokens": used,
+        "overlap_tokens_removed": used - merged_tokens,
+        "repeated_line_tokens_removed": merged_tokens - deduplicated_tokens,
+        "compression_tokens_removed": deduplicated_tokens - context_tokens,
+        "context_tokens": context_tokens,
+        "tokens_saved": used - context_tokens,
+    }
+    return context, report
+
+
+# --- Testing Block ---
+if __name__ == "__main__":
+    hits = [
+        [{"id": 1, "doc_id": "a", "page": 1, "offset": 0, "text": "one two three four five"}],
+        [{"id": 2, "doc_id": "a", "page": 1, "offset": 14, "text": "four five six seven"},
+         {"id": 1, "doc_id": "a", "page": 1, "offset": 0, "text": "one two three four five"}],
+    ]
+    print(assemble_context(hits, token_budget=100))
+
+    # Compression with a bag-of-words embedding in place of the sentence model
+    vocab = {}
+    def bag_of_words(texts):
+        rows = [[vocab.setdefault(w, len(vocab)) for w in re.findall(r"\w+", t.lower())] for t in texts]
+        vectors = np.zeros((len(texts), 512), dtype=np.float32)
+        for row, ids in enumerate(rows):
+            vectors[row, [i % 512 for i in ids]] += 1
+        return vectors
+
+    page = ("Plants use light to make glucose. Light drives photosynthesis in plants. "
+            "The exam is on Friday.\nChloroplasts capture light for photosynthesis.\n"
+            "BIO 101 - Week 3 - Slide 4")
+    hits = [[{"id": 3, "doc_id": "b", "page": 4, "offset": 0, "text": page},
+             {"id": 4, "doc_id": "b", "page": 5, "offset": 0, "text": "More text.\nBIO 101 - Week 3 - Slide 4"}]]
+    context, report = assemble_context(hits, token_budget=200, target_tokens=20, embed_fn=bag_of_words)
+    print(context)
+    print(report)
@@ -0,0 +1,153 @@
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from src.models import VectorDB
+
+DEFAULT_SESSION_ID = "default"
+SESSION_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class SessionRegistry:
+    """
+    Keeps one isolated VectorDB per session under a shared memory budget.
+
+    Sessions are held in LRU order. Whenever the resident total exceeds
+    `max_bytes`, the coldest sessions that are not currently in use are saved
+    to `storage_dir` with `VectorDB.save` and dropped from memory; they are
+    reloaded lazily the next time the session is requested.
+    """
+
+    def __init__(self, storage_dir="cache/sessions", max_bytes=1024 * 1024 * 1024, **db_options):
+        self.storage_dir = storage_dir
+        self.max_bytes = max_bytes
+        self.db_options = db_options  # forwarded to VectorDB (index_kind, metric, ...)
+        self.evictions = 0
+        self.reloads = 0
+        self._sessions = OrderedDict()  # session id -> VectorDB, coldest first
+        self._pins = Counter()  # session id -> number of requests currently using it
+        self._busy = {}  # session id -> Event set once its load or eviction (done unlocked) ends
+        self._lock = threading.Lock()
+        os.makedirs(self.storage_dir, exist_ok=True)
+
+    @staticmethod
+    def validate(session_id):
+        """Session ids end up in file names, so only allow a safe character set."""
+        if not session_id or not SESSION_ID_PATTERN.match(session_id):
+            raise ValueError(f"Invalid session id: {session_id!r}")
+        return session_id
+
+    def _new_db(self, session_id):
+        return VectorDB(store_dir=os.path.join(self.storage_dir, session_id), **self.db_options)
+
+    def _acquire(self, session_id):
+        """
+        Pins and returns a session's VectorDB. Loading it from disk happens
+        outside the registry lock: the session is marked busy meanwhile, so only
+        callers of that same session wait (on its event) while others go on.
+        """
+        while True:
+            with self._lock:
+                busy = self._busy.get(session_id)
+                if busy is None:
+                    db = self._sessions.get(session_id)
+                    self._pins[session_id] += 1
+                    if db is not None:
+                        self._sessions.move_to_end(session_id)
+                        return db
+                    busy = self._busy[session_id] = threading.Event()
+                    break
+            # Being loaded or saved by another caller; look again once it is done
+            busy.wait()
+
+        try:
+            db = self._new_db(session_id)
+            reloaded = db.exists_on_disk()
+            if reloaded:
+                db.load()
+        except BaseException:
+            with self._lock:
+                self._unpin(session_id)
+                del self._busy[session_id]
+            busy.set()
+            raise
+        with self._lock:
+            self._sessions[session_id] = db
+            self.reloads += reloaded
+            del self._busy[session_id]
+        busy.set()
+        return db
+
+    def _unpin(self, session_id):
+        self._pins[session_id] -= 1
+        if self._pins[session_id] <= 0:
+            del self._pins[session_id]
+
+    def _release(self, session_id):
+        with self._lock:
+            self._unpin(session_id)
+            evicted = self._evict_over_budget()
+        for evicted_id, db, busy in evicted:
+            try:
+                self._evict(db)
+            finally:
+                with self._lock:
+                    del self._busy[evicted_id]
+                busy.set()
+
+    @contextmanager
+    def session(self, session_id):
+        """
+        Yields the VectorDB of a session, loading it from disk if it was evicted.
+        The session cannot be evicted while the block is running.
+        """
+        self.validate(session_id)
+        db = self._acquire(session_id)
+        try:
+            yield db
+        finally:
+            self._release(session_id)
+
+    def _evict(self, db):
+        """Writes an evicted session to disk; runs without the registry lock."""
+        if db.is_empty():
+            # Nothing worth keeping; also drop stale files from an earlier eviction
+            db.delete_from_disk()
+        else:
+            db.save()
+
+    def _evict_over_budget(self):
+        """
+        Picks the coldest unpinned sessions to drop until the rest fits in the
+        budget. They leave the registry right away and are marked busy until
+        `_release` has saved them. Returns [(session id, db, busy event)].
+        """
+        total = sum(db.memory_bytes() for db in self._sessions.values())
+        evicted = []
+        for session_id in list(self._sessions):
+            if total <= self.max_bytes:
+                break
+            if self._pins[session_id] > 0:
+                continue
+            db = self._sessions.pop(session_id)
+            total -= db.memory_bytes()
+            busy = self._busy[session_id] = threading.Event()
+            evicted.append((session_id, db, busy))
+            self.evictions += 1
+        return evicted
+
+    def resident_bytes(self):
+        with self._lock:
+            return sum(db.memory_bytes() for db in self._sessions.values())
+
+    def stats(self):
+        with self._lock:
+            return {
+                "resident_sessions": len(self._sessions),
+                "active_sessions": len(self._pins),
+                "bytes_held": sum(db.memory_bytes() for db in self._sessions.values()),
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+                "reloads": self.reloads,
+            }
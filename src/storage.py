@@ -0,0 +1,334 @@
+"""
+Pickle-free on-disk format for VectorDB.
+
+A store is a directory:
+    meta.json         configuration, documents and counters
+    ids.i64           chunk ids, ascending
+    vectors.f32       raw float32 vectors, one row per id
+    chunks.bin        UTF-8 chunk text, concatenated
+    text_offsets.u64  byte offsets into chunks.bin (len(ids) + 1 entries)
+    pages.i32         page / slide number per chunk (-1 for none)
+    char_offsets.i64  character offset of each chunk within its page
+    doc_index.i32     index into meta.json "doc_names" per chunk
+    index.faiss       the FAISS index
+    lexical_*         BM25 postings in CSR form (see src.lexical)
+
+Every array file is opened with np.memmap, so loading costs O(1) regardless of
+corpus size, only the pages that are actually touched become resident, and
+several worker processes opening the same store share them via the OS page cache.
+"""
+import json
+import os
+import shutil
+import numpy as np
+
+META_FILE = "meta.json"
+INDEX_FILE = "index.faiss"
+FORMAT_VERSION = 1
+# Rows copied per block when rewriting a memory-mapped store
+WRITE_BLOCK = 65536
+
+
+def open_array(directory, name, dtype, shape=None):
+    """Memory-maps a raw array file read-only (empty files map to an empty array)."""
+    path = os.path.join(directory, name)
+    if os.path.getsize(path) == 0:
+        return np.zeros(shape if shape is not None else 0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=shape)
+
+
+def _lookup(sorted_ids, ids):
+    """Returns (positions, found mask) of `ids` in an ascending id array."""
+    ids = np.asarray(ids, dtype=np.int64)
+    if len(sorted_ids) == 0:
+        return np.zeros(len(ids), dtype=np.int64), np.zeros(len(ids), dtype=bool)
+    pos = np.searchsorted(sorted_ids, ids)
+    clipped = np.minimum(pos, len(sorted_ids) - 1)
+    return clipped, sorted_ids[clipped] == ids
+
+
+def encode_runs(ids):
+    """Compresses a list of ids into [start, end) runs for meta.json."""
+    runs = []
+    for chunk_id in ids:
+        if runs and runs[-1][1] == chunk_id:
+            runs[-1][1] += 1
+        else:
+            runs.append([chunk_id, chunk_id + 1])
+    return runs
+
+
+def decode_runs(runs):
+    return [chunk_id for start, end in runs for chunk_id in range(start, end)]
+
+
+class VectorStore:
+    """
+    Raw vectors by chunk id: a read-only memory-mapped base from the last save
+    plus in-memory segments for everything added since.
+    """
+
+    def __init__(self, dimension=None):
+        self.dimension = dimension
+        self._base_ids = np.zeros(0, dtype=np.int64)
+        self._base = None
+        self._extra_ids = []
+        self._extra = []
+        self._extra_cache = None
+        self._removed = set()
+        self._live = 0  # live row count, kept up to date so len() is O(1)
+
+    @classmethod
+    def open(cls, directory, dimension):
+        store = cls(dimension)
+        store._base_ids = open_array(directory, "ids.i64", np.int64)
+        store._base = open_array(directory, "vectors.f32", np.float32, shape=(len(store._base_ids), dimension))
+        store._live = len(store._base_ids)
+        return store
+
+    def __len__(self):
+        return self._live
+
+    def add(self, ids, vectors):
+        self.dimension = vectors.shape[1]
+        self._extra_ids.append(np.asarray(ids, dtype=np.int64))
+        self._extra.append(np.array(vectors, dtype=np.float32))
+        self._extra_cache = None
+        self._live += len(self._extra_ids[-1])
+
+    def remove(self, ids):
+        before = len(self._removed)
+        self._removed.update(int(i) for i in ids)
+        self._live -= len(self._removed) - before
+
+    def _extras(self):
+        """
+        Added ids and vectors as one segment, sorted by id: concurrent adds may
+        append ids out of order, and lookups binary-search this segment.
+        """
+        if self._extra_cache is None:
+            if self._extra:
+                ids = np.concatenate(self._extra_ids)
+                order = np.argsort(ids, kind="stable")
+                self._extra_cache = (ids[order], np.concatenate(self._extra)[order])
+                self._extra_ids, self._extra = [self._extra_cache[0]], [self._extra_cache[1]]
+            else:
+                self._extra_cache = (np.zeros(0, dtype=np.int64), np.zeros((0, self.dimension or 0), dtype=np.float32))
+        return self._extra_cache
+
+    def get(self, ids):
+        """Returns the vectors of `ids` (which must be live) as a float32 matrix."""
+        ids = np.asarray(ids, dtype=np.int64)
+        out = np.empty((len(ids), self.dimension), dtype=np.float32)
+        pos, in_base = _lookup(self._base_ids, ids)
+        if in_base.any():
+            out[in_base] = self._base[pos[in_base]]
+        if (~in_base).any():
+            extra_ids, extra = self._extras()
+            epos, _ = _lookup(extra_ids, ids[~in_base])
+            out[~in_base] = extra[epos]
+        return out
+
+    def live_ids(self):
+        extra_ids, _ = self._extras()
+        ids = np.concatenate([np.asarray(self._base_ids), extra_ids])
+        if self._removed:
+            ids = ids[~np.isin(ids, np.fromiter(self._removed, dtype=np.int64))]
+        return ids
+
+    def live(self):
+        ids = self.live_ids()
+        return ids, self.get(ids)
+
+    def memory_bytes(self):
+        """Bytes held privately in memory (the mmapped base is shared page cache)."""
+        return sum(v.nbytes for v in self._extra)
+
+
+class ChunkStore:
+    """
+    Mapping chunk id -> {"text", "doc_id", "page", "offset"} record.
+
+    Records from the last save are decoded lazily from the memory-mapped blob,
+    so reading one chunk never deserializes the others. Records added since then
+    live in an in-memory overlay; removals of base records are tracked by id.
+    """
+
+    def __init__(self):
+        self._base_ids = np.zeros(0, dtype=np.int64)
+        self._blob = None
+        self._text_offsets = None
+        self._pages = None
+        self._char_offsets = None
+        self._doc_index = None
+        self._doc_names = []
+        self._removed = set()
+        self._overlay = {}
+        self.text_bytes = 0
+
+    @classmethod
+    def open(cls, directory, doc_names):
+        store = cls()
+        store._base_ids = open_array(directory, "ids.i64", np.int64)
+        store._blob = open_array(directory, "chunks.bin", np.uint8)
+        store._text_offsets = open_array(directory, "text_offsets.u64", np.uint64)
+        store._pages = open_array(directory, "pages.i32", np.int32)
+        if os.path.exists(os.path.join(directory, "char_offsets.i64")):
+            store._char_offsets = open_array(directory, "char_offsets.i64", np.int64)
+        else:
+            # Store saved before chunks were cut on token boundaries: word offsets
+            store._char_offsets = open_array(directory, "word_offsets.i64", np.int64)
+        store._doc_index = open_array(directory, "doc_index.i32", np.int32)
+        store._doc_names = list(doc_names)
+        store.text_bytes = int(store._text_offsets[-1]) if len(store._text_offsets) else 0
+        return store
+
+    def _base_pos(self, chunk_id):
+        if chunk_id in self._removed:
+            return None
+        pos, found = _lookup(self._base_ids, [chunk_id])
+        return int(pos[0]) if found[0] else None
+
+    def _base_record(self, pos):
+        start, end = int(self._text_offsets[pos]), int(self._text_offsets[pos + 1])
+        page = int(self._pages[pos])
+        return {
+            "text": bytes(self._blob[start:end]).decode("utf-8"),
+            "doc_id": self._doc_names[int(self._doc_index[pos])],
+            "page": None if page < 0 else page,
+            "offset": int(self._char_offsets[pos]),
+        }
+
+    def _base_text_bytes(self, pos):
+        return int(self._text_offsets[pos + 1]) - int(self._text_offsets[pos])
+
+    def get(self, chunk_id, default=None):
+        record = self._overlay.get(chunk_id)
+        if record is not None:
+            return record
+        pos = self._base_pos(chunk_id)
+        return default if pos is None else self._base_record(pos)
+
+    def __getitem__(self, chunk_id):
+        record = self.get(chunk_id)
+        if record is None:
+            raise KeyError(chunk_id)
+        return record
+
+    def __contains__(self, chunk_id):
+        return chunk_id in self._overlay or self._base_pos(chunk_id) is not None
+
+    def __setitem__(self, chunk_id, record):
+        """Adds or replaces a record; a replaced overlay record keeps its place in `keys()`."""
+        old = self._overlay.get(chunk_id)
+        if old is not None:
+            self.text_bytes -= len(old["text"].encode("utf-8"))
+        else:
+            self.pop(chunk_id)
+        self._overlay[chunk_id] = record
+        self.text_bytes += len(record["text"].encode("utf-8"))
+
+    def pop(self, chunk_id, default=None):
+        record = self._overlay.pop(chunk_id, None)
+        if record is not None:
+            self.text_bytes -= len(record["text"].encode("utf-8"))
+            return record
+        pos = self._base_pos(chunk_id)
+        if pos is None:
+            return default
+        record = self._base_record(pos)
+        self._removed.add(chunk_id)
+        self.text_bytes -= self._base_text_bytes(pos)
+        return record
+
+    def __len__(self):
+        return len(self._base_ids) - len(self._removed) + len(self._overlay)
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def keys(self):
+        """
+        Chunk ids: the base ids in ascending order, then overlay ids in insertion
+        order (not necessarily ascending; `write_store` sorts them).
+        """
+        for chunk_id in self._base_ids:
+            chunk_id = int(chunk_id)
+            if chunk_id not in self._removed:
+                yield chunk_id
+        yield from self._overlay
+
+    __iter__ = keys
+
+    def items(self):
+        for chunk_id in self.keys():
+            yield chunk_id, self.get(chunk_id)
+
+    def values(self):
+        for _, record in self.items():
+            yield record
+
+    def memory_bytes(self):
+        """Bytes of text held privately in memory (overlay only)."""
+        return sum(len(r["text"]) for r in self._overlay.values())
+
+
+def write_store(directory, chunks, vectors, meta, write_extra):
+    """
+    Writes a complete store to `directory`, replacing any previous one atomically.
+    `chunks` is a ChunkStore, `vectors` a VectorStore, `meta` the JSON-able
+    config dict and `write_extra(tmp_dir)` writes the FAISS index (INDEX_FILE)
+    and any other files that belong to the store.
+    """
+    tmp = f"{directory}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    # Ascending, as the lookups on load binary-search these ids
+    ids = np.sort(np.fromiter(chunks.keys(), dtype=np.int64, count=len(chunks)))
+    doc_names = sorted({record["doc_id"] for record in chunks.values()})
+    doc_lookup = {name: i for i, name in enumerate(doc_names)}
+
+    ids.tofile(os.path.join(tmp, "ids.i64"))
+    with open(os.path.join(tmp, "vectors.f32"), "wb") as f:
+        for start in range(0, len(ids), WRITE_BLOCK):
+            vectors.get(ids[start:start + WRITE_BLOCK]).tofile(f)
+
+    text_offsets = np.zeros(len(ids) + 1, dtype=np.uint64)
+    pages = np.empty(len(ids), dtype=np.int32)
+    char_offsets = np.empty(len(ids), dtype=np.int64)
+    doc_index = np.empty(len(ids), dtype=np.int32)
+    position = 0
+    with open(os.path.join(tmp, "chunks.bin"), "wb") as f:
+        for i, chunk_id in enumerate(ids):
+            record = chunks[int(chunk_id)]
+            data = record["text"].encode("utf-8")
+            f.write(data)
+            position += len(data)
+            text_offsets[i + 1] = position
+            pages[i] = -1 if record.get("page") is None else record["page"]
+            char_offsets[i] = record.get("offset", 0)
+            doc_index[i] = doc_lookup[record["doc_id"]]
+    text_offsets.tofile(os.path.join(tmp, "text_offsets.u64"))
+    pages.tofile(os.path.join(tmp, "pages.i32"))
+    char_offsets.tofile(os.path.join(tmp, "char_offsets.i64"))
+    doc_index.tofile(os.path.join(tmp, "doc_index.i32"))
+
+    write_extra(tmp)
+    with open(os.path.join(tmp, META_FILE), "w", encoding="utf-8") as f:
+        json.dump(dict(meta, version=FORMAT_VERSION, doc_names=doc_names), f)
+
+    # Swap in the new store; open memory maps of the old one stay valid until closed
+    old = f"{directory}.old-{os.getpid()}"
+    if os.path.exists(directory):
+        os.replace(directory, old)
+    os.replace(tmp, directory)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def read_meta(directory):
+    with open(os.path.join(directory, META_FILE), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported store format version: {meta.get('version')}")
+    return meta
@@ -0,0 +1,280 @@
+"""
+Topic map of a corpus: mini-batch k-means over the chunk embeddings.
+
+Vectors are L2-normalized and clustered by cosine similarity (spherical
+k-means). Centroids are learned from random mini-batches with per-centroid
+learning rates of 1 / (points seen), as in Sculley's web-scale k-means, so a
+fit costs O(iterations * batch * k * d) regardless of corpus size, plus one
+blocked matrix product to assign every chunk. New documents are folded in
+with the same update rule; the map is refit from scratch only once the
+corpus has doubled or halved since the last fit.
+
+Every chunk keeps its cluster and its similarity to the centroid, so the
+representative of a cluster (its most central chunk) and a coverage sample
+across clusters come from small array operations, with no search.
+"""
+import math
+import os
+import numpy as np
+
+from src.lexical import tokenize
+from src.storage import open_array
+
+MAX_TOPICS = 48
+MIN_CHUNKS_PER_TOPIC = 4
+BATCH_SIZE = 1024
+ITERATIONS = 100
+# Centroids are initialized by k-means++ on a sample of this many chunks per topic
+INIT_SAMPLE_PER_TOPIC = 32
+ASSIGN_BLOCK = 16384
+KEYWORDS = 5
+# Member texts per cluster read for keyword labels (the most central ones)
+KEYWORD_SAMPLE = 64
+TOPIC_FILES = {
+    "centroids": ("topic_centroids.f32", np.float32),
+    "counts": ("topic_counts.f64", np.float64),
+    "ids": ("topic_ids.i64", np.int64),
+    "labels": ("topic_labels.i32", np.int32),
+    "similarity": ("topic_similarity.f32", np.float32),
+}
+
+
+def topic_count(n_chunks):
+    """Clusters for a corpus of `n_chunks`: about sqrt(n / 4), at most MAX_TOPICS."""
+    return int(min(MAX_TOPICS, max(1, round(math.sqrt(n_chunks / MIN_CHUNKS_PER_TOPIC)))))
+
+
+def _normalize(vectors):
+    vectors = np.array(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _kmeans_plus_plus(vectors, k, rng):
+    """k-means++ seeding under cosine distance."""
+    centroids = np.empty((k, vectors.shape[1]), dtype=np.float32)
+    centroids[0] = vectors[rng.integers(len(vectors))]
+    distance = 1.0 - vectors @ centroids[0]
+    for i in range(1, k):
+        weights = np.maximum(distance, 0)
+        total = weights.sum()
+        pick = rng.choice(len(vectors), p=weights / total) if total > 0 else rng.integers(len(vectors))
+        centroids[i] = vectors[pick]
+        distance = np.minimum(distance, 1.0 - vectors @ centroids[i])
+    return centroids
+
+
+class TopicMap:
+    """
+    Cluster assignment of every chunk id. Empty until `fit`; `update` folds in
+    new chunks and `remove` drops them.
+    """
+
+    def __init__(self):
+        self.centroids = np.zeros((0, 0), dtype=np.float32)
+        self.counts = np.zeros(0, dtype=np.float64)  # points seen per centroid (its learning-rate clock)
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.labels = np.zeros(0, dtype=np.int32)
+        self.similarity = np.zeros(0, dtype=np.float32)
+        self.fitted_size = 0
+        self._keywords = None  # cached per-cluster labels, cleared on every change
+
+    def __len__(self):
+        return len(self.centroids)
+
+    def needs_refit(self, n_chunks):
+        if not len(self):
+            return n_chunks > 0
+        return (n_chunks > 2 * self.fitted_size or n_chunks < self.fitted_size / 2
+                or topic_count(n_chunks) > 1.5 * len(self))
+
+    def _assign(self, vectors):
+        """Returns (label, similarity) of every row; `vectors` must be normalized."""
+        labels = np.empty(len(vectors), dtype=np.int32)
+        similarity = np.empty(len(vectors), dtype=np.float32)
+        for start in range(0, len(vectors), ASSIGN_BLOCK):
+            scores = vectors[start:start + ASSIGN_BLOCK] @ self.centroids.T
+            labels[start:start + ASSIGN_BLOCK] = scores.argmax(axis=1)
+            similarity[start:start + ASSIGN_BLOCK] = scores.max(axis=1)
+        return labels, similarity
+
+    def _step(self, batch):
+        """One mini-batch update: every centroid moves to the running mean of the points it has seen."""
+        labels, _ = self._assign(batch)
+        batch_counts = np.bincount(labels, minlength=len(self)).astype(np.float64)
+        one_hot = np.zeros((len(batch), len(self)), dtype=np.float32)
+        one_hot[np.arange(len(batch)), labels] = 1.0
+        sums = one_hot.T @ batch
+        self.counts += batch_counts
+        moved = batch_counts > 0
+        self.centroids[moved] += ((sums[moved] - batch_counts[moved, None] * self.centroids[moved])
+                                  / self.counts[moved, None]).astype(np.float32)
+        self.centroids = _normalize(self.centroids)
+
+    def fit(self, ids, vectors, k=None, seed=0):
+        """Clusters all of `vectors` (one row per chunk id) from scratch."""
+        rng = np.random.default_rng(seed)
+        vectors = _normalize(vectors)
+        k = min(k or topic_count(len(vectors)), len(vectors))
+        if k == 0:
+            self.__init__()
+            return self
+        sample = vectors[rng.choice(len(vectors), size=min(len(vectors), k * INIT_SAMPLE_PER_TOPIC), replace=False)]
+        self.centroids = _kmeans_plus_plus(sample, k, rng)
+        self.counts = np.zeros(k, dtype=np.float64)
+        batch_size = min(BATCH_SIZE, len(vectors))
+        for iteration in range(ITERATIONS):
+            self._step(vectors[rng.integers(len(vectors), size=batch_size)])
+            if iteration % 10 == 9 and iteration < ITERATIONS // 2:
+                # Re-seed centroids that have won (almost) no points onto random chunks
+                dead = np.flatnonzero(self.counts < batch_size / (10 * k))
+                if len(dead):
+                    self.centroids[dead] = vectors[rng.integers(len(vectors), size=len(dead))]
+                    self.counts[dead] = 0
+        self.ids = np.asarray(ids, dtype=np.int64).copy()
+        self.labels, self.similarity = self._assign(vectors)
+        self.fitted_size = len(vectors)
+        self._keywords = None
+        return self
+
+    def update(self, ids, vectors):
+        """Folds new chunks into the existing clusters (one mini-batch step over them)."""
+        if not len(ids):
+            return
+        vectors = _normalize(vectors)
+        for start in range(0, len(vectors), BATCH_SIZE):
+            self._step(vectors[start:start + BATCH_SIZE])
+        labels, similarity = self._assign(vectors)
+        self.ids = np.concatenate([self.ids, np.asarray(ids, dtype=np.int64)])
+        self.labels = np.concatenate([self.labels, labels])
+        self.similarity = np.concatenate([self.similarity, similarity])
+        self._keywords = None
+
+    def remove(self, ids):
+        keep = ~np.isin(self.ids, np.asarray(ids, dtype=np.int64))
+        self.ids, self.labels, self.similarity = self.ids[keep], self.labels[keep], self.similarity[keep]
+        self._keywords = None
+
+    def sizes(self):
+        return np.bincount(self.labels, minlength=len(self))
+
+    def representatives(self):
+        """Chunk id of the most central member of every cluster (-1 for empty ones)."""
+        reps = np.full(len(self), -1, dtype=np.int64)
+        if len(self.ids):
+            order = np.lexsort((-self.similarity, self.labels))
+            labels = self.labels[order]
+            first = np.flatnonzero(np.r_[True, labels[1:] != labels[:-1]])
+            reps[labels[first]] = self.ids[order[first]]
+        return reps
+
+    def keywords(self, get_text, n=KEYWORDS):
+        """
+        Keyword labels per cluster: the terms most specific to its central
+        members (term frequency in the cluster times log inverse cluster
+        frequency). `get_text(chunk_id)` returns a chunk's text.
+        """
+        if self._keywords is not None:
+            return self._keywords
+        order = np.lexsort((-self.similarity, self.labels))
+        counts = [dict() for _ in range(len(self))]
+        taken = np.zeros(len(self), dtype=np.int64)
+        for position in order:
+            label = self.labels[position]
+            if taken[label] >= KEYWORD_SAMPLE:
+                continue
+            taken[label] += 1
+            terms = counts[label]
+            for term in tokenize(get_text(int(self.ids[position]))):
+                if len(term) > 2 and not term.isdigit():
+                    terms[term] = terms.get(term, 0) + 1
+        cluster_frequency = {}
+        for terms in counts:
+            for term in terms:
+                cluster_frequency[term] = cluster_frequency.get(term, 0) + 1
+        labels = []
+        for terms in counts:
+            total = sum(terms.values()) or 1
+            scored = sorted(terms, key=lambda t: -terms[t] / total * math.log((1 + len(self)) / cluster_frequency[t]))
+            labels.append(scored[:n])
+        self._keywords = labels
+        return labels
+
+    def sample(self, n, seed=None):
+        """
+        Up to `n` chunk ids spread over the clusters: clusters are drawn without
+        replacement with probability proportional to their size, and one member
+        from each. With seed=None the most central member of the largest
+        clusters is returned (deterministic); a seed draws random members.
+        """
+        sizes = self.sizes()
+        populated = np.flatnonzero(sizes)
+        if not len(populated):
+            return []
+        if seed is None:
+            clusters = populated[np.argsort(-sizes[populated], kind="stable")][:n]
+            reps = self.representatives()
+            picks = [int(reps[c]) for c in clusters]
+        else:
+            rng = np.random.default_rng(seed)
+            weights = sizes[populated] / sizes[populated].sum()
+            clusters = rng.choice(populated, size=min(n, len(populated)), replace=False, p=weights)
+            picks = [int(rng.choice(self.ids[self.labels == c])) for c in clusters]
+        if len(picks) < n:
+            # Fewer clusters than requested: top up with random chunks not yet picked
+            rest = np.setdiff1d(self.ids, picks)
+            rng = np.random.default_rng(seed or 0)
+            picks += [int(i) for i in rng.choice(rest, size=min(n - len(picks), len(rest)), replace=False)]
+        return picks
+
+    def memory_bytes(self):
+        return self.centroids.nbytes + self.ids.nbytes + self.labels.nbytes + self.similarity.nbytes
+
+    def meta(self):
+        return {"clusters": len(self), "dimension": int(self.centroids.shape[1]) if len(self) else 0,
+                "fitted_size": self.fitted_size}
+
+    def save(self, directory):
+        for attribute, (name, dtype) in TOPIC_FILES.items():
+            np.ascontiguousarray(getattr(self, attribute), dtype=dtype).tofile(os.path.join(directory, name))
+
+    @staticmethod
+    def exists(directory):
+        return all(os.path.exists(os.path.join(directory, name)) for name, _ in TOPIC_FILES.values())
+
+    @classmethod
+    def open(cls, directory, meta):
+        """Loads a saved map; arrays are copied since updates reallocate them anyway."""
+        topics = cls()
+        for attribute, (name, dtype) in TOPIC_FILES.items():
+            setattr(topics, attribute, np.array(open_array(directory, name, dtype)))
+        topics.centroids = topics.centroids.reshape(meta["clusters"], meta["dimension"])
+        topics.fitted_size = meta["fitted_size"]
+        return topics
+
+
+# --- Testing Block ---
+if __name__ == "__main__":
+    import time
+
+    rng = np.random.default_rng(0)
+    n, dimension, true_topics = 100_000, 384, 40
+    centers = _normalize(rng.normal(size=(true_topics, dimension)))
+    truth = rng.integers(true_topics, size=n)
+    vectors = _normalize(centers[truth] + rng.normal(scale=0.06, size=(n, dimension)).astype(np.float32))
+
+    start = time.perf_counter()
+    topics = TopicMap().fit(np.arange(n), vectors)
+    print(f"fit {n} x {dimension} into {len(topics)} topics: {time.perf_counter() - start:.2f}s")
+
+    # Purity: share of chunks whose cluster's majority true topic is their own
+    majority = {c: np.bincount(truth[topics.labels == c]).argmax() for c in np.unique(topics.labels)}
+    purity = np.mean([majority[c] == t for c, t in zip(topics.labels, truth)])
+    print(f"purity {purity:.3f}, sizes {sorted(topics.sizes().tolist())[:5]}...")
+
+    start = time.perf_counter()
+    extra = _normalize(centers[rng.integers(true_topics, size=2000)] + rng.normal(scale=0.06, size=(2000, dimension)))
+    topics.update(np.arange(n, n + 2000), extra)
+    print(f"update with 2000 chunks: {(time.perf_counter() - start) * 1000:.0f} ms")
+    print(f"sample: {topics.sample(8)} / {topics.sample(8, seed=3)}")
@@ -0,0 +1,283 @@
+"""
+Spooling of uploaded files.
+
+An upload is read block by block, hashed as it streams and either kept in
+memory (small files, which the extractors open straight from bytes) or
+written to a uniquely named file in the spool directory. Nothing is keyed by
+the client's file name, so concurrent uploads of "notes.pdf" never collide,
+and the spool file is deleted as soon as the document has been indexed.
+
+`MultipartUpload` parses the request body as it arrives, so the file part is
+written once, straight into the spool, and the size limit holds whether or not
+the client declared a Content-Length.
+"""
+import hashlib
+import os
+import time
+import uuid
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+SUPPORTED_TYPES = (".pdf", ".pptx", ".docx")
+SPOOL_SUFFIX = ".upload"
+
+
+class UploadTooLarge(ValueError):
+    """The upload is bigger than the configured limit (HTTP 413)."""
+
+
+class UnsupportedUpload(ValueError):
+    """The file extension is not one the extractors can read (HTTP 415)."""
+
+
+class MalformedUpload(ValueError):
+    """The request body is not a multipart form carrying the file (HTTP 400)."""
+
+
+class SpooledUpload:
+    """
+    One received upload: `data` holds the content when it stayed in memory,
+    otherwise `path` names the spool file. `source` is what the extractors
+    take; `cleanup` deletes the spool file (safe to call more than once).
+    """
+
+    def __init__(self, filename, file_type, size, content_hash, data=None, path=None):
+        self.filename = filename
+        self.file_type = file_type
+        self.size = size
+        self.content_hash = content_hash
+        self.data = data
+        self.path = path
+
+    @property
+    def source(self):
+        return self.data if self.data is not None else self.path
+
+    @property
+    def in_memory(self):
+        return self.data is not None
+
+    def cleanup(self):
+        if self.path is not None:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+            self.path = None
+        self.data = None
+
+
+def upload_type(filename):
+    """Lower-case extension of `filename`; raises UnsupportedUpload for anything but PDF/PPTX/DOCX."""
+    file_type = os.path.splitext(filename or "")[1].lower()
+    if file_type not in SUPPORTED_TYPES:
+        raise UnsupportedUpload(f"Unsupported file format {file_type or '(none)'!r}. Use one of {SUPPORTED_TYPES}.")
+    return file_type
+
+
+class UploadSpooler:
+    """
+    Receives an upload block by block, computing its SHA-256 on the way.
+    Content up to `memory_bytes` stays in memory; past that it goes to a new
+    file in `spool_dir`. `write` raises UploadTooLarge as soon as more than
+    `max_bytes` have arrived; `abort` deletes anything written so far.
+    """
+
+    def __init__(self, filename, spool_dir, max_bytes, memory_bytes):
+        self.filename = filename
+        self.file_type = upload_type(filename)
+        self.spool_dir = spool_dir
+        self.max_bytes = max_bytes
+        self.memory_bytes = memory_bytes
+        self.size = 0
+        self._digest = hashlib.sha256()
+        self._blocks = []
+        self._path = None
+        self._out = None
+
+    def write(self, block):
+        self.size += len(block)
+        if self.size > self.max_bytes:
+            raise UploadTooLarge(f"File is larger than the {self.max_bytes / 2 ** 20:g} MB upload limit.")
+        self._digest.update(block)
+        if self._out is None and self.size > self.memory_bytes:
+            self._path = os.path.join(self.spool_dir, f"{uuid.uuid4().hex}{SPOOL_SUFFIX}")
+            self._out = open(self._path, "wb")
+            self._out.writelines(self._blocks)
+            self._blocks = None
+        if self._out is None:
+            self._blocks.append(bytes(block))
+        else:
+            self._out.write(block)
+
+    def finish(self):
+        if self._out is not None:
+            self._out.close()
+            return SpooledUpload(self.filename, self.file_type, self.size, self._digest.hexdigest(), path=self._path)
+        return SpooledUpload(self.filename, self.file_type, self.size, self._digest.hexdigest(),
+                             data=b"".join(self._blocks))
+
+    def abort(self):
+        if self._out is not None:
+            self._out.close()
+            os.remove(self._path)
+            self._out = self._path = None
+        self._blocks = []
+
+
+def spool_upload(file_obj, filename, spool_dir, max_bytes, memory_bytes, block_size=1 << 20):
+    """
+    Streams `file_obj` into a SpooledUpload (see UploadSpooler). Raises
+    UploadTooLarge as soon as more than `max_bytes` have been read, leaving
+    nothing behind.
+    """
+    spooler = UploadSpooler(filename, spool_dir, max_bytes, memory_bytes)
+    try:
+        for block in iter(lambda: file_obj.read(block_size), b""):
+            spooler.write(block)
+    except BaseException:
+        spooler.abort()
+        raise
+    return spooler.finish()
+
+
+class MultipartUpload:
+    """
+    Streaming reader for a multipart/form-data body holding one file field
+    plus small text fields. The file part goes straight into an UploadSpooler,
+    so the body is never buffered or copied anywhere else, and the size limits
+    hold while reading, whatever the request declared. Everything but the file
+    content (part headers, text fields, other parts) may take up to
+    `overhead_bytes`.
+
+    Feed the body with `feed(chunk)`, then `finish()` returns
+    (SpooledUpload, {field name: value}). Malformed bodies raise MalformedUpload.
+    """
+
+    def __init__(self, content_type, file_field, spool_dir, max_bytes, memory_bytes, overhead_bytes=64 * 1024):
+        kind, options = parse_options_header(content_type or "")
+        boundary = options.get(b"boundary")
+        if kind != b"multipart/form-data" or not boundary:
+            raise MalformedUpload("Expected a multipart/form-data body.")
+        self.file_field = file_field
+        self.spool_dir = spool_dir
+        self.max_bytes = max_bytes
+        self.memory_bytes = memory_bytes
+        self.limit = max_bytes + overhead_bytes
+        self.received = 0
+        self.fields = {}
+        self.spooler = None
+        self._headers = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._part = None  # ("file", None), ("field", name, [bytes]) or ("skip", None) for the part being read
+        self._done = False
+        self._parser = MultipartParser(boundary, {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+            "on_end": self._on_end,
+        })
+
+    def _on_part_begin(self):
+        self._headers = {}
+
+    def _on_header_field(self, data, start, end):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data, start, end):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field, self._header_value = b"", b""
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        name = options.get(b"name", b"").decode("utf-8", "replace")
+        filename = options.get(b"filename")
+        if filename is None:
+            self._part = ("field", name, [])
+        elif name == self.file_field and self.spooler is None:
+            filename = os.path.basename(filename.decode("utf-8", "replace"))
+            self.spooler = UploadSpooler(filename, self.spool_dir, self.max_bytes, self.memory_bytes)
+            self._part = ("file", None)
+        else:
+            self._part = ("skip", None)
+
+    def _on_part_data(self, data, start, end):
+        if self._part[0] == "file":
+            self.spooler.write(data[start:end])
+        elif self._part[0] == "field":
+            self._part[2].append(data[start:end])
+
+    def _on_part_end(self):
+        if self._part[0] == "field":
+            self.fields[self._part[1]] = b"".join(self._part[2]).decode("utf-8", "replace")
+        self._part = None
+
+    def _on_end(self):
+        self._done = True
+
+    def feed(self, chunk):
+        self.received += len(chunk)
+        if self.received > self.limit:
+            raise UploadTooLarge(f"File is larger than the {self.max_bytes / 2 ** 20:g} MB upload limit.")
+        self._parser.write(chunk)
+
+    def finish(self):
+        self._parser.finalize()
+        if not self._done:
+            raise MalformedUpload("The multipart body ended early.")
+        if self.spooler is None:
+            raise MalformedUpload(f"No {self.file_field!r} file in the upload.")
+        return self.spooler.finish(), self.fields
+
+    def abort(self):
+        if self.spooler is not None:
+            self.spooler.abort()
+
+
+def sweep_spool(spool_dir, max_age=3600):
+    """
+    Deletes spool files older than `max_age` seconds, left behind by a crash
+    mid-upload. Returns how many were removed.
+    """
+    removed = 0
+    cutoff = time.time() - max_age
+    for entry in os.scandir(spool_dir):
+        if entry.name.endswith(SPOOL_SUFFIX) and entry.stat().st_mtime < cutoff:
+            try:
+                os.remove(entry.path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
+
+
+# --- Testing Block ---
+if __name__ == "__main__":
+    import io
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as spool_dir:
+        small = spool_upload(io.BytesIO(b"x" * 1000), "notes.pdf", spool_dir, 10_000, 4096)
+        print(f"small: in_memory={small.in_memory} size={small.size} {small.content_hash[:12]}")
+
+        large = spool_upload(io.BytesIO(b"y" * 50_000), "Notes.PDF", spool_dir, 100_000, 4096, block_size=4096)
+        print(f"large: in_memory={large.in_memory} on disk={os.path.getsize(large.path)}")
+        assert large.content_hash == hashlib.sha256(b"y" * 50_000).hexdigest()
+        large.cleanup()
+
+        try:
+            spool_upload(io.BytesIO(b"z" * 50_000), "big.docx", spool_dir, 20_000, 4096, block_size=4096)
+        except UploadTooLarge as e:
+            print(f"rejected: {e}")
+        print(f"left in spool dir: {os.listdir(spool_dir)}")
@@ -0,0 +1,30 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Embedding, FAISS and hashing release the GIL, so threads are enough for them.
+# Document parsing holds the GIL and runs on the extraction process pool in src/ingest.py.
+CPU_THREADS = int(os.getenv("CPU_THREADS", min(8, (os.cpu_count() or 2))))
+
+_thread_pool = None
+
+
+def thread_pool():
+    global _thread_pool
+    if _thread_pool is None:
+        _thread_pool = ThreadPoolExecutor(max_workers=CPU_THREADS, thread_name_prefix="cpu")
+    return _thread_pool
+
+
+async def run_in_thread(fn, *args, **kwargs):
+    """Runs a blocking call on the shared CPU thread pool without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(thread_pool(), functools.partial(fn, *args, **kwargs))
+
+
+def shutdown():
+    global _thread_pool
+    if _thread_pool is not None:
+        _thread_pool.shutdown(wait=False)
+        _thread_pool = None
@@ -0,0 +1,29 @@
+import threading
+
+import numpy as np
+
+from src.cache import IngestCache
+
+
+def test_concurrent_puts_of_one_key_all_succeed(tmp_path):
+    cache = IngestCache(str(tmp_path / "ingest"))
+    chunks, embeddings = [{"text": "cells", "page": 1}], np.ones((1, 4), dtype=np.float32)
+    errors = []
+
+    def put():
+        try:
+            for _ in range(20):
+                cache.put("key", chunks, embeddings)
+                assert cache.get("key") is not None
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=put) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    cached_chunks, cached_embeddings = cache.get("key")
+    assert cached_chunks == chunks and cached_embeddings.tolist() == embeddings.tolist()
+    assert sorted(p.name for p in (tmp_path / "ingest").iterdir()) == ["key"]
@@ -0,0 +1,45 @@
+import numpy as np
+
+from src.dedup import NearDuplicateIndex
+
+WORDS = [f"w{i}" for i in range(500)]
+
+
+def text(seed):
+    return " ".join(np.random.default_rng(seed).choice(WORDS, size=120))
+
+
+def check(index, kept, chunk_id, content):
+    """Runs one chunk through the index like VectorDB._deduplicate; returns its match or None."""
+    shingle_hashes, keys = index.sketch(content)
+    match, _ = index.find(shingle_hashes, keys, kept.get)
+    if match is None:
+        index.add(chunk_id, keys)
+        kept[chunk_id] = shingle_hashes
+    return match
+
+
+def test_duplicates_are_found_after_an_identical_chunk_was_removed():
+    index, kept = NearDuplicateIndex(), {}
+    assert check(index, kept, 0, text(1)) is None
+    index.remove([0])
+    del kept[0]
+    assert check(index, kept, 1, text(1)) is None
+    assert check(index, kept, 2, text(1)) == 1
+
+
+def test_removal_from_merged_buckets(tmp_path):
+    index, kept = NearDuplicateIndex(), {}
+    for chunk_id in range(3):
+        check(index, kept, chunk_id, text(chunk_id))
+    index.save(str(tmp_path), np.array([0, 1, 2]))
+    index = NearDuplicateIndex.open(str(tmp_path))
+    index.remove([1])
+    del kept[1]
+
+    assert check(index, kept, 3, text(1)) is None
+    assert check(index, kept, 4, text(1)) == 3
+    assert check(index, kept, 5, text(2)) == 2
+    index._merge()
+    assert 1 not in index._base_ids.tolist()
+    assert check(index, kept, 6, text(1)) == 3
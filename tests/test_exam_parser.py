@@ -0,0 +1,21 @@
+from src.exam_parser import parse_partial_exam
+
+STREAMED = """### CASE STUDY A: Greenhouse
+Tomato plants grow faster under extra light.
+1. Which process uses the light?
+   a) Photosynthesis
+   b) Respiration
+   Answer: a
+2. Why do leaves turn yel"""
+
+
+def test_partial_exam_leaves_out_the_line_still_being_written():
+    exam = parse_partial_exam(STREAMED)
+    assert [case.title for case in exam.cases] == ["Greenhouse"]
+    assert [q.number for q in exam.questions] == [1]
+    assert [option.text for option in exam.questions[0].options] == ["Photosynthesis", "Respiration"]
+    assert exam.questions[0].answer == "a"
+
+
+def test_partial_exam_is_empty_before_the_first_full_line():
+    assert parse_partial_exam("### CASE STUDY A: Green").cases == []
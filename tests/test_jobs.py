@@ -0,0 +1,200 @@
+import asyncio
+import time
+
+from src.jobs import CANCELLED, DONE, FAILED, FINISHED, PENDING, JobQueue, JobStore, expand_batch
+
+
+class FakeInferenceClient:
+    """
+    Stand-in for the upstream LLM when exercising the queue: answers after
+    `latency` seconds and raises `error` on every `fail_every`-th call, like a
+    flaky endpoint. Counts the calls and the peak number running at once.
+    """
+
+    def __init__(self, latency=0.05, fail_every=3, error=ConnectionError):
+        self.latency = latency
+        self.fail_every = fail_every
+        self.error = error
+        self.calls = 0
+        self.in_flight = 0
+        self.peak = 0
+
+    async def complete(self, prompt):
+        self.calls += 1
+        call = self.calls
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.in_flight -= 1
+        if self.fail_every and call % self.fail_every == 0:
+            raise self.error("503 Service Unavailable")
+        return f"Exam for {prompt}"
+
+
+def make_queue(tmp_path, client, **kwargs):
+    async def run_task(spec, params):
+        return await client.complete(f"{params['topic']} #{params['variant']}")
+
+    options = dict(workers=4, max_concurrency=2, backoff_base=0.01, retry_on=(ConnectionError,))
+    options.update(kwargs)
+    return JobQueue(JobStore(str(tmp_path / "jobs.sqlite3")), run_task, **options)
+
+
+async def wait_finished(store, job_id, timeout=10):
+    """Waits until the job is finished and none of its tasks is still running."""
+    deadline = time.monotonic() + timeout
+    while True:
+        job = store.get(job_id)
+        if job["status"] in FINISHED and not job["progress"]["running"]:
+            return job
+        assert time.monotonic() < deadline, job["progress"]
+        await asyncio.sleep(0.02)
+
+
+def test_transient_errors_are_retried_after_a_backoff(tmp_path):
+    client = FakeInferenceClient(latency=0.01, fail_every=2)
+    queue = make_queue(tmp_path, client, workers=1, max_attempts=3)
+    delays = []
+
+    def backoff(attempts):
+        delays.append(attempts)
+        return 0.2
+
+    queue.backoff = backoff
+
+    async def main():
+        queue.start()
+        started = time.monotonic()
+        job_id = await queue.submit({}, expand_batch(["cells"], 3))
+        job = await wait_finished(queue.store, job_id)
+        await queue.stop()
+        return job, time.monotonic() - started
+
+    job, elapsed = asyncio.run(main())
+    assert job["status"] == DONE
+    assert [task["status"] for task in job["tasks"]] == [DONE, DONE, DONE]
+    # Task 1 failed twice; task 2 ran while it was backing off
+    assert [task["attempts"] for task in job["tasks"]] == [1, 3, 1]
+    assert client.calls == 5
+    assert delays == [1, 2]
+    # Both retries waited out their backoff instead of running straight away
+    assert elapsed >= 0.4
+
+
+def test_retries_stop_after_max_attempts_and_other_errors_fail_at_once(tmp_path):
+    flaky = FakeInferenceClient(latency=0, fail_every=1)
+    broken = FakeInferenceClient(latency=0, fail_every=1, error=ValueError)
+
+    async def main(client, directory):
+        directory.mkdir()
+        queue = make_queue(directory, client, max_attempts=3)
+        queue.start()
+        job_id = await queue.submit({}, expand_batch(["cells"], 1))
+        job = await wait_finished(queue.store, job_id)
+        await queue.stop()
+        return job
+
+    job = asyncio.run(main(flaky, tmp_path / "flaky"))
+    assert (job["status"], job["tasks"][0]["attempts"], flaky.calls) == (FAILED, 3, 3)
+    job = asyncio.run(main(broken, tmp_path / "broken"))
+    assert (job["status"], job["tasks"][0]["attempts"], broken.calls) == (FAILED, 1, 1)
+
+
+def test_a_job_never_runs_more_tasks_than_its_cap(tmp_path):
+    clients = {"big": FakeInferenceClient(fail_every=0), "small": FakeInferenceClient(fail_every=0)}
+
+    async def run_task(spec, params):
+        return await clients[spec["name"]].complete(str(params["variant"]))
+
+    queue = JobQueue(JobStore(str(tmp_path / "jobs.sqlite3")), run_task, workers=4, max_concurrency=2)
+
+    async def main():
+        queue.start()
+        big = await queue.submit({"name": "big"}, expand_batch([], 8))
+        small = await queue.submit({"name": "small"}, expand_batch([], 4), max_concurrency=1)
+        jobs = [await wait_finished(queue.store, job_id) for job_id in (big, small)]
+        await queue.stop()
+        return jobs
+
+    jobs = asyncio.run(main())
+    assert [job["status"] for job in jobs] == [DONE, DONE]
+    assert clients["big"].peak == 2
+    # The later job still got a worker while the first one was running
+    assert clients["small"].peak == 1
+
+
+def test_cancelling_a_job_skips_its_pending_tasks(tmp_path):
+    client = FakeInferenceClient(latency=0.1, fail_every=0)
+    queue = make_queue(tmp_path, client, workers=1)
+
+    async def main():
+        queue.start()
+        job_id = await queue.submit({}, expand_batch(["cells"], 10))
+        while not client.calls:
+            await asyncio.sleep(0.01)
+        cancelled = await queue.cancel(job_id)
+        job = await wait_finished(queue.store, job_id)
+        await queue.stop()
+        return cancelled, job
+
+    cancelled, job = asyncio.run(main())
+    assert cancelled == 9
+    assert job["status"] == CANCELLED
+    # The task already running when the job was cancelled still finished
+    assert job["progress"] == {PENDING: 0, "running": 0, DONE: 1, FAILED: 0, CANCELLED: 9}
+    assert client.calls == 1
+
+
+def test_tasks_in_flight_during_a_crash_run_again_after_restart(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    store = JobStore(path)
+    job_id = store.create_job({}, expand_batch(["cells"], 3), max_concurrency=2)
+    claimed, _ = store.claim([], time.time())  # the process dies while this task runs
+    store.close()
+    assert claimed[1] == 0
+
+    client = FakeInferenceClient(latency=0.01, fail_every=0)
+    queue = make_queue(tmp_path, client)
+
+    async def main():
+        queue.start()
+        job = await wait_finished(queue.store, job_id)
+        await queue.stop()
+        return job
+
+    job = asyncio.run(main())
+    assert job["status"] == DONE
+    assert [task["result"] for task in job["tasks"]] == [f"Exam for cells #{v}" for v in range(3)]
+    assert client.calls == 3
+
+
+def test_stopped_queue_resumes_interrupted_tasks(tmp_path):
+    slow = FakeInferenceClient(latency=10, fail_every=0)
+    first = make_queue(tmp_path, slow)
+
+    async def interrupt():
+        first.start()
+        job_id = await first.submit({}, expand_batch(["cells"], 4))
+        while slow.in_flight < 2:
+            await asyncio.sleep(0.01)
+        await first.stop()
+        return job_id
+
+    job_id = asyncio.run(interrupt())
+    assert first.store.get(job_id)["progress"][PENDING] == 4
+    first.store.close()
+
+    client = FakeInferenceClient(latency=0.01, fail_every=0)
+    second = make_queue(tmp_path, client)
+
+    async def resume():
+        second.start()
+        job = await wait_finished(second.store, job_id)
+        await second.stop()
+        return job
+
+    job = asyncio.run(resume())
+    assert job["status"] == DONE
+    assert client.calls == 4
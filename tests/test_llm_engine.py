@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+from src import llm_engine
+from src.llm_backends import StubBackend, stub_tokens
+from src.response_cache import ResponseCache
+
+MESSAGES = [{"role": "user", "content": "Write the exam"}]
+EXAM = "### CASE STUDY A: Greenhouse\nTomatoes grow faster under extra light.\n1. Which process uses the light?"
+RAW = EXAM + "\n### END\nUser: and now another one"
+
+
+class ScriptedBackend(StubBackend):
+    """Answers every call with the next of `answers` (the last one repeats)."""
+
+    def __init__(self, answers):
+        super().__init__()
+        self.answers = list(answers)
+
+    def _tokens(self, messages, max_tokens):
+        self.calls += 1
+        return stub_tokens(self.answers[min(self.calls, len(self.answers)) - 1])
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    def install(*answers):
+        scripted = ScriptedBackend(answers)
+        monkeypatch.setattr(llm_engine, "_backend", scripted)
+        return scripted
+    monkeypatch.setattr(llm_engine, "response_cache", ResponseCache())
+    return install
+
+
+async def collect(stream):
+    return "".join([delta async for delta in stream])
+
+
+def test_blocking_and_streaming_calls_cache_the_same_cleaned_text(backend):
+    stub = backend(RAW)
+    assert llm_engine.generate_response(MESSAGES) == EXAM
+    # Served from the entry the blocking call cached: still cut at the stop marker
+    assert "".join(llm_engine.stream_response(MESSAGES)) == EXAM
+    assert asyncio.run(collect(llm_engine.astream_response(MESSAGES))) == EXAM
+    assert stub.calls == 1
+
+
+def test_async_completion_is_cached_cleaned(backend):
+    stub = backend(RAW)
+    assert asyncio.run(llm_engine.agenerate_response(MESSAGES)) == EXAM
+    assert "".join(llm_engine.stream_response(MESSAGES)) == EXAM
+    assert stub.calls == 1
+
+
+def test_raw_entry_from_an_older_cache_is_cleaned_when_streamed(backend):
+    stub = backend(RAW)
+    llm_engine.response_cache.put(llm_engine._cache_key(MESSAGES, 1500), RAW)
+    assert asyncio.run(collect(llm_engine.astream_response(MESSAGES))) == EXAM
+    assert stub.calls == 0
+
+
+def question(number, explanation=True):
+    lines = [f"{number}. Which process turns light into chemical energy (variant {number})?",
+             "a) Photosynthesis", "b) Respiration", "c) Fermentation", "d) Osmosis", "Answer: a"]
+    if explanation:
+        lines.append("Explanation: Chloroplasts capture light to make glucose.")
+    return "\n".join(lines)
+
+
+def exam_text(broken=()):
+    parts = []
+    for label, first in (("A", 1), ("B", 4)):
+        parts.append(f"### CASE STUDY {label}: Plants\nA greenhouse grows tomatoes.")
+        parts += [question(n, explanation=n not in broken) for n in range(first, first + 3)]
+    return "\n".join(parts)
+
+
+def test_repairs_of_a_cached_exam_are_cached_too(backend):
+    stub = backend(exam_text(broken=[2]), question(2), exam_text(broken=[2]), question(2))
+    context = "Photosynthesis notes"
+
+    raw, exam = asyncio.run(llm_engine.agenerate_exam(context))
+    assert exam.valid and exam.repaired == [2]
+    assert stub.calls == 2  # the exam, then one repaired question
+
+    # Cached exam: same repairs, no new upstream calls (also for the streaming path)
+    _, again = asyncio.run(llm_engine.agenerate_exam(context))
+    streamed = asyncio.run(llm_engine.afinish_exam(raw, context))
+    assert again.to_dict() == exam.to_dict() == streamed.to_dict()
+    assert stub.calls == 2
+
+    # `fresh` regenerates the exam and repairs it anew
+    asyncio.run(llm_engine.agenerate_exam(context, fresh=True))
+    assert stub.calls == 4
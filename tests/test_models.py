@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("faiss")
+
+from src.models import VectorDB
+
+
+def embeddings(n, dimension=8, seed=0):
+    return np.random.default_rng(seed).normal(size=(n, dimension)).astype(np.float32)
+
+
+def test_shared_chunk_survives_owner_removal_and_reload(tmp_path):
+    store_dir = str(tmp_path / "store")
+    db = VectorDB(store_dir=store_dir, dedup_threshold=0.8)
+    shared = "Photosynthesis turns light energy into chemical energy stored in glucose molecules."
+    first = [shared, "The mitochondria is the powerhouse of the cell and makes ATP.",
+             "Osmosis moves water across a semi-permeable membrane towards higher solute concentration."]
+    second = ["Newton's first law says an object keeps its velocity unless a force acts on it.", shared,
+              "Kinetic energy grows with the square of the velocity of a moving object."]
+    db.add_document("biology", first, embeddings=embeddings(3, seed=1))
+    db.add_document("mixed", second, embeddings=embeddings(3, seed=2))
+    shared_id = db.documents["biology"][0]
+    assert db.duplicates[shared_id]  # indexed once, referenced by "mixed"
+
+    # "mixed" takes the shared chunk over
+    db.remove_document("biology")
+    assert db.metadata[shared_id]["doc_id"] == "mixed"
+    db.save()
+
+    reloaded = VectorDB(store_dir=store_dir, dedup_threshold=0.8)
+    reloaded.load()
+    assert sorted(reloaded.documents["mixed"]) == sorted(db.documents["mixed"])
+    for chunk_id in db.documents["mixed"]:
+        assert reloaded.metadata[chunk_id] == db.metadata[chunk_id]
+        assert reloaded.vectors.get([chunk_id]).tolist() == db.vectors.get([chunk_id]).tolist()
+    assert reloaded.metadata[shared_id]["text"] == shared
+
+
+def test_duplicates_are_merged_after_a_removed_document_is_added_again(tmp_path):
+    db = VectorDB(store_dir=str(tmp_path / "store"), dedup_threshold=0.8)
+    notes = ["Photosynthesis turns light energy into chemical energy stored in glucose molecules.",
+             "The mitochondria is the powerhouse of the cell and makes ATP."]
+    db.add_document("a", notes, embeddings=embeddings(2, seed=1))
+    db.remove_document("a")
+    db.add_document("b", notes, embeddings=embeddings(2, seed=2))
+    db.add_document("c", notes, embeddings=embeddings(2, seed=3))
+    # "c" is only back-references into the chunks of "b"
+    assert db.documents["c"] == []
+    assert [db.duplicates[chunk_id][0][0] for chunk_id in db.documents["b"]] == ["c", "c"]
+    assert len(db.vectors) == 2
+
+
+@pytest.mark.parametrize("storage", ["float32", "int8"])
+def test_hnsw_compaction_after_removals(tmp_path, storage):
+    db = VectorDB(store_dir=str(tmp_path / "store"), index_kind="hnsw", dedup_threshold=None, storage=storage)
+    vectors = embeddings(1200)
+    for i in range(6):
+        db.add_document(f"doc{i}", [f"chunk {i}-{j}" for j in range(200)], embeddings=vectors[i * 200:(i + 1) * 200])
+    for i in range(3):
+        db.remove_document(f"doc{i}")  # crosses the tombstone ratio and rebuilds the graph
+    assert db.index.ntotal == 600
+    hits = db.search_vectors(vectors[1000:1001], k=1)[0]
+    assert hits[0]["doc_id"] == "doc5"
@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+from src.response_cache import ResponseCache
+
+
+def test_concurrent_calls_share_one_computation():
+    cache = ResponseCache()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "exam"
+
+    async def main():
+        return await asyncio.gather(*(cache.get_or_compute("key", compute) for _ in range(5)))
+
+    assert asyncio.run(main()) == ["exam"] * 5
+    assert len(calls) == 1
+    assert cache.stats()["in_flight"] == 0
+
+
+def test_followers_take_over_when_the_leader_is_cancelled():
+    cache = ResponseCache()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "exam"
+
+    async def main():
+        leader = asyncio.ensure_future(cache.get_or_compute("key", compute))
+        await asyncio.sleep(0)
+        followers = [asyncio.ensure_future(cache.get_or_compute("key", compute)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await asyncio.wait_for(asyncio.gather(*followers), timeout=2)
+
+    assert asyncio.run(main()) == ["exam"] * 3
+    assert len(calls) == 2  # the cancelled leader's, then one shared by the followers
+    assert cache.stats()["in_flight"] == 0
+
+
+def test_errors_reach_every_waiting_caller():
+    cache = ResponseCache()
+
+    async def compute():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    async def main():
+        return await asyncio.gather(*(cache.get_or_compute("key", compute) for _ in range(3)),
+                                    return_exceptions=True)
+
+    assert [str(e) for e in asyncio.run(main())] == ["upstream down"] * 3
@@ -0,0 +1,113 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("faiss")
+
+from src.sessions import SessionRegistry
+
+
+class SlowDB:
+    """VectorDB stand-in whose load and save block until `gate` is set."""
+
+    def __init__(self, on_disk, gate):
+        self.on_disk = on_disk
+        self.gate = gate
+        self.loaded = False
+        self.saved = False
+
+    def exists_on_disk(self):
+        return self.on_disk
+
+    def load(self):
+        assert self.gate.wait(5)
+        self.loaded = True
+
+    def save(self):
+        assert self.gate.wait(5)
+        self.saved = True
+
+    def is_empty(self):
+        return False
+
+    def memory_bytes(self):
+        return 100
+
+
+def registry(tmp_path, monkeypatch, on_disk, gate, slow, max_bytes=1000):
+    """A registry whose sessions are SlowDBs; only those in `slow` wait for `gate`."""
+    sessions = SessionRegistry(storage_dir=str(tmp_path), max_bytes=max_bytes)
+    created = []
+    open_gate = threading.Event()
+    open_gate.set()
+
+    def new_db(session_id):
+        db = SlowDB(session_id in on_disk, gate if session_id in slow else open_gate)
+        created.append((session_id, db))
+        return db
+
+    monkeypatch.setattr(sessions, "_new_db", new_db)
+    return sessions, created
+
+
+def run(target, *args):
+    thread = threading.Thread(target=target, args=args)
+    thread.start()
+    return thread
+
+
+def test_loading_one_session_does_not_block_the_others(tmp_path, monkeypatch):
+    gate = threading.Event()
+    sessions, created = registry(tmp_path, monkeypatch, on_disk={"slow"}, gate=gate, slow={"slow"})
+    with sessions.session("fast"):
+        pass
+    results = []
+
+    def use(session_id):
+        with sessions.session(session_id) as db:
+            results.append((session_id, db))
+
+    loaders = [run(use, "slow"), run(use, "slow")]
+    while not created or created[-1][0] != "slow":
+        time.sleep(0.001)
+    # "slow" is loading (blocked on the gate); a resident session is served meanwhile
+    with sessions.session("fast") as db:
+        assert db is created[0][1]
+    assert results == []
+
+    gate.set()
+    for thread in loaders:
+        thread.join(5)
+    assert [session_id for session_id, _ in results] == ["slow", "slow"]
+    assert results[0][1] is results[1][1] and results[0][1].loaded
+    assert sessions.reloads == 1
+
+
+def test_saving_an_evicted_session_does_not_block_the_others(tmp_path, monkeypatch):
+    gate = threading.Event()
+    sessions, created = registry(tmp_path, monkeypatch, on_disk=set(), gate=gate, slow={"cold"}, max_bytes=150)
+    with sessions.session("cold"):
+        pass
+
+    def use_hot():
+        with sessions.session("hot"):
+            pass
+
+    # Releasing "hot" puts the registry over budget, so "cold" is evicted and saved
+    evicting = run(use_hot)
+    while sessions.stats()["evictions"] == 0:
+        time.sleep(0.001)
+    with sessions.session("other"):
+        pass  # not blocked by the save in progress
+    cold = created[0][1]
+    assert not cold.saved
+
+    reacquired = []
+    waiter = run(lambda: reacquired.append(sessions._acquire("cold")))
+    waiter.join(0.1)
+    assert reacquired == []  # waits for its own save to finish, then reloads it
+    gate.set()
+    evicting.join(5)
+    waiter.join(5)
+    assert cold.saved and reacquired and reacquired[0] is not cold
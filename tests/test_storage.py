@@ -0,0 +1,97 @@
+import os
+
+import numpy as np
+
+from src.storage import ChunkStore, VectorStore, read_meta, write_store
+
+
+def record(chunk_id, doc_id="notes"):
+    return {"text": f"chunk {chunk_id}", "doc_id": doc_id, "page": chunk_id % 3, "offset": chunk_id * 10}
+
+
+def rows(ids):
+    return np.array([[i, i] for i in ids], dtype=np.float32)
+
+
+def test_vector_lookup_with_ids_added_out_of_order():
+    vectors = VectorStore()
+    vectors.add([10, 11], rows([10, 11]))
+    vectors.add([0, 1], rows([0, 1]))
+    assert vectors.get([0, 1, 10, 11]).tolist() == rows([0, 1, 10, 11]).tolist()
+    assert vectors.get([11, 0]).tolist() == rows([11, 0]).tolist()
+
+
+def test_store_round_trip_with_ids_added_out_of_order(tmp_path):
+    chunks, vectors = ChunkStore(), VectorStore()
+    for ids in ([10, 11], [0, 1], [5]):
+        vectors.add(ids, rows(ids))
+        for chunk_id in ids:
+            chunks[chunk_id] = record(chunk_id)
+    directory = str(tmp_path / "store")
+    write_store(directory, chunks, vectors, {}, lambda tmp_dir: None)
+
+    assert np.fromfile(f"{directory}/ids.i64", dtype=np.int64).tolist() == [0, 1, 5, 10, 11]
+    loaded = ChunkStore.open(directory, read_meta(directory)["doc_names"])
+    loaded_vectors = VectorStore.open(directory, 2)
+    for chunk_id in (0, 1, 5, 10, 11):
+        assert loaded[chunk_id] == record(chunk_id)
+    assert loaded_vectors.get([11, 5, 0]).tolist() == rows([11, 5, 0]).tolist()
+
+
+def test_rewriting_a_base_record_survives_another_save(tmp_path):
+    chunks, vectors = ChunkStore(), VectorStore()
+    vectors.add([0, 1, 2], rows([0, 1, 2]))
+    for chunk_id in (0, 1, 2):
+        chunks[chunk_id] = record(chunk_id)
+    first, second = str(tmp_path / "first"), str(tmp_path / "second")
+    write_store(first, chunks, vectors, {}, lambda tmp_dir: None)
+
+    loaded = ChunkStore.open(first, read_meta(first)["doc_names"])
+    loaded_vectors = VectorStore.open(first, 2)
+    loaded[1] = record(1, doc_id="other")  # moves a base record into the overlay
+    loaded_vectors.add([3], rows([3]))
+    loaded[3] = record(3)
+    write_store(second, loaded, loaded_vectors, {}, lambda tmp_dir: None)
+
+    reloaded = ChunkStore.open(second, read_meta(second)["doc_names"])
+    assert [reloaded[i]["doc_id"] for i in range(4)] == ["notes", "other", "notes", "notes"]
+    assert VectorStore.open(second, 2).get([1, 3]).tolist() == rows([1, 3]).tolist()
+
+
+def test_replacing_an_overlay_record_keeps_its_position():
+    chunks = ChunkStore()
+    for chunk_id in (0, 1, 2):
+        chunks[chunk_id] = record(chunk_id)
+    chunks[1] = record(1, doc_id="other")
+    assert list(chunks.keys()) == [0, 1, 2]
+    assert chunks.text_bytes == sum(len(record(i)["text"]) for i in range(3))
+
+
+def test_store_saved_with_word_offsets_file_still_opens(tmp_path):
+    chunks, vectors = ChunkStore(), VectorStore()
+    vectors.add([0, 1], rows([0, 1]))
+    for chunk_id in (0, 1):
+        chunks[chunk_id] = record(chunk_id)
+    directory = str(tmp_path / "store")
+    write_store(directory, chunks, vectors, {}, lambda tmp_dir: None)
+    os.replace(os.path.join(directory, "char_offsets.i64"), os.path.join(directory, "word_offsets.i64"))
+
+    loaded = ChunkStore.open(directory, read_meta(directory)["doc_names"])
+    assert [loaded[i]["offset"] for i in (0, 1)] == [0, 10]
+
+
+def test_vector_count_tracks_adds_and_removals(tmp_path):
+    vectors = VectorStore()
+    vectors.add([0, 1, 2], rows([0, 1, 2]))
+    vectors.remove([1, 1])
+    assert len(vectors) == 2
+    chunks = ChunkStore()
+    for chunk_id in (0, 2):
+        chunks[chunk_id] = record(chunk_id)
+    directory = str(tmp_path / "store")
+    write_store(directory, chunks, vectors, {}, lambda tmp_dir: None)
+
+    loaded = VectorStore.open(directory, 2)
+    loaded.add([3], rows([3]))
+    loaded.remove([0])
+    assert len(loaded) == len(loaded.live_ids()) == 2
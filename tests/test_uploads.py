@@ -0,0 +1,60 @@
+import hashlib
+import os
+
+import pytest
+
+pytest.importorskip("python_multipart")
+
+from src.uploads import MalformedUpload, MultipartUpload, UnsupportedUpload, UploadTooLarge
+
+BOUNDARY = "----examprep"
+CONTENT_TYPE = f"multipart/form-data; boundary={BOUNDARY}"
+
+
+def body(content, filename="notes.pdf", session_id="s1"):
+    return (
+        f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"session_id\"\r\n\r\n{session_id}\r\n"
+        f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{filename}\"\r\n"
+        f"Content-Type: application/pdf\r\n\r\n"
+    ).encode() + content + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+def read(data, spool_dir, max_bytes=100_000, memory_bytes=4096, chunk=1000):
+    reader = MultipartUpload(CONTENT_TYPE, "file", str(spool_dir), max_bytes, memory_bytes, overhead_bytes=1024)
+    try:
+        for start in range(0, len(data), chunk):
+            reader.feed(data[start:start + chunk])
+        return reader.finish()
+    except BaseException:
+        reader.abort()
+        raise
+
+
+@pytest.mark.parametrize("size", [100, 50_000])
+def test_file_part_is_spooled_while_streaming(tmp_path, size):
+    content = os.urandom(size)
+    upload, fields = read(body(content), tmp_path)
+    assert fields == {"session_id": "s1"}
+    assert (upload.filename, upload.file_type, upload.size) == ("notes.pdf", ".pdf", size)
+    assert upload.content_hash == hashlib.sha256(content).hexdigest()
+    assert upload.in_memory == (size <= 4096)
+    if not upload.in_memory:
+        with open(upload.path, "rb") as f:
+            assert f.read() == content
+    upload.cleanup()
+    assert os.listdir(tmp_path) == []
+
+
+def test_oversized_file_is_rejected_while_reading_and_leaves_nothing(tmp_path):
+    with pytest.raises(UploadTooLarge):
+        read(body(b"x" * 200_000), tmp_path)
+    assert os.listdir(tmp_path) == []
+
+
+def test_bad_requests(tmp_path):
+    with pytest.raises(UnsupportedUpload):
+        read(body(b"x", filename="notes.exe"), tmp_path)
+    with pytest.raises(MalformedUpload):
+        read(body(b"x")[:-40], tmp_path)
+    with pytest.raises(MalformedUpload):
+        MultipartUpload("application/json", "file", str(tmp_path), 10, 10)